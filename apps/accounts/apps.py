@@ -6,3 +6,6 @@ class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.accounts'
     label = 'accounts'
+
+    def ready(self):
+        from . import signals
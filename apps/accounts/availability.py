@@ -0,0 +1,247 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+
+
+logger = logging.getLogger(__name__)
+
+RECENT_KEY = 'accounts:availability:{kind}:{digest}'
+REBUILD_INTERVAL = 300
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings. ``in`` may return false
+    positives at roughly ``error_rate`` but never false negatives.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + number * second) % self.size for number in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class LRUCache:
+    """Thread-safe LRU of at most ``maxsize`` entries that expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class AvailabilityService:
+    """
+    Answers "is this username/email taken?" for the signup forms.
+
+    Each process keeps Bloom filters over all usernames and the emails of
+    registered users. They are built in a background thread on first use
+    and again every ``REBUILD_INTERVAL`` seconds; until the first build
+    finishes every lookup goes to the database, and during a rebuild the
+    old filters stay in use. Saves in this process are added to the filters
+    directly. A value missing from the filter is free without a query.
+    Saves in other processes are announced through a short-lived cache key
+    per value, which is checked before trusting the filter. Possible hits
+    are settled by the database, and taken values are remembered in a
+    bounded LRU/TTL cache together with the owner, so a user who renames
+    drops the answer for the old value.
+    """
+
+    background = True
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self._lock = threading.Lock()
+        self._filters = None
+        self._built_at = 0
+        self._building = False
+        self._answers = LRUCache(maxsize, ttl)
+
+    def _load(self):
+        from .models import CustomUser, DONE
+
+        users = CustomUser.objects.values_list('username', 'email', 'auth_status')
+        count = users.count()
+        usernames = BloomFilter(count * 2 + 1000)
+        emails = BloomFilter(count * 2 + 1000)
+        for username, email, auth_status in users.iterator(chunk_size=5000):
+            usernames.add(username)
+            if auth_status == DONE:
+                emails.add(email)
+        return {'username': usernames, 'email': emails}
+
+    def _build(self):
+        try:
+            filters = self._load()
+        except DatabaseError:
+            logger.exception("Could not build the availability filters")
+            filters = None
+        finally:
+            if self.background:
+                connection.close()
+
+        with self._lock:
+            if filters is not None:
+                self._filters = filters
+                self._built_at = time.monotonic()
+            self._building = False
+
+    def _filter(self, kind):
+        """The current filter for ``kind``, or None while the first build runs."""
+        with self._lock:
+            filters = self._filters
+            stale = (
+                filters is None
+                or time.monotonic() - self._built_at > REBUILD_INTERVAL
+                or any(f.count > f.capacity for f in filters.values())
+            )
+            start = stale and not self._building
+            if start:
+                self._building = True
+
+        if start:
+            if self.background:
+                threading.Thread(target=self._build, name='availability-filters', daemon=True).start()
+            else:
+                self._build()
+                filters = self._filters
+
+        return filters[kind] if filters is not None else None
+
+    @staticmethod
+    def _recent_key(kind, value):
+        return RECENT_KEY.format(kind=kind, digest=hashlib.blake2b(value.encode(), digest_size=16).hexdigest())
+
+    def _maybe_taken(self, kind, value):
+        bloom = self._filter(kind)
+        return bloom is None or value in bloom or cache.get(self._recent_key(kind, value)) is not None
+
+    def _remember(self, kind, value, owner):
+        self._answers.set((kind, value), owner)
+        self._answers.set(('owner', kind, owner), value)
+
+    def username_owner(self, username):
+        """Primary key of the user with this username, or None."""
+        from .models import CustomUser
+
+        if not self._maybe_taken('username', username):
+            return None
+
+        owner = self._answers.get(('username', username))
+        if owner is None:
+            owner = CustomUser.objects.filter(username=username).values_list('pk', flat=True).first()
+            if owner is not None:
+                self._remember('username', username, owner)
+        return owner
+
+    def username_taken(self, username, exclude_id=None):
+        owner = self.username_owner(username)
+        return owner is not None and owner != exclude_id
+
+    def email_taken(self, email):
+        """Whether a registered (``auth_status=done``) user has this email."""
+        from .models import CustomUser, DONE
+
+        email = email.lower()
+        if not self._maybe_taken('email', email):
+            return False
+
+        if self._answers.get(('email', email)) is not None:
+            return True
+
+        owner = CustomUser.objects.filter(email=email, auth_status=DONE).values_list('pk', flat=True).first()
+        if owner is not None:
+            self._remember('email', email, owner)
+        return owner is not None
+
+    def add(self, user):
+        """Record a saved user in this process and announce it to the others."""
+        from .models import DONE
+
+        values = [('username', user.username)]
+        if user.auth_status == DONE and user.email:
+            values.append(('email', user.email.lower()))
+
+        with self._lock:
+            for kind, value in values:
+                if self._filters is not None:
+                    self._filters[kind].add(value)
+                self._answers.discard((kind, value))
+
+        self._forget_previous(user)
+        cache.set_many({self._recent_key(kind, value): True for kind, value in values}, REBUILD_INTERVAL * 2)
+
+    def _forget_previous(self, user, keep=True):
+        """Drop answers remembered under ``user``'s earlier values, or under all of them unless ``keep``."""
+        current = {'username': user.username, 'email': (user.email or '').lower()}
+        for kind, value in current.items():
+            previous = self._answers.get(('owner', kind, user.pk))
+            if previous is not None and (not keep or previous != value):
+                self._answers.discard((kind, previous))
+                self._answers.discard(('owner', kind, user.pk))
+
+    def forget(self, user):
+        """Drop remembered answers for a deleted user; the filters catch up on rebuild."""
+        self._answers.discard(('username', user.username))
+        if user.email:
+            self._answers.discard(('email', user.email.lower()))
+        self._forget_previous(user, keep=False)
+
+    def reset(self):
+        with self._lock:
+            self._filters = None
+            self._built_at = 0
+            self._building = False
+            self._answers.clear()
+
+
+availability = AvailabilityService()
@@ -0,0 +1,76 @@
+import time
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+
+from apps.accounts.models import OutgoingEmail
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued emails from the outbox in batches over one mail "
+        "connection per batch. Failed emails are retried with exponential "
+        "backoff. Runs once by default; use --loop to keep polling."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox instead of exiting when it is empty")
+        parser.add_argument('--interval', type=float, default=2, help="Seconds to sleep between polls with --loop")
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+
+        try:
+            while True:
+                emails = OutgoingEmail.claim(options['batch_size'])
+                if emails:
+                    sent, failed = self.send_batch(emails)
+                    total_sent += sent
+                    total_failed += failed
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f"Sent {sent}, failed {failed}")
+                    continue
+
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} email(s), {total_failed} failed"))
+
+    def send_batch(self, emails):
+        connection = get_connection()
+        sent = []
+        failed = 0
+
+        try:
+            connection.open()
+        except Exception as error:
+            for email in emails:
+                email.mark_failed(error)
+            return 0, len(emails)
+
+        try:
+            for email in emails:
+                message = EmailMessage(email.subject, email.body, email.from_email, [email.to], connection=connection)
+                try:
+                    message.send()
+                except Exception as error:
+                    email.mark_failed(error)
+                    failed += 1
+                    # the server may have dropped us; start the rest on a fresh connection
+                    connection.close()
+                    connection.open()
+                else:
+                    sent.append(email)
+        except Exception as error:
+            for email in emails[len(sent) + failed:]:
+                email.mark_failed(error)
+                failed += 1
+        finally:
+            connection.close()
+            OutgoingEmail.mark_sent(sent)
+
+        return len(sent), failed
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:43
+
+from django.db import migrations, models
+
+
+def purge_verification_codes(apps, schema_editor):
+    # Rows queued before the sensitive flag existed still hold codes in
+    # their body: flag the ones not yet delivered and drop the sent ones.
+    OutgoingEmail = apps.get_model('accounts', 'OutgoingEmail')
+    codes = OutgoingEmail.objects.filter(subject='Email Verification Code')
+    codes.filter(status='sent').delete()
+    codes.filter(status='failed').update(sensitive=True, body='')
+    codes.update(sensitive=True)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='claim_token',
+            field=models.CharField(blank=True, help_text='Worker currently sending this row', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='sensitive',
+            field=models.BooleanField(default=False, help_text='Body holds a secret; deleted once sent'),
+        ),
+        migrations.AlterField(
+            model_name='outgoingemail',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(purge_verification_codes, migrations.RunPython.noop),
+    ]
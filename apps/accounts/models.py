@@ -82,7 +82,9 @@ class CustomUser(AbstractUser):
             username = base_username
             counter = 1
 
-            while CustomUser.objects.filter(username=username).exists():
+            # every possible collision shares the prefix, so one query covers them all
+            taken = set(CustomUser.objects.filter(username__startswith=base_username).values_list('username', flat=True))
+            while username in taken:
                 username = f"{base_username}_{counter}"
                 counter += 1
 
@@ -180,6 +182,113 @@ class EmailVerification(models.Model):
         super().save(*args, **kwargs)
 
 
+class OutgoingEmail(models.Model):
+    """
+    Outbox row for mail sent outside the request. Requests only ``enqueue``;
+    the ``send_outbox`` command delivers due rows in batches over one SMTP
+    connection and reschedules failures with exponential backoff.
+
+    ``sensitive`` rows carry a secret such as a verification code: they are
+    deleted once sent, and their body is cleared when delivery is given up.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    )
 
+    MAX_ATTEMPTS = 6
+    RETRY_DELAY = 30
+    MAX_RETRY_DELAY = 3600
+    CLAIM_TIMEOUT = 300
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.EmailField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)
+    last_error = models.TextField(blank=True)
+    sensitive = models.BooleanField(default=False, help_text="Body holds a secret; deleted once sent")
+    claim_token = models.CharField(max_length=32, blank=True, help_text="Worker currently sending this row")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        db_table = 'email_outbox'
+        verbose_name = 'Outgoing Email'
+        verbose_name_plural = 'Outgoing Emails'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
 
+    def __str__(self):
+        return f"{self.to} - {self.subject} ({self.status})"
+
+    @classmethod
+    def enqueue(cls, subject, body, to, from_email=None, sensitive=False):
+        from django.conf import settings
+
+        return cls.objects.create(
+            subject=subject,
+            body=body,
+            to=to,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            sensitive=sensitive,
+        )
+
+    @classmethod
+    def claim(cls, limit):
+        """
+        Take up to ``limit`` due rows for this worker.
+
+        Candidates are read without locks, then taken with one conditional
+        ``UPDATE ... SET status = 'sending' WHERE status = 'pending'``; a row
+        another worker took in between no longer matches, so each row goes
+        to one worker on every database. Claims hold for ``CLAIM_TIMEOUT``
+        seconds, after which a crashed worker's rows become due again.
+        """
+        # a 'sending' row past its claim belongs to a worker that died
+        due = cls.objects.filter(status__in=(cls.PENDING, cls.SENDING), next_attempt_at__lte=now())
+        candidates = list(due.order_by('next_attempt_at').values_list('pk', flat=True)[:limit])
+        if not candidates:
+            return []
+
+        token = uuid.uuid4().hex
+        due.filter(pk__in=candidates).update(
+            status=cls.SENDING,
+            claim_token=token,
+            next_attempt_at=now() + timedelta(seconds=cls.CLAIM_TIMEOUT),
+        )
+        return list(cls.objects.filter(status=cls.SENDING, claim_token=token).order_by('next_attempt_at', 'pk'))
+
+    @classmethod
+    def mark_sent(cls, emails):
+        """Record delivery of ``emails``; sensitive ones are purged."""
+        ids = [email.pk for email in emails if not email.sensitive]
+        sensitive_ids = [email.pk for email in emails if email.sensitive]
+        cls.objects.filter(pk__in=ids).update(status=cls.SENT, sent_at=now(), last_error='', claim_token='')
+        cls.objects.filter(pk__in=sensitive_ids).delete()
+
+    def retry_delay(self):
+        return min(self.RETRY_DELAY * 2 ** (self.attempts - 1), self.MAX_RETRY_DELAY)
+
+    def mark_failed(self, error):
+        self.attempts += 1
+        self.last_error = str(error)
+        self.claim_token = ''
+        if self.attempts >= self.MAX_ATTEMPTS:
+            self.status = self.FAILED
+            if self.sensitive:
+                self.body = ''
+        else:
+            self.status = self.PENDING
+            self.next_attempt_at = now() + timedelta(seconds=self.retry_delay())
+        self.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at', 'claim_token', 'body'])
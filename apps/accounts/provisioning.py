@@ -0,0 +1,257 @@
+import time
+import uuid
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from core.csvrows import LINE_KEY, check_extra_values, read_rows
+from .availability import availability
+from .models import CustomUser, DONE
+
+
+STARTER_CATEGORIES = (
+    ('Food', 'expense', '🍔'),
+    ('Transport', 'expense', '🚗'),
+    ('Shopping', 'expense', '🛒'),
+    ('Bills', 'expense', '💳'),
+    ('Healthcare', 'expense', '💊'),
+    ('Entertainment', 'expense', '🎮'),
+    ('Salary', 'income', '💰'),
+    ('Other', 'expense', '📦'),
+)
+
+CURRENCY_CODES = {code for code, _ in CustomUser.CURRENCY_CHOICES}
+
+
+def parse_csv(lines):
+    """
+    Yield one row dict per CSV record (see ``core.csvrows.read_rows``).
+
+    Expected columns: email, username, first_name, last_name, password,
+    password_hash, phone_number, default_currency, card_name,
+    card_balance. Only email is required; password_hash must already be
+    in Django's hashed format.
+    """
+    return read_rows(lines)
+
+
+@dataclass
+class ProvisionResult:
+    created: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        if not self.seconds:
+            return 0.0
+        return (self.created + self.skipped) / self.seconds
+
+
+class UserProvisioner:
+    """
+    Creates registered users with a default card and starter categories
+    through ``bulk_create``.
+
+    Each batch is one transaction: existing emails and usernames are
+    checked with one query per batch, generated usernames are checked the
+    same way, and users, cards and categories are inserted in bulk.
+    Rows without a password share one hash of ``default_password``, or
+    get an unusable password when none is given.
+    """
+
+    max_errors = 100
+
+    def __init__(self, card_type, currency='UZS', default_password=None, card_balance=Decimal('0'),
+                 starter_categories=True, batch_size=500):
+        from apps.cards.models import Currency
+        from apps.transactions.models import Category
+
+        self.card_type = card_type
+        self.default_currency = currency
+        self.default_card_balance = card_balance
+        self.batch_size = batch_size
+
+        # hashing is deliberately slow, so a shared default is hashed once
+        self.default_password_hash = make_password(default_password)
+        self.currencies = {currency.code: currency for currency in Currency.objects.filter(code__in=CURRENCY_CODES)}
+
+        self.starter_categories = []
+        if starter_categories:
+            system = set(Category.objects.filter(user=None).values_list('name', 'type'))
+            self.starter_categories = [
+                (name, category_type, icon) for name, category_type, icon in STARTER_CATEGORIES
+                if (name, category_type) not in system
+            ]
+
+        self.seen_emails = set()
+        self.seen_usernames = set()
+
+    def build(self, row):
+        check_extra_values(row)
+
+        email = row.get('email', '').lower()
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise ValueError(f"Invalid email '{row.get('email', '')}'")
+        if email in self.seen_emails:
+            raise ValueError(f"Duplicate email '{email}'")
+
+        username = row.get('username', '')
+        if username and username in self.seen_usernames:
+            raise ValueError(f"Duplicate username '{username}'")
+        # the same rules as the registration form; user_ names are generated
+        if username.startswith('user_'):
+            raise ValueError(f"Username '{username}' cannot start with \"user_\"")
+        if username and len(username) < 3:
+            raise ValueError(f"Username '{username}' must be at least 3 characters long")
+
+        currency = (row.get('default_currency') or self.default_currency).upper()
+        if currency not in self.currencies:
+            raise ValueError(f"Unknown currency '{currency}'")
+
+        password_hash = row.get('password_hash', '')
+        if password_hash:
+            try:
+                identify_hasher(password_hash)
+            except ValueError:
+                raise ValueError("password_hash is not a Django password hash")
+        elif row.get('password'):
+            password_hash = make_password(row['password'])
+        else:
+            password_hash = self.default_password_hash
+
+        try:
+            card_balance = Decimal(row['card_balance'].replace(',', '')) if row.get('card_balance') else self.default_card_balance
+        except InvalidOperation:
+            raise ValueError(f"Invalid card balance '{row['card_balance']}'")
+
+        user = CustomUser(
+            email=email,
+            username=username,
+            first_name=row.get('first_name', '')[:150],
+            last_name=row.get('last_name', '')[:150],
+            phone_number=row.get('phone_number') or None,
+            default_currency=currency,
+            password=password_hash,
+            auth_status=DONE,
+        )
+        self._validate(user)
+
+        self.seen_emails.add(email)
+        if username:
+            self.seen_usernames.add(username)
+        return user, row.get('card_name') or 'Main card', card_balance
+
+    def _validate(self, user):
+        """
+        Run the model field validators that ``bulk_create`` skips. Unique
+        checks are left to the per-batch queries in ``_insert``.
+        """
+        exclude = ['password'] if user.username else ['password', 'username']
+        try:
+            user.full_clean(exclude=exclude, validate_unique=False, validate_constraints=False)
+        except ValidationError as error:
+            raise ValueError('; '.join(
+                f"{name}: {' '.join(messages)}" for name, messages in error.message_dict.items()
+            ))
+
+    def _assign_usernames(self, users):
+        """Give ``user_<hex>`` names to users without one, one query per round."""
+        pending = [user for user in users if not user.username]
+        while pending:
+            for user in pending:
+                user.username = f"user_{uuid.uuid4().hex[:8]}"
+            taken = set(CustomUser.objects.filter(username__in=[user.username for user in pending]).values_list('username', flat=True))
+            taken |= self.seen_usernames
+            collided = []
+            for user in pending:
+                if user.username in taken:
+                    collided.append(user)
+                else:
+                    self.seen_usernames.add(user.username)
+            pending = collided
+
+    def _insert(self, batch, result):
+        from apps.cards.models import Card, CardLedgerEntry
+        from apps.transactions.models import Category
+
+        emails = [user.email for _, user, _, _ in batch]
+        usernames = [user.username for _, user, _, _ in batch if user.username]
+        existing_emails = set(CustomUser.objects.filter(email__in=emails).values_list('email', flat=True))
+        existing_usernames = set(CustomUser.objects.filter(username__in=usernames).values_list('username', flat=True))
+
+        rows = []
+        for line_number, user, card_name, card_balance in batch:
+            if user.email in existing_emails:
+                self._skip(result, line_number, f"User with email '{user.email}' already exists")
+            elif user.username in existing_usernames:
+                self._skip(result, line_number, f"Username '{user.username}' is taken")
+            else:
+                rows.append((user, card_name, card_balance))
+        if not rows:
+            return
+
+        with transaction.atomic():
+            self._assign_usernames([user for user, _, _ in rows])
+            users = CustomUser.objects.bulk_create([user for user, _, _ in rows])
+
+            cards = Card.objects.bulk_create([
+                Card(
+                    user=user,
+                    card_type=self.card_type,
+                    currency=self.currencies[user.default_currency],
+                    card_name=card_name,
+                    balance=card_balance,
+                    initial_balance=card_balance,
+                    is_default=True,
+                )
+                for user, (_, card_name, card_balance) in zip(users, rows)
+            ], batch_size=self.batch_size)
+            CardLedgerEntry.open_many(cards)
+
+            if self.starter_categories:
+                Category.objects.bulk_create([
+                    Category(user=user, name=name, type=category_type, icon=icon)
+                    for user in users
+                    for name, category_type, icon in self.starter_categories
+                ], batch_size=self.batch_size)
+
+        # bulk_create sends no post_save, so record the new names directly
+        for user in users:
+            availability.add(user)
+        result.created += len(users)
+
+    def _skip(self, result, line_number, error):
+        result.skipped += 1
+        if len(result.errors) < self.max_errors:
+            result.errors.append((line_number, error))
+
+    def run(self, rows):
+        result = ProvisionResult()
+        started = time.perf_counter()
+
+        batch = []
+        for number, row in enumerate(rows, start=1):
+            line_number = row.get(LINE_KEY, number)
+            try:
+                batch.append((line_number, *self.build(row)))
+            except ValueError as error:
+                self._skip(result, line_number, str(error))
+                continue
+
+            if len(batch) >= self.batch_size:
+                self._insert(batch, result)
+                batch = []
+
+        if batch:
+            self._insert(batch, result)
+
+        result.seconds = time.perf_counter() - started
+        return result
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .availability import availability
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+def record_taken_names(sender, instance, **kwargs):
+    availability.add(instance)
+
+
+@receiver(post_delete, sender=CustomUser)
+def forget_taken_names(sender, instance, **kwargs):
+    availability.forget(instance)
@@ -1,3 +1,305 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import CommandError, call_command
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+
+from apps.accounts.availability import BloomFilter, availability
+from apps.accounts.models import CustomUser, OutgoingEmail
+from apps.accounts.provisioning import STARTER_CATEGORIES, UserProvisioner, parse_csv
+from apps.cards.models import Card, CardType
+from apps.transactions.models import Category
+from core.testing import QueryBudgetMixin, create_currencies, create_user
+
+
+class AccountViewQueryTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('alice')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def grow(self):
+        for number in range(10):
+            create_user(f'user{number}')
+
+    def test_profile(self):
+        self.assertQueryBudget(reverse('accounts:profile'), 2)
+
+
+class FailingBackend(BaseEmailBackend):
+
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError("SMTP is down")
+
+
+class EmailOutboxTests(TestCase):
+
+    def test_signup_only_enqueues(self):
+        response = self.client.post(reverse('accounts:signup'), {'email': 'New@Example.com'})
+        self.assertRedirects(response, reverse('accounts:verify-code'), fetch_redirect_response=False)
+        self.assertEqual(mail.outbox, [])
+
+        queued = OutgoingEmail.objects.get()
+        self.assertEqual(queued.to, 'new@example.com')
+        self.assertEqual(queued.status, OutgoingEmail.PENDING)
+
+    def test_worker_sends_batch(self):
+        for number in range(3):
+            OutgoingEmail.enqueue('Code', f'Your code is {number}', f'user{number}@example.com')
+
+        call_command('send_outbox', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutgoingEmail.objects.filter(status=OutgoingEmail.SENT).count(), 3)
+
+    @override_settings(EMAIL_BACKEND='apps.accounts.tests.FailingBackend')
+    def test_failures_back_off(self):
+        email = OutgoingEmail.enqueue('Code', 'Your code is 1234', 'user@example.com')
+
+        call_command('send_outbox', stdout=StringIO())
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.status, OutgoingEmail.PENDING)
+        self.assertGreater(email.next_attempt_at, now() + timedelta(seconds=OutgoingEmail.RETRY_DELAY - 5))
+        self.assertIn('SMTP is down', email.last_error)
+
+        # not due yet
+        call_command('send_outbox', stdout=StringIO())
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 1)
+
+        OutgoingEmail.objects.update(attempts=OutgoingEmail.MAX_ATTEMPTS - 1, next_attempt_at=now())
+        call_command('send_outbox', stdout=StringIO())
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.FAILED)
+
+    def test_each_row_goes_to_one_worker(self):
+        for number in range(3):
+            OutgoingEmail.enqueue('Code', f'Your code is {number}', f'user{number}@example.com')
+
+        # another worker takes the rows between this one's read and its UPDATE
+        update = QuerySet.update
+        competitor = None
+
+        def racing_update(queryset, **kwargs):
+            nonlocal competitor
+            if competitor is None:
+                competitor = []
+                competitor.extend(OutgoingEmail.claim(10))
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            self.assertEqual(OutgoingEmail.claim(10), [])
+        self.assertEqual(len(competitor), 3)
+        self.assertEqual(OutgoingEmail.claim(10), [])
+
+        # the claim lapses if that worker dies
+        OutgoingEmail.objects.update(next_attempt_at=now())
+        self.assertEqual(len(OutgoingEmail.claim(10)), 3)
+
+    def test_verification_codes_are_purged(self):
+        self.client.post(reverse('accounts:signup'), {'email': 'new@example.com'})
+        self.assertTrue(OutgoingEmail.objects.get().sensitive)
+        OutgoingEmail.enqueue('Welcome', 'Hello', 'new@example.com')
+
+        call_command('send_outbox', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn('verification code', mail.outbox[0].body)
+        self.assertEqual(list(OutgoingEmail.objects.values_list('subject', 'status')), [('Welcome', OutgoingEmail.SENT)])
+
+    @override_settings(EMAIL_BACKEND='apps.accounts.tests.FailingBackend')
+    def test_undeliverable_code_is_cleared(self):
+        email = OutgoingEmail.enqueue('Code', 'Your code is 1234', 'user@example.com', sensitive=True)
+        OutgoingEmail.objects.update(attempts=OutgoingEmail.MAX_ATTEMPTS - 1)
+
+        call_command('send_outbox', stdout=StringIO())
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.body), (OutgoingEmail.FAILED, ''))
+
+
+class GenerateUsernameTests(TestCase):
+
+    def test_collisions_take_one_query(self):
+        user = CustomUser(email='new@example.com')
+        prefix = 'user_deadbeef'
+        # bulk_create skips save(), which would rename user_* usernames
+        CustomUser.objects.bulk_create([
+            CustomUser(username=username, email=f'{username}@example.com')
+            for username in [prefix] + [f'{prefix}_{number}' for number in range(1, 6)]
+        ])
+
+        with mock.patch('apps.accounts.models.uuid.uuid4', return_value=mock.Mock(hex='deadbeef' * 4)):
+            with self.assertNumQueries(1):
+                user.generate_username()
+
+        self.assertEqual(user.username, f'{prefix}_6')
+
+
+class UserProvisionerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_currencies()
+        cls.card_type = CardType.objects.create(name='Visa')
+        create_user('taken')
+
+    def test_provisions_users_cards_and_categories(self):
+        lines = [
+            'email,username,first_name,default_currency,card_balance,password',
+            'Ann@Corp.com,ann,Ann,USD,250,',
+            'bob@corp.com,,Bob,,,S3cret-pass',
+            'Taken@example.com,,,,,',
+            'ann@corp.com,,,,,',
+            'not-an-email,,,,,',
+        ]
+        provisioner = UserProvisioner(self.card_type, default_password='Welcome-123', batch_size=2)
+        result = provisioner.run(parse_csv(lines))
+
+        self.assertEqual((result.created, result.skipped), (2, 3))
+        self.assertEqual(sorted(line for line, _ in result.errors), [4, 5, 6])
+
+        ann = CustomUser.objects.get(email='ann@corp.com')
+        self.assertEqual((ann.username, ann.auth_status, ann.default_currency), ('ann', 'done', 'USD'))
+        self.assertTrue(ann.check_password('Welcome-123'))
+        card = Card.objects.get(user=ann)
+        self.assertEqual((card.currency.code, card.balance, card.is_default), ('USD', Decimal('250'), True))
+        self.assertEqual(Category.objects.filter(user=ann).count(), len(STARTER_CATEGORIES))
+
+        bob = CustomUser.objects.get(email='bob@corp.com')
+        self.assertTrue(bob.username.startswith('user_'))
+        self.assertTrue(bob.check_password('S3cret-pass'))
+
+    def test_rows_are_checked_against_the_model_validators(self):
+        lines = [
+            'email,username,phone_number',
+            'ok@corp.com,okay,+998912345678',
+            'phone@corp.com,,12345',
+            'long@corp.com,' + 'x' * 151 + ',',
+            'short@corp.com,ab,',
+            'reserved@corp.com,user_1234,',
+        ]
+        result = UserProvisioner(self.card_type).run(parse_csv(lines))
+
+        self.assertEqual((result.created, result.skipped), (1, 4))
+        errors = dict(result.errors)
+        self.assertIn('phone_number:', errors[3])
+        self.assertIn('username: Ensure this value has at most 150 characters', errors[4])
+        self.assertIn('at least 3 characters', errors[5])
+        self.assertIn('cannot start with "user_"', errors[6])
+        self.assertEqual(list(CustomUser.objects.filter(email__endswith='@corp.com').values_list('username', flat=True)), ['okay'])
+
+    def test_values_past_the_header(self):
+        lines = [
+            'email,username',
+            'ann@corp.com,ann,',
+            'bob@corp.com,bob,Bob',
+        ]
+        result = UserProvisioner(self.card_type).run(parse_csv(lines))
+
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [(3, "Row has more values than the header: Bob")])
+
+    def test_command_rejects_unreadable_files(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as users_file:
+            users_file.write('email\ncaf\xe9@corp.com\n'.encode('latin-1'))
+            users_file.flush()
+            with self.assertRaisesMessage(CommandError, 'UTF-8'):
+                call_command('provision_users', users_file.name, card_type='Visa', stdout=StringIO())
+
+
+class AvailabilityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('alice')
+        CustomUser.objects.create(username='pending', email='pending@example.com', auth_status='new')
+
+    def setUp(self):
+        # background builds would use another connection that cannot see the test data
+        self.enterContext(mock.patch.object(availability, 'background', False))
+        availability.reset()
+        cache.clear()
+
+    def check_email(self, email):
+        return self.client.get(reverse('accounts:check_email'), {'email': email}).json()['available']
+
+    def test_unknown_email_needs_no_query(self):
+        self.check_email('warmup@example.com')
+        with self.assertNumQueries(0):
+            self.assertTrue(self.check_email('nobody@example.com'))
+
+    def test_taken_email_is_remembered(self):
+        self.assertFalse(self.check_email('Alice@Example.com'))
+        with self.assertNumQueries(0):
+            self.assertFalse(self.check_email('alice@example.com'))
+        self.assertTrue(self.check_email('pending@example.com'))
+
+    def test_new_users_are_seen_immediately(self):
+        self.assertTrue(self.check_email('bob@example.com'))
+        create_user('bob')
+        self.assertFalse(self.check_email('bob@example.com'))
+
+    def test_username_during_registration(self):
+        registering = CustomUser.objects.get(username='pending')
+        session = self.client.session
+        session['verification_user_id'] = registering.pk
+        session.save()
+
+        url = reverse('accounts:check_username')
+        self.assertFalse(self.client.get(url, {'username': 'alice'}).json()['available'])
+        self.assertTrue(self.client.get(url, {'username': 'pending'}).json()['available'])
+        self.assertTrue(self.client.get(url, {'username': 'carol'}).json()['available'])
+
+    def test_renamed_user_frees_the_old_values(self):
+        self.assertEqual(availability.username_owner('alice'), self.user.pk)
+        self.assertFalse(self.check_email('alice@example.com'))
+
+        self.user.username = 'alicia'
+        self.user.email = 'alicia@example.com'
+        self.user.save()
+
+        self.assertIsNone(availability.username_owner('alice'))
+        self.assertTrue(self.check_email('alice@example.com'))
+        self.assertEqual(availability.username_owner('alicia'), self.user.pk)
+
+    def test_filters_are_built_off_the_request(self):
+        availability.background = True
+        with mock.patch('threading.Thread') as thread:
+            with self.assertNumQueries(1):
+                self.assertTrue(self.check_email('nobody@example.com'))
+            self.assertTrue(self.check_email('nobody@example.com'))
+        thread.assert_called_once()
+        self.assertIsNone(availability._filters)
+
+    def test_old_filters_serve_while_rebuilding(self):
+        self.check_email('warmup@example.com')
+        availability.background = True
+
+        later = availability._built_at + 301
+        with mock.patch('threading.Thread') as thread, mock.patch('time.monotonic', return_value=later):
+            with self.assertNumQueries(0):
+                self.assertTrue(self.check_email('nobody@example.com'))
+        thread.assert_called_once()
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        values = [f'user{number}@example.com' for number in range(1000)]
+        for value in values:
+            bloom.add(value)
+
+        self.assertTrue(all(value in bloom for value in values))
+        false_positives = sum(f'other{number}@example.com' in bloom for number in range(1000))
+        self.assertLess(false_positives, 50)
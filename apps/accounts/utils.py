@@ -1,4 +1,3 @@
-from django.core.mail import send_mail
 from django.conf import settings
 
 
@@ -17,13 +16,7 @@ Best regards,
 Personal Finance Team
 """
 
-    from_email = settings.EMAIL_HOST_USER
-    recipient_list = [email]               
+    from .models import OutgoingEmail
 
-    send_mail(
-        subject,
-        message,
-        from_email,
-        recipient_list,
-        fail_silently=False,
-    )
\ No newline at end of file
+    # delivered by the send_outbox command
+    return OutgoingEmail.enqueue(subject, message, email, from_email=settings.EMAIL_HOST_USER, sensitive=True)
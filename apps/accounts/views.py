@@ -8,6 +8,7 @@ from django.http import JsonResponse
 from .models import CustomUser
 from .forms import *
 from .utils import send_verification_email
+from .availability import availability
 
 
 
@@ -31,14 +32,11 @@ def signup_view(request):
                 user = CustomUser.objects.create(email=email, auth_status='new')
 
             code = user.generate_verification_code()
-            
-            try:
-                send_verification_email(user.email, code)
-                request.session['verification_user_id'] = user.id
-                messages.success(request, 'Verification code sent to your email!')
-                return redirect('accounts:verify-code')
-            except Exception as e:
-                messages.error(request, f'Failed to send email: {str(e)}')
+            send_verification_email(user.email, code)
+
+            request.session['verification_user_id'] = user.id
+            messages.success(request, 'Verification code sent to your email!')
+            return redirect('accounts:verify-code')
     else:
         form = SignupForm()
     
@@ -93,12 +91,8 @@ def resend_code_view(request):
         return redirect('accounts:verify-code')
     
     code = user.generate_verification_code()
-    
-    try:
-        send_verification_email(user.email, code)
-        messages.success(request, 'New verification code sent to your email!')
-    except Exception as e:
-        messages.error(request, f'Failed to send email: {str(e)}')
+    send_verification_email(user.email, code)
+    messages.success(request, 'New verification code sent to your email!')
     
     return redirect('accounts:verify-code')
 
@@ -261,15 +255,16 @@ def delete_account_view(request):
 
 
 def check_username_availability(request):
-    if not request.user.is_authenticated:
+    # profile updates are logged in; registrations are identified by the verification session
+    user_id = request.user.id if request.user.is_authenticated else request.session.get('verification_user_id')
+    if not user_id:
         return JsonResponse({'error': 'Authentication required'}, status=401)
     
     username = request.GET.get('username')
     if not username:
         return JsonResponse({'error': 'Username parameter is required'}, status=400)
     
-    exists = CustomUser.objects.filter(username=username).exclude(id=request.user.id).exists()
-    return JsonResponse({'available': not exists})
+    return JsonResponse({'available': not availability.username_taken(username, exclude_id=user_id)})
 
 
 def check_email_availability(request):
@@ -277,11 +272,4 @@ def check_email_availability(request):
     if not email:
         return JsonResponse({'error': 'Email parameter is required'}, status=400)
     
-    user = CustomUser.objects.filter(email=email.lower()).first()
-    
-    if user and user.auth_status == 'done':
-        available = False
-    else:
-        available = True
-    
-    return JsonResponse({'available': available})
\ No newline at end of file
+    return JsonResponse({'available': not availability.email_taken(email)})
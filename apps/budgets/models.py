@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Sum
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from decimal import Decimal
@@ -69,7 +70,7 @@ class Budget(models.Model):
         return self.start_date
     
     def get_current_period_end(self):
-        period_start = self.get_current_period_end()
+        period_start = self.get_current_period_start()
 
         if self.period == 'daily':
             return period_start
@@ -87,24 +88,27 @@ class Budget(models.Model):
         return self.end_date or timezone.now().date()
     
     def get_spent_amount(self):
-        
-
         period_start = self.get_current_period_start()
         period_end = self.get_current_period_end()
 
-        transactions = Transaction.objects.filter(user = self.user, category= self.category, type='expense', date__gte=period_start, date_lte = period_end)
+        totals = Transaction.objects.filter(
+            user_id=self.user_id,
+            category_id=self.category_id,
+            type='expense',
+            date__gte=period_start,
+            date__lte=period_end
+        ).values('card__currency').annotate(total=Sum('amount')).order_by()
 
         total = Decimal('0.00')
 
-        for transaction in transactions:
-             
-            if transaction.card.currency == self.currency:
-                total += transaction.amount
+        for row in totals:
+            if row['card__currency'] == self.currency_id:
+                total += row['total']
             else:
-                 convert = ExchangeRate.convert(transaction.amount, transaction.card.currency, self.currency)
+                convert = ExchangeRate.convert(row['total'], row['card__currency'], self.currency_id)
 
-                 if convert:
-                      total += convert
+                if convert:
+                    total += convert
         return total
     
     def get_remaining_amount(self):
@@ -122,6 +126,9 @@ class Budget(models.Model):
     def is_exceeded(self):
         return self.get_spent_amount() > self.amount
     
+    def is_over_budget(self):
+        return self.is_exceeded()
+    
     def should_send_alert(self):
         if self.alert_sent:
             return False
@@ -1,3 +1,160 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
 from django.test import TestCase
+from django.urls import reverse
+
+from apps.budgets.models import Budget, BudgetHistory
+from apps.budgets.progress import BudgetProgressCalculator
+from apps.transactions.models import Category, Transaction
+from core.testing import QueryBudgetMixin, create_card, create_currencies, create_user
+
+
+class BudgetViewQueryTests(QueryBudgetMixin, TestCase):
+
+    # BudgetByPeriodView has no 'daily' bucket, so the seeded budgets avoid it
+    PERIODS = ('weekly', 'monthly', 'yearly')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.cards = [create_card(cls.user, cls.uzs, 'Main'), create_card(cls.user, cls.usd, 'Travel')]
+        cls.food = Category.objects.create(name='Food', type='expense')
+        cls.budget = cls.create_budget(cls.food, cls.uzs, 'monthly', Decimal('100000'))
+        Transaction.objects.create(user=cls.user, card=cls.cards[0], category=cls.food, type='expense', amount=Decimal('90000'), title='Groceries')
+        Transaction.objects.create(user=cls.user, card=cls.cards[1], category=cls.food, type='expense', amount=Decimal('2'), title='Snacks')
+
+    @classmethod
+    def create_budget(cls, category, currency, period, amount):
+        return Budget.objects.create(
+            user=cls.user,
+            category=category,
+            name=f'{category.name} {period}',
+            amount=amount,
+            currency=currency,
+            period=period,
+            start_date=date.today().replace(day=1),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def grow(self):
+        for number in range(12):
+            category = Category.objects.create(name=f'Custom {number}', type='expense', user=self.user)
+            budget = self.create_budget(category, (self.uzs, self.usd)[number % 2], self.PERIODS[number % 3], Decimal('50'))
+            for card in self.cards:
+                Transaction.objects.create(user=self.user, card=card, category=category, type='expense', amount=Decimal('45'), title=f'Spend {number}')
+                Transaction.objects.create(user=self.user, card=card, category=self.food, type='expense', amount=Decimal('1'), title=f'Snack {number}')
+            BudgetHistory.create_snapshot(self.budget)
+            BudgetHistory.create_snapshot(budget)
+
+    def test_budget_list(self):
+        self.assertQueryBudget(reverse('budgets:budget_list'), 6)
+
+    def test_budget_detail(self):
+        self.assertQueryBudget(reverse('budgets:budget_detail', kwargs={'pk': self.budget.pk}), 7)
+
+    def test_budget_overview(self):
+        self.assertQueryBudget(reverse('budgets:budget_overview'), 6)
+
+    def test_budget_active(self):
+        self.assertQueryBudget(reverse('budgets:budget_active'), 5)
+
+    def test_budget_alerts(self):
+        self.assertQueryBudget(reverse('budgets:budget_alerts'), 5)
+
+    def test_budget_by_category(self):
+        self.assertQueryBudget(reverse('budgets:budget_by_category'), 5)
+
+    def test_budget_by_period(self):
+        self.assertQueryBudget(reverse('budgets:budget_by_period'), 5)
+
+    def test_budget_progress(self):
+        self.assertQueryBudget(reverse('budgets:budget_progress', kwargs={'pk': self.budget.pk}), 8)
+
+    def test_budget_spending_history(self):
+        self.assertQueryBudget(reverse('budgets:budget_spending_history', kwargs={'pk': self.budget.pk}), 4)
+
+
+class SpendingDataMixin:
+    """Expenses in two card currencies, inside and outside the current month, plus noise."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.main = create_card(cls.user, cls.uzs, 'Main')
+        cls.travel = create_card(cls.user, cls.usd, 'Travel')
+        cls.food = Category.objects.create(name='Food', type='expense')
+        cls.rent = Category.objects.create(name='Rent', type='expense')
+        cls.today = date.today()
+        cls.last_month = cls.today.replace(day=1) - timedelta(days=1)
+
+        spend = [
+            (cls.main, cls.food, '90000', cls.today),
+            (cls.travel, cls.food, '2', cls.today),
+            (cls.main, cls.food, '5000', cls.last_month),
+            (cls.main, cls.rent, '7000', cls.today),
+        ]
+        for card, category, amount, on_date in spend:
+            Transaction.objects.create(user=cls.user, card=card, category=category, type='expense', amount=Decimal(amount), title='Spend', date=on_date)
+
+        other = create_user('bob')
+        Transaction.objects.create(user=other, card=create_card(other, cls.uzs), category=cls.food, type='expense', amount=Decimal('1000'), title='Spend')
+
+    def create_budget(self, period, currency=None, amount='100000'):
+        return Budget.objects.create(
+            user=self.user, category=self.food, name=f'Food {period}', amount=Decimal(amount),
+            currency=currency or self.uzs, period=period, start_date=self.today.replace(day=1),
+        )
+
+
+class BudgetSpendingTests(SpendingDataMixin, TestCase):
+
+    def test_spent_amount_converts_each_card_currency(self):
+        budget = self.create_budget('monthly')
+        self.assertEqual(budget.get_spent_amount(), Decimal('115200'))
+        self.assertEqual(budget.get_remaining_amount(), Decimal('-15200'))
+        self.assertTrue(budget.is_exceeded())
+
+    def test_spent_amount_is_one_query(self):
+        budget = self.create_budget('yearly')
+        budget.get_spent_amount()
+        with self.assertNumQueries(1):
+            spent = budget.get_spent_amount()
+        in_window = Decimal('5000') if self.last_month.year == self.today.year else Decimal('0')
+        self.assertEqual(spent, Decimal('115200') + in_window)
+
+
+class BudgetProgressCalculatorTests(SpendingDataMixin, TestCase):
+
+    def test_matches_the_per_budget_amounts(self):
+        budgets = [
+            self.create_budget('weekly', self.usd, '10'),
+            self.create_budget('monthly'),
+            self.create_budget('yearly', amount='500000'),
+            self.create_budget('monthly', amount='0'),
+        ]
+
+        calculated = BudgetProgressCalculator(Budget.objects.filter(pk__in=[b.pk for b in budgets]).order_by('pk')).calculate()
+
+        for budget, result in zip(budgets, calculated):
+            spent = budget.get_spent_amount()
+            self.assertEqual(result.spent, spent)
+            self.assertEqual(result.remaining, budget.amount - spent)
+            self.assertEqual(result.over_budget, spent > budget.amount)
+        self.assertEqual(calculated[1].percentage, Decimal('115.20'))
+        self.assertEqual(calculated[3].percentage, 0)
+
+    def test_one_query_for_any_number_of_budgets(self):
+        budgets = [self.create_budget(period) for period in ('weekly', 'monthly', 'yearly') for _ in range(3)]
+        BudgetProgressCalculator(budgets).calculate()
+
+        with self.assertNumQueries(1):
+            BudgetProgressCalculator(budgets).calculate()
 
-# Create your tests here.
+    def test_empty_page(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(BudgetProgressCalculator([]).calculate(), [])
@@ -13,6 +13,7 @@ from collections import defaultdict
 from .models import Budget
 from .forms import BudgetForm
 from .filters import BudgetFilter
+from .progress import BudgetProgressCalculator
 
 
 class BudgetListView(LoginRequiredMixin, ListView):
@@ -48,12 +49,7 @@ class BudgetListView(LoginRequiredMixin, ListView):
         context['filter'] = self.filterset
         context['search_query'] = self.request.GET.get('search', '')
         context['ordering'] = self.request.GET.get('ordering', '-created_at')
-        
-        for budget in context['budgets']:
-            budget.spent = budget.get_spent_amount()
-            budget.percentage = budget.get_percentage_used()
-            budget.remaining = budget.amount - budget.spent
-            budget.over_budget = budget.is_over_budget()
+        context['budgets'] = BudgetProgressCalculator(context['budgets']).calculate()
         
         return context
 
@@ -243,12 +239,7 @@ class BudgetActiveView(LoginRequiredMixin, ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        
-        for budget in context['budgets']:
-            budget.spent = budget.get_spent_amount()
-            budget.percentage = budget.get_percentage_used()
-            budget.remaining = budget.amount - budget.spent
-            budget.over_budget = budget.is_over_budget()
+        context['budgets'] = BudgetProgressCalculator(context['budgets']).calculate()
         
         return context
 
@@ -257,12 +248,12 @@ class BudgetOverviewView(LoginRequiredMixin, View):
     template_name = 'budgets/overview.html'
 
     def get(self, request):
-        budgets = Budget.objects.filter(
+        budgets = BudgetProgressCalculator(Budget.objects.filter(
             user=request.user,
             is_active=True
-        ).select_related('category', 'currency')
+        ).select_related('category', 'currency')).calculate()
         
-        if not budgets.exists():
+        if not budgets:
             context = {
                 'total_budgets': 0,
                 'active_budgets': 0,
@@ -282,33 +273,27 @@ class BudgetOverviewView(LoginRequiredMixin, View):
         for bdgt in budgets:
             if bdgt.currency == u_crncy:
                 budget_amount = bdgt.amount
-                spent_amount = bdgt.get_spent_amount()
+                spent_amount = bdgt.spent
             else:
                 budget_amount = ExchangeRate.convert(bdgt.amount, bdgt.currency, u_crncy) or bdgt.amount
-                spent_amount_original = bdgt.get_spent_amount()
-                spent_amount = ExchangeRate.convert(spent_amount_original, bdgt.currency, u_crncy) or spent_amount_original
+                spent_amount = ExchangeRate.convert(bdgt.spent, bdgt.currency, u_crncy) or bdgt.spent
             
             total_budget_amount += budget_amount
             total_spent += spent_amount
             
-            percentage = bdgt.get_percentage_used()
-            if bdgt.is_over_budget():
+            if bdgt.over_budget:
                 budgets_over_limit += 1
-            elif percentage >= bdgt.alert_threshold:
+            elif bdgt.percentage >= bdgt.alert_threshold:
                 budgets_at_warning += 1
             
-            bdgt.spent = bdgt.get_spent_amount()
-            bdgt.percentage = percentage
-            bdgt.over_budget = bdgt.is_over_budget()
-            bdgt.remaining = bdgt.amount - bdgt.spent
             budgets_data.append(bdgt)
         
         total_remaining = total_budget_amount - total_spent
         overall_percentage = (total_spent / total_budget_amount * 100) if total_budget_amount > 0 else 0
         
         context = {
-            'total_budgets': budgets.count(),
-            'active_budgets': budgets.filter(is_active=True).count(),
+            'total_budgets': len(budgets),
+            'active_budgets': len(budgets),
             'total_budget_amount': total_budget_amount,
             'total_spent': total_spent,
             'total_remaining': total_remaining,
@@ -327,18 +312,18 @@ class BudgetAlertsView(LoginRequiredMixin, View):
     template_name = 'budgets/alerts.html'
 
     def get(self, request):
-        budgets = Budget.objects.filter(
+        budgets = BudgetProgressCalculator(Budget.objects.filter(
             user=request.user,
             is_active=True
-        ).select_related('category', 'currency')
+        ).select_related('category', 'currency')).calculate()
         
         alerts = []
         
         for budget in budgets:
-            percentage = budget.get_percentage_used()
+            percentage = budget.percentage
             
-            if budget.is_over_budget():
-                over_amount = budget.get_spent_amount() - budget.amount
+            if budget.over_budget:
+                over_amount = budget.spent - budget.amount
                 alerts.append({
                     'budget': budget,
                     'alert_type': 'over_budget',
@@ -347,7 +332,7 @@ class BudgetAlertsView(LoginRequiredMixin, View):
                     'percentage_used': percentage
                 })
             elif percentage >= budget.alert_threshold:
-                remaining = budget.amount - budget.get_spent_amount()
+                remaining = budget.remaining
                 alerts.append({
                     'budget': budget,
                     'alert_type': 'warning',
@@ -393,19 +378,14 @@ class BudgetByCategoryView(LoginRequiredMixin, View):
     template_name = 'budgets/by_category.html'
 
     def get(self, request):
-        budgets = Budget.objects.filter(
+        budgets = BudgetProgressCalculator(Budget.objects.filter(
             user=request.user,
             is_active=True
-        ).select_related('category', 'currency')
+        ).select_related('category', 'currency')).calculate()
         
         categories_dict = defaultdict(list)
         
         for budget in budgets:
-            budget.spent = budget.get_spent_amount()
-            budget.percentage = budget.get_percentage_used()
-            budget.over_budget = budget.is_over_budget()
-            budget.remaining = budget.amount - budget.spent
-            
             categories_dict[budget.category.id].append(budget)
         
         categories_list = []
@@ -428,10 +408,10 @@ class BudgetByPeriodView(LoginRequiredMixin, View):
     template_name = 'budgets/by_period.html'
 
     def get(self, request):
-        budgets = Budget.objects.filter(
+        budgets = BudgetProgressCalculator(Budget.objects.filter(
             user=request.user,
             is_active=True
-        ).select_related('category', 'currency')
+        ).select_related('category', 'currency')).calculate()
         
         periods = {
             'weekly': [],
@@ -440,11 +420,6 @@ class BudgetByPeriodView(LoginRequiredMixin, View):
         }
         
         for budget in budgets:
-            budget.spent = budget.get_spent_amount()
-            budget.percentage = budget.get_percentage_used()
-            budget.over_budget = budget.is_over_budget()
-            budget.remaining = budget.amount - budget.spent
-            
             periods[budget.period].append(budget)
         
         context = {
@@ -464,7 +439,7 @@ class BudgetSpendingHistoryView(LoginRequiredMixin, DetailView):
         return Budget.objects.filter(user=self.request.user).select_related('category', 'currency')
 
     def get_context_data(self, **kwargs):
-        from apps.transactions.models import Transaction
+        from apps.transactions.models import SpendingRollup
         from django.db.models.functions import TruncMonth
         
         context = super().get_context_data(**kwargs)
@@ -475,7 +450,7 @@ class BudgetSpendingHistoryView(LoginRequiredMixin, DetailView):
         today = timezone.now().date()
         start_date = today - timedelta(days=30 * months_back)
         
-        transactions = Transaction.objects.filter(
+        transactions = SpendingRollup.objects.filter(
             user=self.request.user,
             category=budget.category,
             type='expense',
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Card, CardLedgerEntry
+
+
+def _card_id(card):
+    return getattr(card, 'pk', card)
+
+
+def balance_delta(amount, transaction_type):
+    if transaction_type == 'income':
+        return amount
+    if transaction_type == 'expense':
+        return -amount
+    return 0
+
+
+def adjust_balance(card, amount, kind='adjustment', object_id=None):
+    """
+    Add ``amount`` (negative to subtract) to a card balance with a single
+    ``UPDATE ... SET balance = balance + amount``, so concurrent writers
+    never overwrite each other, and append the change to the card ledger.
+    Accepts a Card or its primary key; a Card instance gets its in-memory
+    balance moved by the same amount.
+    """
+    card_id = _card_id(card)
+    with transaction.atomic():
+        Card.objects.filter(pk=card_id).update(
+            balance=F('balance') + amount,
+            updated_at=timezone.now()
+        )
+        if amount:
+            CardLedgerEntry.record(card_id, amount, kind, object_id)
+
+    if isinstance(card, Card):
+        card.balance += amount
+
+
+def set_balance(card, new_balance):
+    """Overwrite a card balance, recording the difference as a manual adjustment."""
+    with transaction.atomic():
+        old_balance = Card.objects.select_for_update().values_list('balance', flat=True).get(pk=card.pk)
+        Card.objects.filter(pk=card.pk).update(balance=new_balance, updated_at=timezone.now())
+        if new_balance != old_balance:
+            CardLedgerEntry.record(card.pk, new_balance - old_balance, 'adjustment')
+    card.balance = new_balance
+
+
+def withdraw(card, amount, kind='adjustment', object_id=None):
+    """Lock the card row, check it can cover ``amount`` and subtract it."""
+    with transaction.atomic():
+        locked_card = Card.objects.select_for_update().only('balance').get(pk=_card_id(card))
+        if not locked_card.can_withdraw(amount):
+            raise ValueError("Insufficient balance")
+
+        adjust_balance(card, -amount, kind=kind, object_id=object_id)
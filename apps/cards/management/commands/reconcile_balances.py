@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.models import CustomUser
+from apps.cards.reconciliation import BalanceReconciler
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare every card balance with initial_balance + incomes - expenses "
+        "+/- transfers + manual adjustments and report the drift. With --repair, "
+        "set drifted cards to the expected balance and record the correction "
+        "in the card ledger."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help="Fix drifted balances instead of only reporting them")
+        parser.add_argument('--user', help="Only check cards of this username")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Cards per query/UPDATE (default: 5000)")
+        parser.add_argument('--show', type=int, default=20, help="How many drifted cards to list (default: 20)")
+
+    def handle(self, *args, **options):
+        reconciler = BalanceReconciler(repair=options['repair'], chunk_size=options['chunk_size'], keep=options['show'])
+        if options['user']:
+            try:
+                user = CustomUser.objects.get(username=options['user'])
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+            reconciler.cards = reconciler.cards.filter(user=user)
+
+        result = reconciler.run()
+
+        for row in result.drifted:
+            self.stdout.write(
+                f"Card {row['pk']} ({row['card_name']}, user {row['user_id']}): "
+                f"balance {row['balance']} {row['currency__code']}, expected {row['expected_balance']}, drift {row['drift']:+}"
+            )
+
+        summary = (
+            f"Checked {result.checked} card(s) in {result.seconds:.2f}s "
+            f"({result.cards_per_second:,.0f} cards/s), {result.drift_count} drifted"
+        )
+        if options['repair']:
+            self.stdout.write(self.style.SUCCESS(f"{summary}, {result.repaired} repaired"))
+        elif result.drift_count:
+            self.stdout.write(self.style.WARNING(f"{summary}; run with --repair to fix them"))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
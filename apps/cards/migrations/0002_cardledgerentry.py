@@ -0,0 +1,48 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_ledgers(apps, schema_editor):
+    # earlier history is not recorded anywhere, so ledgers start at today's balance
+    Card = apps.get_model('cards', 'Card')
+    CardLedgerEntry = apps.get_model('cards', 'CardLedgerEntry')
+
+    CardLedgerEntry.objects.bulk_create(
+        (
+            CardLedgerEntry(card_id=card_id, kind='opening', amount=balance, balance=balance)
+            for card_id, balance in Card.objects.values_list('id', 'balance').iterator(chunk_size=1000)
+        ),
+        batch_size=1000
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('kind', models.CharField(choices=[('opening', 'Opening balance'), ('transaction', 'Transaction'), ('import', 'Import'), ('transfer', 'Transfer'), ('adjustment', 'Manual adjustment')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField(blank=True, help_text='Transaction or transfer behind the entry', null=True)),
+                ('amount', models.DecimalField(decimal_places=2, help_text="Change in card's currency", max_digits=15)),
+                ('balance', models.DecimalField(decimal_places=2, help_text='Card balance after this entry', max_digits=15)),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='cards.card')),
+            ],
+            options={
+                'verbose_name': 'Card Ledger Entry',
+                'verbose_name_plural': 'Card Ledger Entries',
+                'db_table': 'card_ledger_entries',
+                'ordering': ['timestamp', 'id'],
+                'indexes': [models.Index(fields=['card', 'timestamp'], name='card_ledger_card_id_037cc0_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledgers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0002_cardledgerentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cardledgerentry',
+            name='kind',
+            field=models.CharField(choices=[('opening', 'Opening balance'), ('transaction', 'Transaction'), ('import', 'Import'), ('transfer', 'Transfer'), ('adjustment', 'Manual adjustment'), ('reconciliation', 'Reconciliation')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:12
+
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Case, F, Sum, When
+
+
+def baseline_initial_balances(apps, schema_editor):
+    # Cards created before the ledger never had initial_balance recorded.
+    # Take the opening ledger entry as the truth and back out everything
+    # recorded before it, so reconciliation only reports drift from then on.
+    # For cards opened since, nothing predates the opening entry and
+    # initial_balance comes out as the opening balance.
+    Card = apps.get_model('cards', 'Card')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    CardTransfer = apps.get_model('transfers', 'CardTransfer')
+
+    before_opening = defaultdict(int)
+    transactions = Transaction.objects.filter(
+        card__ledger_entries__kind='opening',
+        created_at__lte=F('card__ledger_entries__timestamp'),
+    ).values('card_id').annotate(net=Sum(Case(
+        When(type='income', then=F('amount')),
+        When(type='expense', then=-F('amount')),
+    ))).order_by()
+    for row in transactions:
+        before_opening[row['card_id']] += row['net'] or 0
+
+    for card_field, amount_field, sign in (('from_card', 'amount', -1), ('to_card', 'converted_amount', 1)):
+        transfers = CardTransfer.objects.filter(**{
+            f'{card_field}__ledger_entries__kind': 'opening',
+            'created_at__lte': F(f'{card_field}__ledger_entries__timestamp'),
+        }).values(f'{card_field}_id').annotate(total=Sum(amount_field)).order_by()
+        for row in transfers:
+            before_opening[row[f'{card_field}_id']] += sign * row['total']
+
+    openings = Card.objects.filter(ledger_entries__kind='opening').values_list('id', 'initial_balance', 'ledger_entries__balance')
+    batch = []
+    for card_id, initial_balance, opening_balance in openings.iterator(chunk_size=1000):
+        baseline = opening_balance - before_opening.get(card_id, 0)
+        if baseline != initial_balance:
+            batch.append(Card(id=card_id, initial_balance=baseline))
+        if len(batch) >= 1000:
+            Card.objects.bulk_update(batch, ['initial_balance'])
+            batch = []
+    Card.objects.bulk_update(batch, ['initial_balance'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0003_cardledgerentry_reconciliation'),
+        ('transactions', '0003_transactionsearchtoken'),
+        ('transfers', '0003_alter_cardtransfer_exchange_rate'),
+    ]
+
+    operations = [
+        migrations.RunPython(baseline_initial_balances, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 from apps.accounts.models import CustomUser
 
@@ -45,26 +47,21 @@ class ExchangeRate(models.Model):
     
     @classmethod
     def get_latest_rate(cls, from_currency, to_currency):
-        if from_currency == to_currency:
-            return Decimal('1.0')
-        
-        rate = cls.objects.filter(
-            from_currency=from_currency,
-            to_currency = to_currency
-        ).order_by('-date').first()
+        from .rates import rate_matrix
 
-        if rate:
-            return rate.rate
-        
-        reverse_rate = cls.objects.filter(
-            from_currency=to_currency,
-            to_currency=from_currency
-        ).order_by('-date').first()
+        return rate_matrix.get_rate(from_currency, to_currency)
+    
+    @classmethod
+    def get_rate_on(cls, from_currency, to_currency, on_date):
+        from .rates import rate_history
 
-        if reverse_rate:
-            return Decimal('1.0')/reverse_rate.rate
-        
-        return None
+        return rate_history.get_rate(from_currency, to_currency, on_date)
+    
+    @classmethod
+    def rates_for_dates(cls, pairs_and_dates):
+        from .rates import rate_history
+
+        return rate_history.get_rates(pairs_and_dates)
     
     @classmethod
     def convert(cls, amount, from_currency, to_currency):
@@ -159,13 +156,10 @@ class Card(models.Model):
         
         return ExchangeRate.convert(self.balance, self.currency, target_currency)
     
-    def update_balance(self, amount, transaction_type):
-        if transaction_type == 'income':
-            self.balance += amount
-        elif transaction_type == 'expense':
-            self.balance -= amount
+    def update_balance(self, amount, transaction_type, kind='transaction', object_id=None):
+        from .balances import adjust_balance, balance_delta
 
-        self.save()
+        adjust_balance(self, balance_delta(amount, transaction_type), kind=kind, object_id=object_id)
 
     def can_withdraw(self, amount):
         return self.balance >= amount
@@ -174,8 +168,95 @@ class Card(models.Model):
         if self.is_default:
             Card.objects.filter(user=self.user, is_default=True).exclude(pk=self.pk).update(is_default=False)
         
+        is_new = self.pk is None
         super().save(*args, **kwargs)
 
+        if is_new:
+            CardLedgerEntry.open_many([self])
+
+
+class CardLedgerEntry(models.Model):
+    """
+    Append-only history of card balance changes. ``balance`` is the card
+    balance right after the entry, so the balance at any moment is the
+    ``balance`` of the last entry before it.
+    """
+    KIND_CHOICES = [
+        ('opening', 'Opening balance'),
+        ('transaction', 'Transaction'),
+        ('import', 'Import'),
+        ('transfer', 'Transfer'),
+        ('adjustment', 'Manual adjustment'),
+        ('reconciliation', 'Reconciliation'),
+    ]
+
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='ledger_entries')
+    timestamp = models.DateTimeField(default=timezone.now)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField(null=True, blank=True, help_text="Transaction or transfer behind the entry")
+    amount = models.DecimalField(max_digits=15, decimal_places=2, help_text="Change in card's currency")
+    balance = models.DecimalField(max_digits=15, decimal_places=2, help_text="Card balance after this entry")
+
+    class Meta:
+        db_table = 'card_ledger_entries'
+        verbose_name = 'Card Ledger Entry'
+        verbose_name_plural = 'Card Ledger Entries'
+        ordering = ['timestamp', 'id']
+        indexes = [
+            models.Index(fields=['card', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.card_id} {self.kind} {self.amount:+} -> {self.balance}"
+
+    @classmethod
+    def record(cls, card_id, amount, kind, object_id=None):
+        """
+        Append an entry for a balance change that was just written. Must run
+        in the transaction that updated the card row, so the balance read
+        back is the one this change produced.
+        """
+        balance = Card.objects.filter(pk=card_id).values_list('balance', flat=True).get()
+        return cls.objects.create(card_id=card_id, amount=amount, balance=balance, kind=kind, object_id=object_id)
+
+    @classmethod
+    def open_many(cls, cards):
+        """Opening entries for newly created cards, e.g. after ``bulk_create``."""
+        return cls.objects.bulk_create([
+            cls(card_id=card.pk, kind='opening', amount=card.balance, balance=card.balance)
+            for card in cards
+        ])
+
+    @classmethod
+    def balance_as_of(cls, card, moment):
+        """Card balance at ``moment``, from one indexed lookup."""
+        entry = cls.objects.filter(card=card, timestamp__lte=moment).order_by('-timestamp', '-id').first()
+        if entry is not None:
+            return entry.balance
+        return Decimal('0')
+
+    @classmethod
+    def daily_balances(cls, card, days=30):
+        """
+        Closing balance for each of the last ``days`` days, oldest first,
+        as ``[(date, balance), ...]``.
+        """
+        today = timezone.localdate()
+        start = today - timedelta(days=days - 1)
+        start_at = timezone.make_aware(datetime.combine(start, time.min))
+
+        balance = cls.balance_as_of(card, start_at)
+        closing = {}
+        for timestamp, entry_balance in cls.objects.filter(card=card, timestamp__gte=start_at).values_list('timestamp', 'balance'):
+            closing[timezone.localdate(timestamp)] = entry_balance
+
+        history = []
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            balance = closing.get(day, balance)
+            history.append((day, balance))
+        return history
+
 
 
 
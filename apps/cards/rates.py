@@ -0,0 +1,248 @@
+import threading
+import time
+import uuid
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery
+
+
+RATES_VERSION_KEY = 'cards:exchange_rates:version'
+
+
+def _currency_id(currency):
+    return getattr(currency, 'pk', currency)
+
+
+def _as_date(value):
+    # the same values a DateField accepts: dates, datetimes and ISO strings
+    return models.DateField().to_python(value)
+
+
+class VersionedRateTable:
+    """
+    Process-local copy of exchange rate data.
+
+    A version token kept in the cache lets every process notice when another
+    one has changed a rate; the table is reloaded on the next lookup. The
+    token is read at most once every ``VERSION_CHECK_INTERVAL`` seconds, so
+    lookups do not pay a cache round trip each. It only reaches other
+    processes when the cache is shared (see ``CACHES``), so a table is also
+    reloaded once it is ``MAX_AGE`` seconds old.
+    """
+
+    MAX_AGE = 300
+    VERSION_CHECK_INTERVAL = 5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._table = None
+        self._resolved = {}
+        self._version = None
+        self._loaded_at = 0
+        self._checked_at = 0
+
+    def _shared_version(self):
+        version = cache.get(RATES_VERSION_KEY)
+        if version is None:
+            cache.add(RATES_VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(RATES_VERSION_KEY)
+        return version
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _is_current(self, version):
+        return (
+            self._table is not None
+            and self._version == version
+            and time.monotonic() - self._loaded_at < self.MAX_AGE
+        )
+
+    def _get_table(self):
+        table = self._table
+        if table is not None and time.monotonic() - self._checked_at < self.VERSION_CHECK_INTERVAL:
+            return table
+
+        version = self._shared_version()
+        if not self._is_current(version):
+            with self._lock:
+                if not self._is_current(version):
+                    self._table = self._load()
+                    self._resolved = {}
+                    self._version = version
+                    self._loaded_at = time.monotonic()
+        self._checked_at = time.monotonic()
+        return self._table
+
+    def _pivots(self, table, from_id, to_id):
+        return sorted({currency_id for pair in table for currency_id in pair} - {from_id, to_id})
+
+    def invalidate(self):
+        with self._lock:
+            self._table = None
+            self._resolved = {}
+
+
+class RateMatrix(VersionedRateTable):
+    """
+    Latest exchange rate for every (from, to) pair, loaded with one query.
+
+    Answers direct, reverse and one-hop triangulated lookups from memory.
+    """
+
+    def _load(self):
+        from apps.cards.models import ExchangeRate
+
+        latest_date = ExchangeRate.objects.filter(
+            from_currency=OuterRef('from_currency'),
+            to_currency=OuterRef('to_currency')
+        ).order_by('-date').values('date')[:1]
+
+        rows = ExchangeRate.objects.filter(
+            date=Subquery(latest_date)
+        ).values_list('from_currency_id', 'to_currency_id', 'rate')
+
+        return {(from_id, to_id): rate for from_id, to_id, rate in rows}
+
+    def _pair_rate(self, table, from_id, to_id):
+        rate = table.get((from_id, to_id))
+        if rate:
+            return rate
+
+        reverse_rate = table.get((to_id, from_id))
+        if reverse_rate:
+            return Decimal('1.0') / reverse_rate
+
+        return None
+
+    def get_rate(self, from_currency, to_currency):
+        from_id = _currency_id(from_currency)
+        to_id = _currency_id(to_currency)
+
+        if from_id == to_id:
+            return Decimal('1.0')
+
+        table = self._get_table()
+        key = (from_id, to_id)
+        if key in self._resolved:
+            return self._resolved[key]
+
+        rate = self._pair_rate(table, from_id, to_id)
+
+        if rate is None:
+            for pivot_id in self._pivots(table, from_id, to_id):
+                first_leg = self._pair_rate(table, from_id, pivot_id)
+                if first_leg is None:
+                    continue
+                second_leg = self._pair_rate(table, pivot_id, to_id)
+                if second_leg is not None:
+                    rate = first_leg * second_leg
+                    break
+
+        self._resolved[key] = rate
+        return rate
+
+
+class RateHistory(VersionedRateTable):
+    """
+    Full rate history kept as a sorted date array per (from, to) pair.
+
+    A rate "on" a date is the most recent one recorded on or before it,
+    found with a binary search, so any number of lookups costs one query.
+    """
+
+    def _load(self):
+        from apps.cards.models import ExchangeRate
+
+        rows = ExchangeRate.objects.order_by(
+            'from_currency_id', 'to_currency_id', 'date'
+        ).values_list('from_currency_id', 'to_currency_id', 'date', 'rate')
+
+        table = {}
+        for from_id, to_id, rate_date, rate in rows:
+            dates, rates = table.setdefault((from_id, to_id), ([], []))
+            dates.append(rate_date)
+            rates.append(rate)
+        return table
+
+    def _rate_in_series(self, table, from_id, to_id, on_date):
+        series = table.get((from_id, to_id))
+        if not series:
+            return None
+
+        dates, rates = series
+        index = bisect_right(dates, on_date) - 1
+        if index < 0:
+            return None
+        return rates[index]
+
+    def _pair_rate(self, table, from_id, to_id, on_date):
+        rate = self._rate_in_series(table, from_id, to_id, on_date)
+        if rate:
+            return rate
+
+        reverse_rate = self._rate_in_series(table, to_id, from_id, on_date)
+        if reverse_rate:
+            return Decimal('1.0') / reverse_rate
+
+        return None
+
+    def get_rate(self, from_currency, to_currency, on_date):
+        from_id = _currency_id(from_currency)
+        to_id = _currency_id(to_currency)
+
+        if from_id == to_id:
+            return Decimal('1.0')
+
+        table = self._get_table()
+        on_date = _as_date(on_date)
+
+        rate = self._pair_rate(table, from_id, to_id, on_date)
+        if rate is not None:
+            return rate
+
+        pivots = self._resolved.get((from_id, to_id))
+        if pivots is None:
+            pivots = self._resolved[(from_id, to_id)] = self._pivots(table, from_id, to_id)
+
+        for pivot_id in pivots:
+            first_leg = self._pair_rate(table, from_id, pivot_id, on_date)
+            if first_leg is None:
+                continue
+            second_leg = self._pair_rate(table, pivot_id, to_id, on_date)
+            if second_leg is not None:
+                return first_leg * second_leg
+
+        return None
+
+    def get_rates(self, pairs_and_dates):
+        return {
+            (from_currency, to_currency, on_date): self.get_rate(from_currency, to_currency, on_date)
+            for from_currency, to_currency, on_date in pairs_and_dates
+        }
+
+
+def bump_rates_version():
+    cache.set(RATES_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _drop_rate_tables():
+    rate_matrix.invalidate()
+    rate_history.invalidate()
+    bump_rates_version()
+
+
+def invalidate_rates():
+    """
+    Drop the local rate tables and bump the shared version once the change
+    commits. Doing it earlier would let a lookup later in the same
+    transaction load rates that a rollback then discards.
+    """
+    transaction.on_commit(_drop_rate_tables)
+
+
+rate_matrix = RateMatrix()
+rate_history = RateHistory()
@@ -0,0 +1,146 @@
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Max, Min, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Card, CardLedgerEntry
+
+
+MONEY = DecimalField(max_digits=15, decimal_places=2)
+ZERO = Value(Decimal('0'), output_field=MONEY)
+
+
+def _total(queryset, expression):
+    """Correlated ``SUM`` of ``expression`` over ``queryset`` rows for the outer card, 0 when empty."""
+    total = queryset.order_by().values('card_ref').annotate(total=Sum(expression)).values('total')
+    return Coalesce(Subquery(total), ZERO)
+
+
+def expected_balance():
+    """
+    Expression for the balance a card's history adds up to:
+
+        initial_balance + incomes - expenses
+        - transfers out + transfers received
+        + manual adjustments recorded in the ledger
+
+    Each term is a correlated subquery on an indexed card column. Cards
+    created before the ledger have ``initial_balance`` backed out of their
+    opening ledger entry (cards migration 0004), so their pre-ledger
+    history is taken as correct.
+    """
+    from apps.transactions.models import Transaction
+    from apps.transfers.models import CardTransfer
+
+    signed_amount = Case(
+        When(type='income', then=F('amount')),
+        When(type='expense', then=-F('amount')),
+        default=ZERO,
+    )
+    transactions = _total(Transaction.objects.filter(card=OuterRef('pk')).annotate(card_ref=F('card_id')), signed_amount)
+    sent = _total(CardTransfer.objects.filter(from_card=OuterRef('pk')).annotate(card_ref=F('from_card_id')), F('amount'))
+    received = _total(CardTransfer.objects.filter(to_card=OuterRef('pk')).annotate(card_ref=F('to_card_id')), F('converted_amount'))
+    adjustments = _total(CardLedgerEntry.objects.filter(card=OuterRef('pk'), kind='adjustment').annotate(card_ref=F('card_id')), F('amount'))
+
+    return ExpressionWrapper(F('initial_balance') + transactions - sent + received + adjustments, output_field=MONEY)
+
+
+def expected_balances(cards=None):
+    """Annotate cards with ``expected_balance`` and ``drift`` (``balance - expected_balance``)."""
+    cards = Card.objects.all() if cards is None else cards
+    return cards.annotate(expected_balance=expected_balance()).annotate(
+        drift=ExpressionWrapper(F('balance') - F('expected_balance'), output_field=MONEY),
+    )
+
+
+@dataclass
+class ReconciliationResult:
+    checked: int = 0
+    drift_count: int = 0
+    repaired: int = 0
+    total_drift: Decimal = Decimal('0')
+    drifted: list = field(default_factory=list)
+    seconds: float = 0
+
+    @property
+    def cards_per_second(self):
+        return self.checked / self.seconds if self.seconds else 0
+
+
+class BalanceReconciler:
+    """
+    Compares every card balance with ``expected_balances`` and, when
+    ``repair`` is set, moves drifted cards to their expected balance.
+
+    Cards are walked in primary key ranges of ``chunk_size``; each range is
+    one grouped query returning only the drifted rows, and a repair is one
+    ``UPDATE`` per range plus a bulk insert of ``reconciliation`` ledger
+    entries. The rows are locked before the drift is read, so the entries
+    match what the ``UPDATE`` writes. Those entries are left out of the
+    expected balance, so running the repair twice changes nothing.
+    """
+
+    def __init__(self, repair=False, chunk_size=5000, cards=None, keep=100):
+        self.repair = repair
+        self.chunk_size = chunk_size
+        self.cards = Card.objects.all() if cards is None else cards
+        self.keep = keep
+
+    def _drifted(self, cards):
+        # compared here rather than in a WHERE clause, which would make the
+        # database evaluate every subquery twice
+        rows = expected_balances(cards).order_by('pk').values_list('pk', 'balance', 'expected_balance')
+        drifted = {pk: balance - expected for pk, balance, expected in rows if balance != expected}
+        if not drifted:
+            return []
+
+        details = Card.objects.filter(pk__in=drifted).order_by('pk').values('pk', 'user_id', 'card_name', 'currency__code', 'balance')
+        return [
+            dict(row, expected_balance=row['balance'] - drifted[row['pk']], drift=drifted[row['pk']])
+            for row in details
+        ]
+
+    def _repair(self, cards):
+        with transaction.atomic():
+            # lock first so no balance update lands between reading and writing
+            list(cards.select_for_update().values_list('pk', flat=True))
+            rows = self._drifted(cards)
+            if not rows:
+                return rows
+
+            Card.objects.filter(pk__in=[row['pk'] for row in rows]).update(
+                balance=expected_balance(),
+                updated_at=timezone.now(),
+            )
+            CardLedgerEntry.objects.bulk_create([
+                CardLedgerEntry(card_id=row['pk'], kind='reconciliation', amount=-row['drift'], balance=row['expected_balance'])
+                for row in rows
+            ])
+
+            from apps.dashboard.snapshot import invalidate_snapshot
+            for user_id in {row['user_id'] for row in rows}:
+                invalidate_snapshot(user_id)
+        return rows
+
+    def run(self):
+        result = ReconciliationResult()
+        started = time.perf_counter()
+
+        bounds = self.cards.aggregate(low=Min('pk'), high=Max('pk'), count=Count('pk'))
+        if bounds['low'] is not None:
+            for start in range(bounds['low'], bounds['high'] + 1, self.chunk_size):
+                chunk = self.cards.filter(pk__gte=start, pk__lt=start + self.chunk_size)
+                rows = self._repair(chunk) if self.repair else self._drifted(chunk)
+                result.drift_count += len(rows)
+                result.total_drift += sum(row['drift'] for row in rows)
+                result.drifted.extend(rows[:self.keep - len(result.drifted)])
+                if self.repair:
+                    result.repaired += len(rows)
+            result.checked = bounds['count']
+
+        result.seconds = time.perf_counter() - started
+        return result
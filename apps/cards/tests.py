@@ -1,3 +1,375 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.cards.balances import adjust_balance, set_balance, withdraw
+from apps.cards.models import Card, CardLedgerEntry, CardType, Currency, ExchangeRate
+from apps.cards.rates import bump_rates_version, rate_history, rate_matrix
+from apps.cards.reconciliation import BalanceReconciler, expected_balances
+from apps.transactions.importers import TransactionImporter
+from apps.transactions.models import Category, Transaction
+from apps.transfers.models import CardTransfer
+from core.testing import QueryBudgetMixin, create_card, create_currencies, create_user
+
+
+class CardViewQueryTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.card = create_card(cls.user, cls.uzs, 'Main')
+        create_card(cls.user, cls.usd, 'Travel')
+        cls.food = Category.objects.create(name='Food', type='expense')
+        cls.salary = Category.objects.create(name='Salary', type='income')
+        Transaction.objects.create(user=cls.user, card=cls.card, category=cls.food, type='expense', amount=Decimal('10'), title='Lunch')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def grow(self):
+        for number in range(10):
+            currency = (self.uzs, self.usd, self.eur)[number % 3]
+            card = create_card(self.user, currency, f'Card {number}')
+            category = Category.objects.create(name=f'Custom {number}', type='expense', user=self.user)
+            Transaction.objects.create(user=self.user, card=self.card, category=category, type='expense', amount=Decimal('5'), title=f'Item {number}')
+            Transaction.objects.create(user=self.user, card=card, category=self.salary, type='income', amount=Decimal('50'), title=f'Pay {number}')
+            Currency.objects.create(code=f'X{number:02d}', name=f'Currency {number}', symbol='x')
+            CardType.objects.create(name=f'Type {number}')
+
+    def test_card_list(self):
+        self.assertQueryBudget(reverse('cards:cards_list'), 6)
+
+    def test_card_detail(self):
+        self.assertQueryBudget(reverse('cards:card_detail', kwargs={'pk': self.card.pk}), 9)
+
+    def test_currency_list(self):
+        self.assertQueryBudget(reverse('cards:currency_list'), 3)
+
+    def test_card_types(self):
+        self.assertQueryBudget(reverse('cards:card_types'), 3)
+
+
+class ExchangeRateLookupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.today = timezone.localdate()
+        cls.latest = ExchangeRate.objects.get(from_currency=cls.usd, to_currency=cls.uzs)
+        for days, rate in ((10, '12000'), (5, '12500')):
+            ExchangeRate.objects.create(from_currency=cls.usd, to_currency=cls.uzs, rate=Decimal(rate), date=cls.today - timedelta(days=days))
+
+    def setUp(self):
+        cache.clear()
+        rate_matrix.invalidate()
+        rate_history.invalidate()
+        # tables loaded under a patched clock would otherwise outlive the test
+        self.addCleanup(rate_history.invalidate)
+        self.addCleanup(rate_matrix.invalidate)
+
+    def test_rate_on_takes_the_last_rate_up_to_the_date(self):
+        self.assertEqual(ExchangeRate.get_rate_on(self.usd, self.uzs, self.today - timedelta(days=10)), Decimal('12000'))
+        self.assertEqual(ExchangeRate.get_rate_on(self.usd, self.uzs, self.today - timedelta(days=7)), Decimal('12000'))
+        self.assertEqual(ExchangeRate.get_rate_on(self.usd, self.uzs, self.today - timedelta(days=5)), Decimal('12500'))
+        self.assertEqual(ExchangeRate.get_rate_on(self.usd, self.uzs, self.today), Decimal('12600'))
+        self.assertIsNone(ExchangeRate.get_rate_on(self.usd, self.uzs, self.today - timedelta(days=11)))
+
+    def test_dates_as_a_date_field_accepts_them(self):
+        five_days_ago = self.today - timedelta(days=5)
+        self.assertEqual(ExchangeRate.get_rate_on(self.usd, self.uzs, five_days_ago.isoformat()), Decimal('12500'))
+
+        user = create_user('alice', default_currency='UZS')
+        lunch = Transaction.objects.create(
+            user=user, card=create_card(user, self.usd), category=Category.objects.create(name='Food', type='expense'),
+            type='expense', amount=Decimal('2'), title='Lunch', date=five_days_ago.isoformat()
+        )
+        self.assertEqual(lunch.amount_in_user_currency, Decimal('25000'))
+
+    def test_reverse_and_triangulated_rates(self):
+        self.assertEqual(ExchangeRate.get_rate_on(self.uzs, self.usd, self.today - timedelta(days=5)), Decimal('1.0') / Decimal('12500'))
+        self.assertEqual(ExchangeRate.get_rate_on(self.eur, self.uzs, self.today), Decimal('1.08') * Decimal('12600'))
+        self.assertEqual(ExchangeRate.get_latest_rate(self.eur, self.uzs), Decimal('1.08') * Decimal('12600'))
+        self.assertEqual(ExchangeRate.get_latest_rate(self.usd, self.usd), Decimal('1.0'))
+
+    def test_many_lookups_cost_one_query(self):
+        dates = [self.today - timedelta(days=days) for days in range(12)]
+        with self.assertNumQueries(1):
+            rates = ExchangeRate.rates_for_dates([(self.usd.pk, self.uzs.pk, on_date) for on_date in dates])
+        self.assertEqual(rates[(self.usd.pk, self.uzs.pk, dates[5])], Decimal('12500'))
+        self.assertIsNone(rates[(self.usd.pk, self.uzs.pk, dates[11])])
+
+    def test_change_is_seen_after_commit(self):
+        self.assertEqual(ExchangeRate.get_latest_rate(self.usd, self.uzs), Decimal('12600'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.latest.rate = Decimal('12700')
+            self.latest.save()
+            self.assertEqual(ExchangeRate.get_latest_rate(self.usd, self.uzs), Decimal('12600'))
+
+        self.assertEqual(ExchangeRate.get_latest_rate(self.usd, self.uzs), Decimal('12700'))
+        self.assertEqual(ExchangeRate.get_rate_on(self.usd, self.uzs, self.today), Decimal('12700'))
+
+    def test_rolled_back_change_is_not_kept(self):
+        ExchangeRate.get_latest_rate(self.usd, self.uzs)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.latest.rate = Decimal('12700')
+                    self.latest.save()
+                    ExchangeRate.get_latest_rate(self.usd, self.uzs)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertEqual(ExchangeRate.get_latest_rate(self.usd, self.uzs), Decimal('12600'))
+
+    def test_tables_are_reloaded_when_old(self):
+        ExchangeRate.get_latest_rate(self.usd, self.uzs)
+        # a change made by a process that cannot reach this one's cache
+        ExchangeRate.objects.filter(pk=self.latest.pk).update(rate=Decimal('12800'))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(ExchangeRate.get_latest_rate(self.usd, self.uzs), Decimal('12600'))
+
+        later = time.monotonic() + rate_matrix.MAX_AGE + 1
+        with mock.patch('time.monotonic', return_value=later):
+            self.assertEqual(ExchangeRate.get_latest_rate(self.usd, self.uzs), Decimal('12800'))
+
+    def test_shared_version_is_read_once_per_interval(self):
+        ExchangeRate.get_latest_rate(self.usd, self.uzs)
+        with mock.patch.object(cache, 'get', wraps=cache.get) as cache_get:
+            for _ in range(3):
+                self.assertEqual(ExchangeRate.get_latest_rate(self.usd, self.uzs), Decimal('12600'))
+            self.assertEqual(cache_get.call_count, 0)
+
+            # another process changed the rate and bumped the version
+            ExchangeRate.objects.filter(pk=self.latest.pk).update(rate=Decimal('12800'))
+            bump_rates_version()
+            self.assertEqual(ExchangeRate.get_latest_rate(self.usd, self.uzs), Decimal('12600'))
+
+            later = time.monotonic() + rate_matrix.VERSION_CHECK_INTERVAL + 1
+            with mock.patch('time.monotonic', return_value=later):
+                self.assertEqual(ExchangeRate.get_latest_rate(self.usd, self.uzs), Decimal('12800'))
+                self.assertEqual(ExchangeRate.get_latest_rate(self.usd, self.uzs), Decimal('12800'))
+            self.assertEqual(cache_get.call_count, 1)
+
+
+class BalanceUpdateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.card = create_card(cls.user, cls.uzs, 'Main', balance=Decimal('100'))
+        cls.savings = create_card(cls.user, cls.uzs, 'Savings', balance=Decimal('0'))
+
+    def test_stale_copies_do_not_overwrite_each_other(self):
+        first = Card.objects.get(pk=self.card.pk)
+        second = Card.objects.get(pk=self.card.pk)
+        Card.objects.filter(pk=self.card.pk).update(card_name='Renamed')
+
+        adjust_balance(first, Decimal('-10'))
+        adjust_balance(second, Decimal('-20'))
+        adjust_balance(self.card.pk, Decimal('5'))
+
+        self.assertEqual((first.balance, second.balance), (Decimal('90'), Decimal('80')))
+        self.card.refresh_from_db()
+        self.assertEqual((self.card.balance, self.card.card_name), (Decimal('75'), 'Renamed'))
+
+    def test_balance_change_is_one_relative_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            adjust_balance(self.card, Decimal('-10'))
+
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "cards"')]
+        self.assertEqual(len(updates), 1)
+        self.assertRegex(updates[0], r'"balance" = .*"cards"\."balance" \+')
+        self.assertNotIn('"card_name"', updates[0])
+
+    def test_withdraw_refuses_an_overdraft(self):
+        stale = Card.objects.get(pk=self.card.pk)
+        adjust_balance(self.card, Decimal('-60'))
+
+        with self.assertRaises(ValueError):
+            withdraw(stale, Decimal('50'))
+
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('40'))
+        self.assertEqual(CardLedgerEntry.objects.filter(card=self.card, kind='adjustment').count(), 1)
+
+    def test_overdrawing_transfer_is_rolled_back(self):
+        with self.assertRaises(ValueError):
+            CardTransfer.objects.create(user=self.user, from_card=self.card, to_card=self.savings, amount=Decimal('150'))
+
+        self.assertFalse(CardTransfer.objects.exists())
+        self.assertEqual(
+            list(Card.objects.filter(pk__in=[self.card.pk, self.savings.pk]).order_by('pk').values_list('balance', flat=True)),
+            [Decimal('100'), Decimal('0')],
+        )
+
+
+class CardLedgerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.food = Category.objects.create(name='Food', type='expense')
+        cls.salary = Category.objects.create(name='Salary', type='income')
+
+    def assertLedgerMatches(self, card):
+        card.refresh_from_db()
+        entries = list(card.ledger_entries.all())
+        self.assertEqual(sum(entry.amount for entry in entries), card.balance)
+        self.assertEqual(entries[-1].balance, card.balance)
+
+    def test_every_balance_path_is_recorded(self):
+        card = create_card(self.user, self.uzs, 'Main', balance=Decimal('1000'))
+        savings = create_card(self.user, self.usd, 'Savings', balance=Decimal('0'))
+
+        lunch = Transaction.objects.create(user=self.user, card=card, category=self.food, type='expense', amount=Decimal('100'), title='Lunch')
+        Transaction.objects.create(user=self.user, card=card, category=self.salary, type='income', amount=Decimal('500'), title='Pay')
+        lunch.amount = Decimal('150')
+        lunch.save()
+        lunch.delete()
+        CardTransfer.objects.create(user=self.user, from_card=card, to_card=savings, amount=Decimal('126'))
+        set_balance(savings, Decimal('5'))
+        TransactionImporter(self.user, card=card).run([{'date': '2026-01-05', 'amount': '-20', 'title': 'Taxi', 'category': 'Food'}])
+
+        self.assertEqual(
+            list(card.ledger_entries.values_list('kind', 'amount', 'balance')),
+            [
+                ('opening', Decimal('1000'), Decimal('1000')),
+                ('transaction', Decimal('-100'), Decimal('900')),
+                ('transaction', Decimal('500'), Decimal('1400')),
+                ('transaction', Decimal('100'), Decimal('1500')),
+                ('transaction', Decimal('-150'), Decimal('1350')),
+                ('transaction', Decimal('150'), Decimal('1500')),
+                ('transfer', Decimal('-126'), Decimal('1374')),
+                ('import', Decimal('-20'), Decimal('1354')),
+            ]
+        )
+        self.assertLedgerMatches(card)
+        self.assertLedgerMatches(savings)
+        self.assertEqual(savings.ledger_entries.last().kind, 'adjustment')
+
+    def test_balance_as_of(self):
+        card = create_card(self.user, self.uzs, 'Main', balance=Decimal('1000'))
+        before_lunch = timezone.now()
+        Transaction.objects.create(user=self.user, card=card, category=self.food, type='expense', amount=Decimal('100'), title='Lunch')
+
+        self.assertEqual(CardLedgerEntry.balance_as_of(card, before_lunch), Decimal('1000'))
+        self.assertEqual(CardLedgerEntry.balance_as_of(card, timezone.now()), Decimal('900'))
+        self.assertEqual(CardLedgerEntry.balance_as_of(card, before_lunch - timedelta(days=1)), Decimal('0'))
+        self.assertEqual(CardLedgerEntry.daily_balances(card, days=3)[-1], (timezone.localdate(), Decimal('900')))
+
+    def test_edit_form_records_balance_change(self):
+        card = create_card(self.user, self.uzs, 'Main', balance=Decimal('1000'))
+        self.client.force_login(self.user)
+        self.client.post(reverse('cards:card_edit', kwargs={'pk': card.pk}), {
+            'card_name': 'Renamed',
+            'card_type': card.card_type_id,
+            'currency': self.uzs.pk,
+            'balance': '750',
+            'status': 'active',
+        })
+
+        card.refresh_from_db()
+        self.assertEqual((card.card_name, card.balance), ('Renamed', Decimal('750')))
+        self.assertEqual(card.ledger_entries.last().amount, Decimal('-250'))
+        self.assertLedgerMatches(card)
+
+
+class BalanceReconciliationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.food = Category.objects.create(name='Food', type='expense')
+        cls.salary = Category.objects.create(name='Salary', type='income')
+
+    def setUp(self):
+        self.card = create_card(self.user, self.uzs, 'Main', balance=Decimal('1000'))
+        self.card.initial_balance = Decimal('1000')
+        self.card.save(update_fields=['initial_balance'])
+        self.savings = create_card(self.user, self.uzs, 'Savings', balance=Decimal('0'))
+
+        Transaction.objects.create(user=self.user, card=self.card, category=self.food, type='expense', amount=Decimal('100'), title='Lunch')
+        Transaction.objects.create(user=self.user, card=self.card, category=self.salary, type='income', amount=Decimal('500'), title='Pay')
+        CardTransfer.objects.create(user=self.user, from_card=self.card, to_card=self.savings, amount=Decimal('200'))
+        set_balance(self.savings, Decimal('250'))
+
+    def test_tracked_changes_do_not_drift(self):
+        self.assertEqual(
+            dict(expected_balances().values_list('pk', 'drift')),
+            {self.card.pk: Decimal('0'), self.savings.pk: Decimal('0')}
+        )
+        self.assertEqual(BalanceReconciler().run().drift_count, 0)
+
+    def test_repair_untracked_delete(self):
+        # deletes that skip Transaction.delete leave the balance behind
+        Transaction.objects.filter(title='Lunch').delete()
+
+        result = BalanceReconciler(chunk_size=1).run()
+        self.assertEqual((result.checked, result.drift_count, result.repaired), (2, 1, 0))
+        self.assertEqual(result.drifted[0]['drift'], Decimal('-100'))
+
+        result = BalanceReconciler(repair=True, chunk_size=1).run()
+        self.assertEqual(result.repaired, 1)
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, Decimal('1300'))
+        entry = self.card.ledger_entries.last()
+        self.assertEqual((entry.kind, entry.amount, entry.balance), ('reconciliation', Decimal('100'), Decimal('1300')))
+
+        self.assertEqual(BalanceReconciler(repair=True).run().repaired, 0)
+
+    def test_command_and_staff_view(self):
+        Transaction.objects.filter(title='Lunch').delete()
+
+        out = StringIO()
+        call_command('reconcile_balances', stdout=out)
+        self.assertIn('1 drifted', out.getvalue())
+
+        url = reverse('cards:balance_reconciliation')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        staff = create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url).context['result'].drift_count, 1)
+        self.client.post(url, {'card_ids': [self.savings.pk]})
+        self.assertEqual(self.client.get(url).context['result'].drift_count, 1)
+        self.client.post(url, {'card_ids': [self.card.pk]})
+        self.assertEqual(self.client.get(url).context['result'].drift_count, 0)
+
+    def test_legacy_cards_keep_their_starting_balance(self):
+        # a card from before the ledger: initial_balance never recorded and
+        # the ledger opened at whatever the balance was at the time
+        legacy = create_card(self.user, self.uzs, 'Legacy', balance=Decimal('400'))
+        Transaction.objects.create(user=self.user, card=legacy, category=self.food, type='expense', amount=Decimal('100'), title='Old')
+        legacy.ledger_entries.all().delete()
+        Card.objects.filter(pk=legacy.pk).update(initial_balance=0)
+        CardLedgerEntry.objects.create(card=legacy, kind='opening', amount=Decimal('300'), balance=Decimal('300'))
+        Transaction.objects.create(user=self.user, card=legacy, category=self.food, type='expense', amount=Decimal('50'), title='New')
+
+        import_module('apps.cards.migrations.0004_baseline_initial_balances').baseline_initial_balances(apps, None)
 
-# Create your tests here.
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.initial_balance, Decimal('400'))
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.initial_balance, Decimal('1000'))
+        self.assertEqual(BalanceReconciler().run().drift_count, 0)
@@ -22,6 +22,7 @@ urlpatterns = [
     path("cards/<int:pk>/update-balance/", CardUpdateBalanceView.as_view(), name="card_update_balance"),
     path("cards/<int:pk>/change-status/", CardChangeStatusView.as_view(), name="card_change_status"),
     path("cards/<int:pk>/set-default/", CardSetDefaultView.as_view(), name="card_set_default"),
+    path("cards/reconciliation/", BalanceReconciliationView.as_view(), name="balance_reconciliation"),
     path("card-types/", CardTypeListView.as_view(), name="card_types")
 
 
@@ -1,6 +1,8 @@
 from django.views.generic import ListView, FormView, DetailView, CreateView, UpdateView, DeleteView
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils.decorators import method_decorator
 from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib import messages
 from django.urls import reverse_lazy
@@ -9,6 +11,9 @@ from django.db.models import Q, Sum
 
 from apps.cards.models import *
 from .forms import *
+from .balances import set_balance
+from .reconciliation import BalanceReconciler
+from apps.dashboard.snapshot import invalidate_snapshot
 
 
 class CurrencyListView(LoginRequiredMixin, ListView):
@@ -104,7 +109,7 @@ class CardListView(LoginRequiredMixin, ListView):
         user_currency = Currency.objects.get(code=user.default_currency)
         total_balance = 0
         
-        cards = Card.objects.filter(user=user, status='active')
+        cards = Card.objects.filter(user=user, status='active').select_related('currency')
         for card in cards:
             if card.currency == user_currency:
                 total_balance += card.balance
@@ -121,6 +126,21 @@ class CardListView(LoginRequiredMixin, ListView):
         return context
 
 
+def balance_chart_points(history, width=300, height=60):
+    """SVG polyline points for a list of (date, balance) pairs."""
+    if len(history) < 2:
+        return ''
+
+    balances = [float(balance) for _, balance in history]
+    low, high = min(balances), max(balances)
+    spread = (high - low) or 1
+    step = width / (len(balances) - 1)
+    return ' '.join(
+        f"{index * step:.1f},{height - (balance - low) / spread * height:.1f}"
+        for index, balance in enumerate(balances)
+    )
+
+
 class CardDetailView(LoginRequiredMixin, DetailView):
     model = Card
     template_name = "cards/detail.html"
@@ -133,7 +153,7 @@ class CardDetailView(LoginRequiredMixin, DetailView):
         context = super().get_context_data(**kwargs)
         card = self.object
 
-        context['recent_transactions'] = card.transactions.all().order_by('-date')[:10]
+        context['recent_transactions'] = card.transactions.select_related('category').order_by('-date')[:10]
         
         current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         context['monthly_expenses'] = card.transactions.filter(
@@ -145,6 +165,9 @@ class CardDetailView(LoginRequiredMixin, DetailView):
             type='income',
             date__gte=current_month
         ).aggregate(total=Sum('amount'))['total'] or 0
+
+        context['balance_history'] = CardLedgerEntry.daily_balances(card, days=30)
+        context['balance_chart'] = balance_chart_points(context['balance_history'])
         
         return context
 
@@ -162,6 +185,7 @@ class CardCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.user = self.request.user
+        form.instance.initial_balance = form.instance.balance
         messages.success(self.request, f'Card "{form.instance.card_name}" added successfully!')
         return super().form_valid(form)
 
@@ -182,8 +206,16 @@ class CardUpdateView(LoginRequiredMixin, UpdateView):
         return context
 
     def form_valid(self, form):
-        messages.success(self.request, f'Card "{form.instance.card_name}" updated successfully!')
-        return super().form_valid(form)
+        # the balance goes through set_balance so it is not overwritten with
+        # the value loaded into the form and the change lands in the ledger
+        card = form.save(commit=False)
+        card.save(update_fields=[name for name in form.Meta.fields if name != 'balance'] + ['updated_at'])
+        if 'balance' in form.changed_data:
+            set_balance(card, form.cleaned_data['balance'])
+        invalidate_snapshot(card.user_id)
+
+        messages.success(self.request, f'Card "{card.card_name}" updated successfully!')
+        return redirect(self.get_success_url())
 
 
 class CardDeleteView(LoginRequiredMixin, DeleteView):
@@ -226,8 +258,8 @@ class CardUpdateBalanceView(LoginRequiredMixin, FormView):
         old_balance = card.balance
         new_balance = form.cleaned_data["new_balance"]
 
-        card.balance = new_balance
-        card.save()
+        set_balance(card, new_balance)
+        invalidate_snapshot(card.user_id)
 
         messages.success(self.request, f'Balance updated from {old_balance} to {new_balance} {card.currency.code}')
 
@@ -255,7 +287,7 @@ class CardChangeStatusView(LoginRequiredMixin, View):
 
         old_status = card.get_status_display()
         card.status = status
-        card.save()
+        card.save(update_fields=['status', 'is_default', 'updated_at'])
 
         messages.success(request, f'Card status changed from {old_status} to {card.get_status_display()}')
         return redirect("cards:card_detail", pk=pk)
@@ -272,7 +304,27 @@ class CardSetDefaultView(LoginRequiredMixin, View):
         Card.objects.filter(user=request.user).update(is_default=False)
         
         card.is_default = True
-        card.save()
+        card.save(update_fields=['is_default', 'updated_at'])
         
         messages.success(request, f'{card.card_name} is now your default card')
-        return redirect("cards:cards_list")
\ No newline at end of file
+        return redirect("cards:cards_list")
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class BalanceReconciliationView(View):
+    template_name = "cards/reconciliation.html"
+
+    def get(self, request):
+        return render(request, self.template_name, {'result': BalanceReconciler().run()})
+
+    def post(self, request):
+        # only the cards ticked on the page; full repairs belong to
+        # `manage.py reconcile_balances --repair`
+        card_ids = [card_id for card_id in request.POST.getlist('card_ids') if card_id.isdigit()]
+        if not card_ids:
+            messages.error(request, 'No cards selected.')
+            return redirect("cards:balance_reconciliation")
+
+        result = BalanceReconciler(repair=True, cards=Card.objects.filter(pk__in=card_ids)).run()
+        messages.success(request, f'{result.repaired} card balance(s) repaired out of {result.checked} selected')
+        return redirect("cards:balance_reconciliation")
@@ -5,3 +5,6 @@ class DashboardConfig(AppConfig):
     name = 'apps.dashboard'
     label = 'dashboard'
     default_auto_field = 'django.db.models.BigAutoField'
+
+    def ready(self):
+        from . import signals
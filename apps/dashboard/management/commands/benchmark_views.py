@@ -0,0 +1,271 @@
+import json
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import CustomUser
+from apps.budgets.models import Budget
+from apps.cards.models import Card, CardLedgerEntry, CardType, Currency, ExchangeRate
+from apps.dashboard.metrics import percentile
+from apps.dashboard.snapshot import invalidate_snapshot
+from apps.transactions.importers import TransactionImporter
+from apps.transactions.models import Category, SpendingRollup
+from apps.transfers.models import CardTransfer
+
+
+BENCHMARK_VIEWS = (
+    'dashboard:dashboard',
+    'transactions:transaction_list',
+    'transactions:transaction_statistics',
+    'budgets:budget_overview',
+    'budgets:budget_alerts',
+    'transfers:transfer_list',
+)
+
+CURRENCIES = (
+    ('UZS', "Uzbekistan Sum", "so'm"),
+    ('USD', "US Dollar", '$'),
+    ('EUR', "Euro", '€'),
+)
+
+RATES = (
+    ('USD', 'UZS', Decimal('12600')),
+    ('EUR', 'UZS', Decimal('13700')),
+    ('EUR', 'USD', Decimal('1.08')),
+)
+
+CATEGORIES = (
+    ('Food', 'expense'), ('Transport', 'expense'), ('Shopping', 'expense'),
+    ('Bills', 'expense'), ('Entertainment', 'expense'), ('Healthcare', 'expense'),
+    ('Salary', 'income'), ('Freelance', 'income'),
+)
+
+WORDS = (
+    'coffee', 'lunch', 'taxi', 'market', 'rent', 'fuel', 'pharmacy', 'cinema',
+    'groceries', 'internet', 'phone', 'gym', 'books', 'dinner', 'salary', 'bonus',
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic users, cards, transactions, budgets and transfers, then time "
+        "the hot views through the test client and report query counts and latency "
+        "percentiles as JSON. The data is rolled back afterwards unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=3)
+        parser.add_argument('--cards', type=int, default=4, help="Cards per user")
+        parser.add_argument('--transactions', type=int, default=5000, help="Transactions per user")
+        parser.add_argument('--budgets', type=int, default=6, help="Budgets per user")
+        parser.add_argument('--transfers', type=int, default=50, help="Transfers per user")
+        parser.add_argument('--iterations', type=int, default=30, help="Timed requests per view")
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed requests per view before timing")
+        parser.add_argument('--cold', action='store_true', help="Clear the cache before every timed request")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+        parser.add_argument('--compare', help="Print p95 and query deltas against an earlier JSON report")
+        parser.add_argument('--keep', action='store_true', help="Commit the generated data instead of rolling it back")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['cards'] < 1:
+            raise CommandError("--users and --cards must be at least 1")
+
+        self.random = random.Random(options['seed'])
+        users = []
+        try:
+            with transaction.atomic():
+                seeding_started = time.perf_counter()
+                users = self.seed(options)
+                seeding_seconds = time.perf_counter() - seeding_started
+
+                report = {
+                    'generated_at': timezone.now().isoformat(),
+                    'config': {
+                        name: options[name]
+                        for name in ('users', 'cards', 'transactions', 'budgets', 'transfers', 'iterations', 'warmup', 'cold', 'seed')
+                    },
+                    'seeding_seconds': round(seeding_seconds, 2),
+                    'views': self.run_benchmarks(users, options),
+                }
+
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            # cached summaries and snapshots may point at rolled back rows
+            for user in users:
+                SpendingRollup.invalidate_summary(user.pk)
+                invalidate_snapshot(user.pk)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output)
+            self.stderr.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            self.compare(report, options['compare'])
+
+    def seed(self, options):
+        currencies = {}
+        for code, name, symbol in CURRENCIES:
+            currencies[code], _ = Currency.objects.get_or_create(code=code, defaults={'name': name, 'symbol': symbol})
+
+        today = timezone.now().date()
+        for from_code, to_code, rate in RATES:
+            ExchangeRate.objects.get_or_create(
+                from_currency=currencies[from_code],
+                to_currency=currencies[to_code],
+                date=today,
+                defaults={'rate': rate}
+            )
+
+        for name, category_type in CATEGORIES:
+            Category.objects.get_or_create(name=name, type=category_type, user=None)
+
+        card_type, _ = CardType.objects.get_or_create(name='Benchmark')
+        codes = [code for code, _, _ in CURRENCIES]
+        run_id = f"{int(time.time())}{self.random.randint(100, 999)}"
+
+        users = []
+        for index in range(options['users']):
+            user = CustomUser.objects.create(
+                username=f"bench_{run_id}_{index}",
+                email=f"bench_{run_id}_{index}@example.com",
+                auth_status='done',
+                default_currency=codes[index % len(codes)]
+            )
+
+            cards = Card.objects.bulk_create([
+                Card(
+                    user=user,
+                    card_type=card_type,
+                    currency=currencies[codes[number % len(codes)]],
+                    card_name=f"Card {number + 1}",
+                    balance=Decimal('100000000'),
+                    initial_balance=Decimal('100000000'),
+                    is_default=number == 0,
+                )
+                for number in range(options['cards'])
+            ])
+            CardLedgerEntry.open_many(cards)
+
+            TransactionImporter(user).run(self.transaction_rows(cards, options['transactions'], today))
+            self.seed_budgets(user, currencies[user.default_currency], options['budgets'], today)
+            self.seed_transfers(user, cards, options['transfers'])
+            users.append(user)
+
+        return users
+
+    def transaction_rows(self, cards, count, today):
+        for _ in range(count):
+            name, category_type = self.random.choice(CATEGORIES)
+            yield {
+                'date': (today - timedelta(days=self.random.randint(0, 365))).isoformat(),
+                'type': category_type,
+                'amount': str(Decimal(self.random.randint(100, 500000)) / 100),
+                'title': ' '.join(self.random.sample(WORDS, 2)),
+                'description': ' '.join(self.random.sample(WORDS, 3)),
+                'category': name,
+                'card': str(self.random.choice(cards).pk),
+            }
+
+    def seed_budgets(self, user, currency, count, today):
+        expense_categories = list(Category.objects.filter(user=None, type='expense', name__in=[name for name, _ in CATEGORIES]))
+        periods = ('weekly', 'monthly', 'yearly')
+        Budget.objects.bulk_create([
+            Budget(
+                user=user,
+                category=expense_categories[number % len(expense_categories)],
+                name=f"Budget {number + 1}",
+                amount=Decimal(self.random.randint(1000, 100000)),
+                currency=currency,
+                period=periods[number % len(periods)],
+                start_date=today.replace(day=1),
+            )
+            for number in range(count)
+        ])
+
+    def seed_transfers(self, user, cards, count):
+        if len(cards) < 2:
+            return
+        for _ in range(count):
+            from_card, to_card = self.random.sample(cards, 2)
+            CardTransfer.objects.create(
+                user=user,
+                from_card=from_card,
+                to_card=to_card,
+                amount=Decimal(self.random.randint(100, 10000)),
+            )
+
+    def run_benchmarks(self, users, options):
+        clients = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for view_name in BENCHMARK_VIEWS:
+                url = reverse(view_name)
+                for index in range(options['warmup']):
+                    clients[index % len(clients)].get(url)
+
+                timings, query_counts, statuses = [], [], set()
+                for index in range(options['iterations']):
+                    client = clients[index % len(clients)]
+                    if options['cold']:
+                        cache.clear()
+
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = client.get(url)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    query_counts.append(len(queries.captured_queries))
+                    statuses.add(response.status_code)
+
+                timings.sort()
+                query_counts.sort()
+                results[view_name] = {
+                    'status': sorted(statuses),
+                    'queries': {'min': query_counts[0], 'max': query_counts[-1]},
+                    'p50_ms': round(percentile(timings, 50), 2),
+                    'p95_ms': round(percentile(timings, 95), 2),
+                    'max_ms': round(timings[-1], 2),
+                } if timings else {}
+
+        return results
+
+    def compare(self, report, path):
+        try:
+            with open(path) as previous_file:
+                previous = json.load(previous_file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Cannot read {path}: {error}")
+
+        for view_name, current in report['views'].items():
+            before = previous.get('views', {}).get(view_name)
+            if not current or not before:
+                continue
+            p95_delta = current['p95_ms'] - before['p95_ms']
+            query_delta = current['queries']['max'] - before['queries']['max']
+            line = f"{view_name:<40} p95 {before['p95_ms']:>8.2f} -> {current['p95_ms']:>8.2f} ms ({p95_delta:+.2f})  queries {before['queries']['max']} -> {current['queries']['max']} ({query_delta:+d})"
+            if query_delta > 0 or p95_delta > before['p95_ms'] * 0.2:
+                line = self.style.WARNING(line)
+            self.stderr.write(line)
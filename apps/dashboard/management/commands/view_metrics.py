@@ -0,0 +1,54 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.dashboard.metrics import view_metrics
+
+
+class Command(BaseCommand):
+    help = "Show rolling per-view query count and latency percentiles recorded by ViewMetricsMiddleware"
+
+    SORT_FIELDS = ('wall_ms', 'queries', 'db_ms', 'template_ms', 'count')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=self.SORT_FIELDS, default='wall_ms', help="Sort views by this field's p90 (default: wall_ms)")
+        parser.add_argument('--json', action='store_true', help="Print the raw summary as JSON")
+        parser.add_argument('--reset', action='store_true', help="Clear the recorded samples after printing")
+
+    def handle(self, *args, **options):
+        summary = view_metrics.summary()
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+        elif not summary:
+            self.stdout.write("No samples recorded. Is VIEW_METRICS_ENABLED on and the cache shared between processes?")
+        else:
+            self.print_table(summary, options['sort'])
+
+        if options['reset']:
+            view_metrics.reset()
+            self.stdout.write(self.style.SUCCESS("Samples cleared"))
+
+    def print_table(self, summary, sort):
+        def sort_key(item):
+            stats = item[1]
+            return stats['count'] if sort == 'count' else stats[sort]['p90']
+
+        header = f"{'view':<45} {'n':>5} {'wall p50/p90/p99 ms':>22} {'queries p50/p90/max':>20} {'db p90':>8} {'tpl p90':>8}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        budget = settings.VIEW_QUERY_BUDGET
+        for view_name, stats in sorted(summary.items(), key=sort_key, reverse=True):
+            wall, queries = stats['wall_ms'], stats['queries']
+            line = (
+                f"{view_name:<45} {stats['count']:>5} "
+                f"{wall['p50']:>7.1f}/{wall['p90']:>6.1f}/{wall['p99']:>7.1f} "
+                f"{queries['p50']:>6g}/{queries['p90']:>5g}/{queries['max']:>6g} "
+                f"{stats['db_ms']['p90']:>8.1f} {stats['template_ms']['p90']:>8.1f}"
+            )
+            budget_for_view = settings.VIEW_QUERY_BUDGETS.get(view_name, budget)
+            if budget_for_view is not None and queries['max'] > budget_for_view:
+                line = self.style.WARNING(line)
+            self.stdout.write(line)
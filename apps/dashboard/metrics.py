@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.template.base import Template
+
+
+METRICS_WINDOW = 500
+FLUSH_INTERVAL = 10
+PROCESSES_KEY = 'dashboard:metrics:processes'
+PROCESS_KEY = 'dashboard:metrics:process:{process_id}'
+PROCESS_TIMEOUT = 3600
+
+FIELDS = ('wall_ms', 'queries', 'db_ms', 'template_ms')
+PERCENTILES = (50, 90, 99)
+
+current_sample = ContextVar('view_metrics_sample', default=None)
+_render_depth = ContextVar('view_metrics_render_depth', default=0)
+
+
+def percentile(sorted_values, rank):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0
+    index = max(0, -(-rank * len(sorted_values) // 100) - 1)
+    return sorted_values[index]
+
+
+class QueryTimer:
+    """``connection.execute_wrapper`` hook adding each query to a sample."""
+
+    def __init__(self, sample):
+        self.sample = sample
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sample['queries'] += 1
+            self.sample['db_ms'] += (time.perf_counter() - started) * 1000
+
+
+def instrument_templates():
+    """
+    Time top-level ``Template.render`` calls into the current sample.
+    Nested renders ({% include %}) are part of their parent's time.
+    """
+    if getattr(Template.render, 'view_metrics', False):
+        return
+
+    original_render = Template.render
+
+    def render(self, context):
+        sample = current_sample.get()
+        if sample is None or _render_depth.get():
+            return original_render(self, context)
+
+        token = _render_depth.set(1)
+        started = time.perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            sample['template_ms'] += (time.perf_counter() - started) * 1000
+            _render_depth.reset(token)
+
+    render.view_metrics = True
+    Template.render = render
+
+
+class ViewMetrics:
+    """
+    Rolling window of per-request samples for every view.
+
+    Each process keeps its own window in memory and publishes it to the
+    cache every ``FLUSH_INTERVAL`` seconds; ``collect`` merges the windows
+    of all processes. With the default local-memory cache only the current
+    process is visible, so use a shared cache backend in production.
+    """
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.process_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._flushed_at = 0
+
+    def record(self, view_name, sample):
+        with self._lock:
+            self._samples[view_name].append(sample)
+
+        if time.monotonic() - self._flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+    def local_samples(self):
+        with self._lock:
+            return {view_name: list(samples) for view_name, samples in self._samples.items()}
+
+    def flush(self):
+        self._flushed_at = time.monotonic()
+        samples = self.local_samples()
+        if not samples:
+            return
+
+        cache.set(PROCESS_KEY.format(process_id=self.process_id), samples, PROCESS_TIMEOUT)
+        processes = cache.get(PROCESSES_KEY) or set()
+        if self.process_id not in processes:
+            cache.set(PROCESSES_KEY, processes | {self.process_id}, None)
+
+    def collect(self):
+        self.flush()
+
+        processes = cache.get(PROCESSES_KEY) or set()
+        published = cache.get_many([PROCESS_KEY.format(process_id=process_id) for process_id in processes])
+        if len(published) < len(processes):
+            # forget processes whose window expired
+            alive = {key.rsplit(':', 1)[1] for key in published}
+            cache.set(PROCESSES_KEY, alive, None)
+
+        merged = defaultdict(list)
+        for samples in published.values():
+            for view_name, rows in samples.items():
+                merged[view_name].extend(rows)
+        return merged
+
+    def summary(self):
+        """``{view_name: {'count': n, field: {'p50': .., 'p90': .., 'p99': .., 'max': ..}}}``"""
+        summary = {}
+        for view_name, rows in self.collect().items():
+            stats = {'count': len(rows)}
+            for field_name in FIELDS:
+                values = sorted(row[field_name] for row in rows)
+                stats[field_name] = {f'p{rank}': round(percentile(values, rank), 2) for rank in PERCENTILES}
+                stats[field_name]['max'] = round(values[-1], 2)
+            summary[view_name] = stats
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+        processes = cache.get(PROCESSES_KEY) or set()
+        cache.delete_many([PROCESS_KEY.format(process_id=process_id) for process_id in processes] + [PROCESSES_KEY])
+
+
+view_metrics = ViewMetrics()
@@ -0,0 +1,62 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import QueryTimer, current_sample, instrument_templates, view_metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class ViewMetricsMiddleware:
+    """
+    Records query count, DB time, template render time and wall time for
+    every request, keyed by the resolved view name.
+
+    Opt in with ``VIEW_METRICS_ENABLED``. Requests running more queries
+    than ``VIEW_QUERY_BUDGETS[view_name]`` (or ``VIEW_QUERY_BUDGET``) are
+    logged as warnings.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'VIEW_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.default_budget = getattr(settings, 'VIEW_QUERY_BUDGET', None)
+        self.budgets = getattr(settings, 'VIEW_QUERY_BUDGETS', {})
+        instrument_templates()
+
+    def __call__(self, request):
+        sample = {'queries': 0, 'db_ms': 0.0, 'template_ms': 0.0}
+        token = current_sample.set(sample)
+        started = time.perf_counter()
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(QueryTimer(sample)))
+                response = self.get_response(request)
+        finally:
+            current_sample.reset(token)
+
+        sample['wall_ms'] = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        if match is None:
+            return response
+
+        view_metrics.record(match.view_name, sample)
+
+        budget = self.budgets.get(match.view_name, self.default_budget)
+        if budget is not None and sample['queries'] > budget:
+            logger.warning(
+                "%s ran %d queries (budget %d) in %.1f ms for %s",
+                match.view_name, sample['queries'], budget, sample['wall_ms'], request.path
+            )
+
+        return response
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.budgets.models import Budget
+from apps.cards.models import Card
+from apps.transactions.models import Transaction
+from apps.transfers.models import CardTransfer
+from .snapshot import invalidate_snapshot
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Card)
+@receiver(post_delete, sender=Card)
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+@receiver(post_save, sender=CardTransfer)
+@receiver(post_delete, sender=CardTransfer)
+def invalidate_dashboard_snapshot(sender, instance, **kwargs):
+    invalidate_snapshot(instance.user_id)
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.db import transaction
+
+
+SNAPSHOT_CACHE_KEY = 'dashboard:snapshot:{user_id}'
+# budget periods roll over and exchange rates move without a write by the user
+SNAPSHOT_TIMEOUT = 300
+
+
+def build_snapshot(user):
+    from apps.budgets.models import Budget
+    from apps.budgets.progress import BudgetProgressCalculator
+    from apps.cards.models import Card, Currency, ExchangeRate
+    from apps.transactions.models import SpendingRollup, Transaction
+
+    user_currency = Currency.objects.get(code=user.default_currency)
+
+    cards = list(Card.objects.filter(user=user, status='active').select_related('currency'))
+    total_balance = 0
+    for card in cards:
+        if card.currency == user_currency:
+            total_balance += card.balance
+        else:
+            converted = ExchangeRate.convert(card.balance, card.currency, user_currency)
+            if converted:
+                total_balance += converted
+
+    recent_transactions = list(
+        Transaction.objects.filter(user=user).select_related(
+            'category', 'card__currency'
+        ).order_by('-date')[:10]
+    )
+
+    active_budgets = BudgetProgressCalculator(
+        Budget.objects.filter(user=user).select_related('category')[:5]
+    ).calculate()
+
+    return {
+        'currency': user.default_currency,
+        'total_cards': len(cards),
+        'total_transactions': SpendingRollup.summary_for(user)['total_count'],
+        'total_budgets': Budget.objects.filter(user=user).count(),
+        'total_balance': total_balance,
+        'recent_transactions': recent_transactions,
+        'active_budgets': active_budgets,
+    }
+
+
+def get_snapshot(user):
+    """The user's dashboard numbers, built on a cache miss and kept until their next write."""
+    key = SNAPSHOT_CACHE_KEY.format(user_id=user.pk)
+    snapshot = cache.get(key)
+    if snapshot is None or snapshot['currency'] != user.default_currency:
+        snapshot = build_snapshot(user)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def invalidate_snapshot(user_id):
+    key = SNAPSHOT_CACHE_KEY.format(user_id=user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -1,3 +1,215 @@
-from django.test import TestCase
+import json
+import time
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.budgets.models import Budget
+from apps.cards.models import Card
+from apps.dashboard.metrics import percentile, view_metrics
+from apps.dashboard.snapshot import SNAPSHOT_TIMEOUT, get_snapshot
+from apps.transactions.bulk import TransactionBulkEditor
+from apps.transfers.models import CardTransfer
+from apps.transactions.models import Category, Transaction
+from core.testing import QueryBudgetMixin, create_card, create_currencies, create_user
+
+
+class DashboardViewQueryTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.cards = [create_card(cls.user, cls.uzs, 'Main'), create_card(cls.user, cls.usd, 'Travel')]
+        cls.food = Category.objects.create(name='Food', type='expense')
+        cls.salary = Category.objects.create(name='Salary', type='income')
+        for card in cls.cards:
+            Transaction.objects.create(user=cls.user, card=card, category=cls.food, type='expense', amount=Decimal('10'), title='Lunch')
+        cls.create_budget(cls.food, cls.usd)
+
+    @classmethod
+    def create_budget(cls, category, currency):
+        return Budget.objects.create(
+            user=cls.user,
+            category=category,
+            name=category.name,
+            amount=Decimal('500'),
+            currency=currency,
+            start_date=date.today().replace(day=1),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def grow(self):
+        for number in range(10):
+            card = create_card(self.user, (self.uzs, self.usd, self.eur)[number % 3], f'Card {number}')
+            category = Category.objects.create(name=f'Custom {number}', type='expense', user=self.user)
+            Transaction.objects.create(user=self.user, card=card, category=category, type='expense', amount=Decimal('3'), title=f'Item {number}')
+            Transaction.objects.create(user=self.user, card=card, category=self.salary, type='income', amount=Decimal('30'), title=f'Pay {number}')
+            self.create_budget(category, (self.uzs, self.usd)[number % 2])
+
+    def test_dashboard(self):
+        self.assertQueryBudget(reverse('dashboard:dashboard'), 10)
+
+    def test_dashboard_cached(self):
+        url = reverse('dashboard:dashboard')
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+    def test_statistics(self):
+        self.assertQueryBudget(reverse('dashboard:statistics'), 9)
+
+
+class DashboardSnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.other = create_user('bob')
+        cls.card = create_card(cls.user, cls.uzs, 'Main', balance=Decimal('1000'))
+        cls.savings = create_card(cls.user, cls.uzs, 'Savings', balance=Decimal('0'))
+        cls.food = Category.objects.create(name='Food', type='expense')
+
+    def setUp(self):
+        cache.clear()
+
+    def write(self, action, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return action(*args, **kwargs)
+
+    def spend(self, amount):
+        return self.write(
+            Transaction.objects.create, user=self.user, card=self.card, category=self.food,
+            type='expense', amount=Decimal(amount), title='Lunch'
+        )
+
+    def test_snapshot_is_served_from_cache(self):
+        get_snapshot(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_snapshot(self.user)['total_balance'], Decimal('1000'))
+
+    def test_writes_invalidate_only_their_user(self):
+        get_snapshot(self.other)
+        lunch = self.spend('100')
+        self.assertEqual(get_snapshot(self.user)['total_balance'], Decimal('900'))
+
+        self.write(CardTransfer.objects.create, user=self.user, from_card=self.card, to_card=self.savings, amount=Decimal('50'))
+        self.assertEqual(get_snapshot(self.user)['total_balance'], Decimal('900'))
+        self.assertEqual(get_snapshot(self.user)['recent_transactions'], [lunch])
+
+        self.write(
+            Budget.objects.create, user=self.user, category=self.food, name='Food',
+            amount=Decimal('500'), currency=self.uzs, start_date=date.today().replace(day=1)
+        )
+        self.assertEqual(get_snapshot(self.user)['total_budgets'], 1)
+
+        self.write(TransactionBulkEditor(self.user, [lunch.pk]).delete)
+        snapshot = get_snapshot(self.user)
+        self.assertEqual((snapshot['total_balance'], snapshot['total_transactions']), (Decimal('1000'), 0))
+
+        with self.assertNumQueries(0):
+            get_snapshot(self.other)
+
+    def test_read_during_a_write_is_cleared_on_commit(self):
+        get_snapshot(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spend('100')
+            # a read inside the transaction caches the uncommitted total until commit clears it
+            get_snapshot(self.user)
+        self.assertEqual(get_snapshot(self.user)['total_transactions'], 1)
+
+    def test_snapshot_expires(self):
+        get_snapshot(self.user)
+        # an update that sends no signal, like a write from another process
+        Card.objects.filter(pk=self.card.pk).update(balance=Decimal('700'))
+        self.assertEqual(get_snapshot(self.user)['total_balance'], Decimal('1000'))
+
+        later = time.time() + SNAPSHOT_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(get_snapshot(self.user)['total_balance'], Decimal('700'))
+
+
+@override_settings(VIEW_METRICS_ENABLED=True, VIEW_QUERY_BUDGETS={'dashboard:statistics': 1})
+class ViewMetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_currencies()
+        cls.user = create_user('alice')
+
+    def setUp(self):
+        cache.clear()
+        view_metrics.reset()
+        self.client.force_login(self.user)
+
+    def test_samples_are_recorded_per_view(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('dashboard:dashboard'))
+        # the next request clears the query log the capture reads from
+        first_request = len(queries)
+        self.client.get(reverse('dashboard:dashboard'))
+
+        stats = view_metrics.summary()['dashboard:dashboard']
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['queries']['max'], first_request)
+        self.assertLess(stats['queries']['p50'], stats['queries']['max'])
+        self.assertGreater(stats['template_ms']['max'], 0)
+        self.assertGreaterEqual(stats['wall_ms']['max'], stats['db_ms']['max'] + stats['template_ms']['max'])
+
+    def test_over_budget_requests_are_logged(self):
+        with self.assertLogs('apps.dashboard.middleware', 'WARNING') as logs:
+            self.client.get(reverse('dashboard:statistics'))
+        self.assertIn('dashboard:statistics ran', logs.output[0])
+
+        with self.assertNoLogs('apps.dashboard.middleware', 'WARNING'):
+            self.client.get(reverse('dashboard:dashboard'))
+
+    def test_report_command(self):
+        self.client.get(reverse('dashboard:dashboard'))
+
+        out = StringIO()
+        call_command('view_metrics', '--json', '--reset', stdout=out)
+        self.assertEqual(json.loads(out.getvalue().split('Samples cleared')[0])['dashboard:dashboard']['count'], 1)
+        self.assertEqual(view_metrics.summary(), {})
+
+    @override_settings(VIEW_METRICS_ENABLED=False)
+    def test_disabled_by_default(self):
+        self.client.get(reverse('dashboard:dashboard'))
+        self.assertEqual(view_metrics.summary(), {})
+
+    def test_percentile(self):
+        values = list(range(1, 11))
+        self.assertEqual([percentile(values, rank) for rank in (50, 90, 99)], [5, 9, 10])
+        self.assertEqual(percentile([], 50), 0)
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def test_report_and_rollback(self):
+        out = StringIO()
+        call_command(
+            'benchmark_views', '--users', '2', '--cards', '2', '--transactions', '30',
+            '--budgets', '2', '--transfers', '2', '--iterations', '3', '--warmup', '1',
+            stdout=out, stderr=StringIO(),
+        )
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(set(report['views']), {
+            'dashboard:dashboard', 'transactions:transaction_list', 'transactions:transaction_statistics',
+            'budgets:budget_overview', 'budgets:budget_alerts', 'transfers:transfer_list',
+        })
+        for view_name, stats in report['views'].items():
+            self.assertEqual(stats['status'], [200], view_name)
+            self.assertGreater(stats['queries']['min'], 0, view_name)
+        self.assertFalse(Transaction.objects.exists())
@@ -12,5 +12,6 @@ urlpatterns = [
 
     path('', views.dashboard_view, name='dashboard'),
     path('statistics/', views.statistics_view, name='statistics'),
+    path('metrics/', views.view_metrics_view, name='view_metrics'),
 
 ]
\ No newline at end of file
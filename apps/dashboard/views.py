@@ -1,49 +1,21 @@
 
 
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import render
-from django.db.models import Sum
 from django.utils import timezone
+from django.conf import settings
 
 
 @login_required
 def dashboard_view(request):
-    from apps.transactions.models import Transaction
-    from apps.cards.models import Card
-    from apps.budgets.models import Budget
+    from .snapshot import get_snapshot
     
     user = request.user
     
-    total_cards = Card.objects.filter(user=user, status='active').count()
-    total_transactions = Transaction.objects.filter(user=user).count()
-    total_budgets = Budget.objects.filter(user=user).count()
-    
-
-    from apps.cards.models import ExchangeRate, Currency
-    user_currency = Currency.objects.get(code=user.default_currency)
-    
-    total_balance = 0
-    cards = Card.objects.filter(user=user, status='active')
-    for card in cards:
-        if card.currency == user_currency:
-            total_balance += card.balance
-        else:
-            converted = ExchangeRate.convert(card.balance, card.currency, user_currency)
-            if converted:
-                total_balance += converted
-    
-    recent_transactions = Transaction.objects.filter(user=user).order_by('-date')[:10]
-    
-    active_budgets = Budget.objects.filter(user=user)[:5]
-    
     context = {
-        'total_cards': total_cards,
-        'total_transactions': total_transactions,
-        'total_budgets': total_budgets,
-        'total_balance': total_balance,
-        'currency': user.default_currency,
-        'recent_transactions': recent_transactions,
-        'active_budgets': active_budgets,
+        **get_snapshot(user),
         'member_since': user.created_at,
     }
     
@@ -52,7 +24,7 @@ def dashboard_view(request):
 
 @login_required
 def statistics_view(request):
-    from apps.transactions.models import Transaction
+    from apps.transactions.models import SpendingRollup
     from apps.cards.models import Card
     from apps.budgets.models import Budget
     from apps.cards.models import ExchangeRate, Currency
@@ -61,12 +33,12 @@ def statistics_view(request):
     user_currency = Currency.objects.get(code=user.default_currency)
     
     total_cards = Card.objects.filter(user=user, status='active').count()
-    total_transactions = Transaction.objects.filter(user=user).count()
+    total_transactions = SpendingRollup.summary_for(user)['total_count']
     total_budgets = Budget.objects.filter(user=user).count()
     
 
     total_balance = 0
-    cards = Card.objects.filter(user=user, status='active')
+    cards = Card.objects.filter(user=user, status='active').select_related('currency')
     for card in cards:
         if card.currency == user_currency:
             total_balance += card.balance
@@ -78,21 +50,11 @@ def statistics_view(request):
 
     current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     
-    monthly_income = Transaction.objects.filter(
-        user=user,
-        type='income',
-        date__gte=current_month
-    ).aggregate(
-        total=Sum('amount_in_user_currency')
-    )['total'] or 0
-        
-    monthly_expenses = Transaction.objects.filter(
-        user=user,
-        type='expense',
-        date__gte=current_month
-    ).aggregate(
-        total=Sum('amount_in_user_currency')
-    )['total'] or 0
+    monthly_totals = SpendingRollup.summarize(
+        SpendingRollup.objects.filter(user=user, date__gte=current_month.date())
+    )
+    monthly_income = monthly_totals['income_total']
+    monthly_expenses = monthly_totals['expense_total']
     
     context = {
         'total_cards': total_cards,
@@ -107,3 +69,13 @@ def statistics_view(request):
     
     return render(request, 'statistics.html', context)
 
+
+@staff_member_required
+def view_metrics_view(request):
+    from .metrics import view_metrics
+    
+    return JsonResponse({
+        'generated_at': timezone.now().isoformat(),
+        'query_budget': settings.VIEW_QUERY_BUDGET,
+        'views': view_metrics.summary(),
+    })
@@ -5,3 +5,6 @@ class SupportConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
 
     name = 'apps.support'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+
+STAFF = 'staff'
+
+POLL_MIN_SECONDS = 5
+POLL_MAX_SECONDS = 60
+
+
+def audience_for(user):
+    """Staff share one inbox; everyone else only sees replies to themselves."""
+    return STAFF if user.is_staff else str(user.pk)
+
+
+def count_unread(audience):
+    from .models import SuppportMessage
+
+    if audience == STAFF:
+        return SuppportMessage.objects.filter(is_admin_reply=False, is_read=False).count()
+    return SuppportMessage.objects.filter(user_id=audience, is_admin_reply=True, is_read=False).count()
+
+
+def recipient_audience(user_id, is_admin_reply):
+    """Who has to read a message: the user for staff replies, staff otherwise."""
+    return str(user_id) if is_admin_reply else STAFF
+
+
+def get_unread_count(audience):
+    return unread_state(audience)[0]
+
+
+def unread_state(audience):
+    """``(count, changed_at)`` from the audience's counter row."""
+    from .models import UnreadCounter
+
+    counter = UnreadCounter.current(audience)
+    return counter.count, counter.changed_at
+
+
+def unread_version_key(audience):
+    return f'support:unread:{audience}:version'
+
+
+def bump_unread_version(audience):
+    """
+    Tell event streams in every process that the audience's counter row
+    changed, so an idle stream only reads the row after a change. Streams
+    in other processes see it when the cache is shared (see ``CACHES``).
+    """
+    cache.set(unread_version_key(audience), uuid.uuid4().hex, None)
+
+
+def poll_interval(changed_at):
+    """
+    Seconds a client should wait before polling again: the minimum right
+    after the counter changed, growing with the time it has stayed the
+    same, up to ``POLL_MAX_SECONDS``.
+    """
+    if changed_at is None:
+        return POLL_MAX_SECONDS
+    quiet = (timezone.now() - changed_at).total_seconds()
+    return int(min(max(quiet / 10, POLL_MIN_SECONDS), POLL_MAX_SECONDS))
+
+
+class UnreadBroker:
+    """
+    In-process pub/sub between message writes and open event streams.
+
+    Subscribers are asyncio queues owned by the event loop serving the
+    stream; ``publish`` may be called from any thread (signal handlers run
+    in sync worker threads) and hands events over with
+    ``call_soon_threadsafe``.
+    """
+
+    max_queued = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channel):
+        queue = asyncio.Queue(maxsize=self.max_queued)
+        with self._lock:
+            self._subscribers[channel].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        with self._lock:
+            self._subscribers[channel] = {
+                (loop, subscribed) for loop, subscribed in self._subscribers[channel] if subscribed is not queue
+            }
+            if not self._subscribers[channel]:
+                del self._subscribers[channel]
+
+    def publish(self, channel, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._deliver, queue, (event, data))
+
+    @staticmethod
+    def _deliver(queue, item):
+        # a client that stopped reading only misses events, it never blocks writers
+        if not queue.full():
+            queue.put_nowait(item)
+
+
+broker = UnreadBroker()
+
+
+def messages_read(user_id, is_admin_reply, count):
+    """Record that ``count`` unread messages of a conversation were marked read."""
+    from .models import UnreadCounter
+
+    if count:
+        UnreadCounter.adjust(recipient_audience(user_id, is_admin_reply), -count)
+        message_changed(user_id)
+
+
+def message_changed(user_id, message=None):
+    """
+    After commit, push the conversation's unread counters, plus the new
+    message if any, to open streams. The counters themselves are updated
+    by the writer, inside its transaction.
+    """
+    def publish():
+        from .models import UnreadCounter
+
+        audiences = (str(user_id), STAFF)
+        counts = dict(UnreadCounter.objects.filter(pk__in=audiences).values_list('audience', 'count'))
+        for audience in audiences:
+            bump_unread_version(audience)
+            if audience in counts:
+                broker.publish(audience, 'unread', {'unread_count': counts[audience]})
+            if message is not None:
+                broker.publish(audience, 'message', message)
+
+    transaction.on_commit(publish)
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0002_suppportmessage_delete_supportmessage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='suppportmessage',
+            index=models.Index(fields=['user', 'created_at'], name='support_sup_user_id_0a8ad1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suppportmessage',
+            index=models.Index(fields=['is_admin_reply', 'is_read'], name='support_sup_is_admi_740b7a_idx'),
+        ),
+    ]
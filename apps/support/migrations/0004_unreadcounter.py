@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0003_suppportmessage_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('audience', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('count', models.IntegerField(default=0)),
+                ('changed_at', models.DateTimeField(blank=True, help_text='When the count last changed; empty if unknown', null=True)),
+            ],
+            options={
+                'verbose_name': 'Unread Counter',
+                'verbose_name_plural': 'Unread Counters',
+                'db_table': 'support_unread_counters',
+            },
+        ),
+    ]
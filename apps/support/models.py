@@ -1,5 +1,7 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
 
 class SuppportMessage(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="support")
@@ -10,8 +12,103 @@ class SuppportMessage(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['is_admin_reply', 'is_read']),
+        ]
     
     def __str__(self):
         return f"Message from {self.user.username} at {self.created_at}"
 
+    @classmethod
+    def _seek(cls, user_id, message_id, newer):
+        """
+        Messages of a conversation before or after ``message_id``, seeking
+        on (created_at, id) so the (user, created_at) index serves the page.
+        """
+        queryset = cls.objects.filter(user_id=user_id)
+        created_at = queryset.filter(pk=message_id).values_list('created_at', flat=True).first()
 
+        if created_at is None:
+            # the anchor was deleted; ids grow with created_at
+            return queryset.filter(id__gt=message_id) if newer else queryset.filter(id__lt=message_id)
+        # a range on created_at keeps the seek inside the index
+        if newer:
+            return queryset.filter(created_at__gte=created_at).exclude(created_at=created_at, id__lte=message_id)
+        return queryset.filter(created_at__lte=created_at).exclude(created_at=created_at, id__gte=message_id)
+
+    @classmethod
+    def history(cls, user_id, before=None, limit=50):
+        """
+        The ``limit`` latest messages, or those older than message ``before``,
+        oldest first. Returns (messages, has_older).
+        """
+        queryset = cls.objects.filter(user_id=user_id) if before is None else cls._seek(user_id, before, newer=False)
+        rows = list(queryset.order_by('-created_at', '-id')[:limit + 1])
+        has_older = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        return rows, has_older
+
+    @classmethod
+    def since(cls, user_id, after, limit=100):
+        """Messages newer than message ``after``, oldest first. Returns (messages, has_newer)."""
+        rows = list(cls._seek(user_id, after, newer=True).order_by('created_at', 'id')[:limit + 1])
+        return rows[:limit], len(rows) > limit
+
+
+
+
+class UnreadCounter(models.Model):
+    """
+    Unread messages per audience (a user id, or ``staff`` for the shared
+    inbox), kept in step with message writes so every process reads the
+    same number from one primary key lookup.
+    """
+    audience = models.CharField(max_length=20, primary_key=True)
+    count = models.IntegerField(default=0)
+    changed_at = models.DateTimeField(null=True, blank=True, help_text="When the count last changed; empty if unknown")
+
+    class Meta:
+        db_table = 'support_unread_counters'
+        verbose_name = 'Unread Counter'
+        verbose_name_plural = 'Unread Counters'
+
+    def __str__(self):
+        return f"{self.audience}: {self.count}"
+
+    @classmethod
+    def current(cls, audience):
+        counter = cls.objects.filter(pk=audience).first()
+        if counter is None:
+            counter = cls.refresh(audience)
+        return counter
+
+    @classmethod
+    def adjust(cls, audience, delta):
+        """Move the counter by ``delta`` with ``UPDATE ... SET count = count + delta``."""
+        if not delta:
+            return
+        if not cls.objects.filter(pk=audience).update(count=F('count') + delta, changed_at=timezone.now()):
+            # first message for this audience; the count already includes it
+            cls.refresh(audience)
+
+    @classmethod
+    def refresh(cls, audience):
+        """Recount from the messages table, for writes whose effect is not known."""
+        from .events import count_unread
+
+        count = count_unread(audience)
+        with transaction.atomic():
+            counter = cls.objects.select_for_update().filter(pk=audience).first()
+            if counter is None:
+                try:
+                    with transaction.atomic():
+                        return cls.objects.create(audience=audience, count=count)
+                except IntegrityError:
+                    counter = cls.objects.select_for_update().get(pk=audience)
+            if counter.count != count:
+                counter.count = count
+                counter.changed_at = timezone.now()
+                counter.save(update_fields=['count', 'changed_at'])
+        return counter
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .events import STAFF, message_changed, recipient_audience
+from .models import SuppportMessage, UnreadCounter
+
+
+@receiver(post_save, sender=SuppportMessage)
+def publish_support_message(sender, instance, created, **kwargs):
+    message = None
+    if created:
+        if not instance.is_read:
+            UnreadCounter.adjust(recipient_audience(instance.user_id, instance.is_admin_reply), 1)
+        message = {
+            'id': instance.pk,
+            'user_id': instance.user_id,
+            'is_admin_reply': instance.is_admin_reply,
+            'created_at': instance.created_at.isoformat(),
+            'preview': instance.message[:100],
+        }
+    else:
+        # an edit may have flipped is_read or is_admin_reply
+        for audience in (str(instance.user_id), STAFF):
+            UnreadCounter.refresh(audience)
+    message_changed(instance.user_id, message)
+
+
+@receiver(post_delete, sender=SuppportMessage)
+def refresh_unread_count(sender, instance, **kwargs):
+    if not instance.is_read:
+        UnreadCounter.adjust(recipient_audience(instance.user_id, instance.is_admin_reply), -1)
+    message_changed(instance.user_id)
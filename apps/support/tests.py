@@ -1,3 +1,201 @@
+import asyncio
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from apps.support.events import POLL_MAX_SECONDS, POLL_MIN_SECONDS, STAFF, broker, bump_unread_version
+from apps.support.models import SuppportMessage, UnreadCounter
+from core.testing import QueryBudgetMixin, create_user
+
+
+class SupportViewQueryTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = create_user('staff', is_staff=True)
+        cls.user = create_user('alice')
+        SuppportMessage.objects.create(user=cls.user, message='Hello')
+        SuppportMessage.objects.create(user=cls.user, message='Hi, how can we help?', is_admin_reply=True)
+
+    def grow(self):
+        for number in range(10):
+            user = create_user(f'customer{number}')
+            SuppportMessage.objects.create(user=user, message='Card is blocked')
+            SuppportMessage.objects.create(user=user, message='Unblocked it', is_admin_reply=True)
+            SuppportMessage.objects.create(user=self.user, message=f'Follow up {number}')
+            SuppportMessage.objects.create(user=self.user, message=f'Answer {number}', is_admin_reply=True)
+
+    def test_user_chat(self):
+        self.client.force_login(self.user)
+        self.assertQueryBudget(reverse('support:user_chat'), 5)
+
+    def test_unread_count(self):
+        self.client.force_login(self.user)
+        self.assertQueryBudget(reverse('support:get_unread_count'), 3)
+
+    def test_admin_chat_list(self):
+        self.client.force_login(self.staff)
+        self.assertQueryBudget(reverse('support:admin_chat_list'), 4)
+
+    def test_admin_chat_detail(self):
+        self.client.force_login(self.staff)
+        self.assertQueryBudget(reverse('support:admin_chat_detail', kwargs={'user_id': self.user.pk}), 6)
+
+
+class ChatHistoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = create_user('staff', is_staff=True)
+        cls.user = create_user('alice')
+        cls.chat = [
+            SuppportMessage.objects.create(user=cls.user, message=f'Message {number}', is_admin_reply=number % 2 == 1)
+            for number in range(120)
+        ]
+
+    def test_chat_shows_latest_page(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('support:user_chat'))
+        self.assertEqual(response.context['chat_messages'], self.chat[-50:])
+        self.assertTrue(response.context['has_older'])
+
+    def test_older_pages(self):
+        self.client.force_login(self.user)
+        url = reverse('support:user_chat_messages')
+
+        data = self.client.get(url, {'before': self.chat[-50].pk}).json()
+        self.assertEqual([message['id'] for message in data['messages']], [message.pk for message in self.chat[20:70]])
+        self.assertTrue(data['has_more'])
+
+        data = self.client.get(url, {'before': self.chat[20].pk}).json()
+        self.assertEqual(len(data['messages']), 20)
+        self.assertFalse(data['has_more'])
+
+    def test_new_messages_are_marked_read(self):
+        self.client.force_login(self.staff)
+        url = reverse('support:admin_chat_messages', kwargs={'user_id': self.user.pk})
+        data = self.client.get(url, {'after': self.chat[-3].pk}).json()
+
+        self.assertEqual([message['id'] for message in data['messages']], [self.chat[-2].pk, self.chat[-1].pk])
+        self.assertIn('Message 119', data['html'])
+        self.assertTrue(SuppportMessage.objects.get(pk=self.chat[-2].pk).is_read)
+        self.assertFalse(SuppportMessage.objects.get(pk=self.chat[-1].pk).is_read)
+
+    def test_other_users_chat_is_not_visible(self):
+        self.client.force_login(create_user('bob'))
+        data = self.client.get(reverse('support:user_chat_messages'), {'before': self.chat[-1].pk}).json()
+        self.assertEqual(data['messages'], [])
+
+    def test_invalid_id(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('support:user_chat_messages'), {'after': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class UnreadCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = create_user('staff', is_staff=True)
+        cls.user = create_user('alice')
+
+    def unread_count(self, user):
+        self.client.force_login(user)
+        return self.client.get(reverse('support:get_unread_count')).json()['unread_count']
+
+    def test_counter_row_needs_no_count_query(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('support:get_unread_count'))
+        # session, user and the counter row
+        with self.assertNumQueries(3) as queries:
+            self.client.get(reverse('support:get_unread_count'))
+        self.assertNotIn('COUNT', ' '.join(query['sql'] for query in queries.captured_queries))
+
+    def test_counter_is_shared_through_the_database(self):
+        SuppportMessage.objects.create(user=self.user, message='Hello')
+        SuppportMessage.objects.create(user=self.user, message='Again')
+        # nothing process-local is involved
+        cache.clear()
+        self.assertEqual(UnreadCounter.objects.get(pk=STAFF).count, 2)
+        self.assertEqual(self.unread_count(self.staff), 2)
+
+        message = SuppportMessage.objects.first()
+        message.is_read = True
+        message.save()
+        self.assertEqual(UnreadCounter.objects.get(pk=STAFF).count, 1)
+
+    def test_counter_follows_messages(self):
+        self.assertEqual(self.unread_count(self.staff), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SuppportMessage.objects.create(user=self.user, message='Hello')
+            reply = SuppportMessage.objects.create(user=self.user, message='Hi', is_admin_reply=True)
+        self.assertEqual(self.unread_count(self.staff), 1)
+        self.assertEqual(self.unread_count(self.user), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('support:user_chat'))
+        self.assertEqual(self.unread_count(self.user), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reply.delete()
+            self.client.force_login(self.staff)
+            self.client.get(reverse('support:admin_chat_detail', kwargs={'user_id': self.user.pk}))
+        self.assertEqual(self.unread_count(self.staff), 0)
+
+    def test_unchanged_count_is_not_modified(self):
+        self.client.force_login(self.user)
+        url = reverse('support:get_unread_count')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(int(response['Retry-After']), POLL_MAX_SECONDS)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SuppportMessage.objects.create(user=self.user, message='Hi', is_admin_reply=True)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'unread_count': 1})
+        self.assertEqual(int(response['Retry-After']), POLL_MIN_SECONDS)
+
+    async def test_stream_pushes_counts(self):
+        await SuppportMessage.objects.acreate(user=self.user, message='Hi', is_admin_reply=True)
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(reverse('support:unread_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = aiter(response.streaming_content)
+        first = await anext(stream)
+        self.assertIn(b'event: unread\ndata: {"unread_count": 1}', first)
+
+        broker.publish(str(self.user.pk), 'unread', {'unread_count': 2})
+        pushed = await asyncio.wait_for(anext(stream), 1)
+        self.assertEqual(pushed, b'event: unread\ndata: {"unread_count": 2}\n\n')
+        await stream.aclose()
+
+    async def test_idle_keepalive_reads_the_row_only_after_a_change(self):
+        await SuppportMessage.objects.acreate(user=self.user, message='Hi', is_admin_reply=True)
+        await self.async_client.aforce_login(self.user)
+
+        counters = UnreadCounter.objects
+        with mock.patch('apps.support.views.STREAM_KEEPALIVE', 0.01):
+            response = await self.async_client.get(reverse('support:unread_stream'))
+            stream = aiter(response.streaming_content)
+            await anext(stream)
+
+            with mock.patch.object(counters, 'filter', wraps=counters.filter) as lookup:
+                self.assertEqual(await anext(stream), b': keepalive\n\n')
+                self.assertEqual(await anext(stream), b': keepalive\n\n')
+                lookup.assert_not_called()
 
-# Create your tests here.
+                # another process changed the row and the version, but its broker is not ours
+                await counters.filter(pk=str(self.user.pk)).aupdate(count=3)
+                bump_unread_version(str(self.user.pk))
+                lookup.reset_mock()
+                self.assertEqual(await anext(stream), b'event: unread\ndata: {"unread_count": 3}\n\n')
+                lookup.assert_called_once()
+            await stream.aclose()
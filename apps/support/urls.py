@@ -8,5 +8,8 @@ urlpatterns = [
     
     path('admin/chats/', views.admin_chat_list, name='admin_chat_list'),
     path('admin/chat/<int:user_id>/', views.admin_chat_detail, name='admin_chat_detail'),
+    path('admin/chat/<int:user_id>/messages/', views.admin_chat_messages, name='admin_chat_messages'),
+    path('api/messages/', views.user_chat_messages, name='user_chat_messages'),
     path('api/unread/', views.get_unread_count, name='get_unread_count'),
+    path('api/unread/stream/', views.unread_stream, name='unread_stream'),
 ]
\ No newline at end of file
@@ -1,19 +1,68 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.cache import get_conditional_response
 
-from .models import SuppportMessage
+from .models import SuppportMessage, UnreadCounter
 from .forms import SupportForm
+from .events import audience_for, broker, messages_read
+from . import events
+
+
+CHAT_PAGE_SIZE = 50
 
 
+def chat_messages_response(request, chat_user, template_name, incoming_admin_replies):
+    """
+    JSON page of a conversation: ``?before=<id>`` for older messages,
+    ``?after=<id>`` for new ones. New messages from the other side are
+    marked as read since the reader is looking at them.
+    """
+    try:
+        before = int(request.GET['before']) if 'before' in request.GET else None
+        after = int(request.GET['after']) if 'after' in request.GET else None
+    except ValueError:
+        return JsonResponse({'error': 'Message ids must be integers'}, status=400)
+
+    if after is not None:
+        rows, has_more = SuppportMessage.since(chat_user.pk, after)
+        unread = [message.pk for message in rows if message.is_admin_reply == incoming_admin_replies and not message.is_read]
+        if unread:
+            read = SuppportMessage.objects.filter(pk__in=unread, is_read=False).update(is_read=True)
+            messages_read(chat_user.pk, incoming_admin_replies, read)
+    else:
+        rows, has_more = SuppportMessage.history(chat_user.pk, before, CHAT_PAGE_SIZE)
+
+    return JsonResponse({
+        'messages': [
+            {
+                'id': message.pk,
+                'is_admin_reply': message.is_admin_reply,
+                'created_at': message.created_at.isoformat(),
+            }
+            for message in rows
+        ],
+        'html': render_to_string(template_name, {'chat_messages': rows, 'chat_user': chat_user}, request),
+        'has_more': has_more,
+    })
+
 
 @login_required
 def user_chat(request):
-    user_message = SuppportMessage.objects.filter(user= request.user).order_by('created_at')
-    user_message.filter(is_admin_reply = True, is_read = False).update(is_read=True)
+    read = SuppportMessage.objects.filter(user=request.user, is_admin_reply=True, is_read=False).update(is_read=True)
+    messages_read(request.user.pk, True, read)
 
     if request.method == 'POST':
         form = SupportForm(request.POST)
@@ -28,40 +77,41 @@ def user_chat(request):
     else:
         form = SupportForm()
     
+    chat_messages, has_older = SuppportMessage.history(request.user.pk, limit=CHAT_PAGE_SIZE)
+
     context = {
-        'chat_messages': user_message,
+        'chat_messages': chat_messages,
+        'has_older': has_older,
         'form': form
     }
     return render(request, 'support/user_chat.html', context)
 
 
+@login_required
+def user_chat_messages(request):
+    return chat_messages_response(request, request.user, 'support/user_chat_messages.html', incoming_admin_replies=True)
+
+
 
 @staff_member_required
 def admin_chat_list(request):
     User = get_user_model()
 
-    users_w_messages = User.objects.filter(support__isnull = False).distinct()
-
-    user_data = []
-    for user in users_w_messages:
-        unread_count = SuppportMessage.objects.filter(user=user, is_admin_reply = False, is_read = False).count()
-        last_message = SuppportMessage.objects.filter(user=user).order_by('-created_at').first()
-        user_data.append({
-            'user': user,
-            'unread_count': unread_count,
-            'last_message': last_message
-        })
-    user_data.sort(
-        key = lambda x: (
-            x['unread_count'],
-            x['last_message'].created_at if x['last_message'] else None
-
-        ),
-        reverse=True
-    )
+    last_message = SuppportMessage.objects.filter(user=OuterRef('pk')).order_by('-created_at', '-id')
+
+    chat_users = User.objects.annotate(
+        unread_count=Count('support', filter=Q(support__is_admin_reply=False, support__is_read=False)),
+        last_at=Max('support__created_at'),
+        last_preview=Subquery(last_message.values('message')[:1]),
+    ).filter(
+        last_at__isnull=False
+    ).order_by('-unread_count', '-last_at', '-pk')
+
+    page_obj = Paginator(chat_users, 50).get_page(request.GET.get('page'))
 
     context = {
-        'user_data': user_data,
+        'user_data': page_obj.object_list,
+        'page_obj': page_obj,
     }
     return render(request, 'support/admin_chat_list.html', context)
     
@@ -73,9 +123,8 @@ def admin_chat_detail(request, user_id):
     User = get_user_model()
 
     chat_user = get_object_or_404(User, id = user_id)
-    user_message = SuppportMessage.objects.filter(user=chat_user).order_by('created_at')
-
-    user_message.filter(is_admin_reply=False, is_read=False).update(is_read=True)
+    read = SuppportMessage.objects.filter(user=chat_user, is_admin_reply=False, is_read=False).update(is_read=True)
+    messages_read(chat_user.pk, False, read)
 
     if request.method == 'POST':
         form = SupportForm(request.POST)
@@ -90,19 +139,119 @@ def admin_chat_detail(request, user_id):
     else:
         form = SupportForm()
     
+    chat_messages, has_older = SuppportMessage.history(chat_user.pk, limit=CHAT_PAGE_SIZE)
+
     context = {
         'chat_user': chat_user,
-        'chat_messages': user_message,
+        'chat_messages': chat_messages,
+        'has_older': has_older,
         'form': form
     }
     return render(request, 'support/admin_chat_detail.html', context)
 
 
+@staff_member_required
+def admin_chat_messages(request, user_id):
+    chat_user = get_object_or_404(get_user_model(), id=user_id)
+    return chat_messages_response(request, chat_user, 'support/admin_chat_messages.html', incoming_admin_replies=False)
+
+
 @login_required
 def get_unread_count(request):
-    if request.user.is_staff:
-        count = SuppportMessage.objects.filter(is_admin_reply = False, is_read = False).count()
+    """
+    Served from the counter row. Pollers get a 304 while the count is
+    unchanged and a ``Retry-After`` that grows while it stays quiet.
+    """
+    audience = audience_for(request.user)
+    count, changed_at = events.unread_state(audience)
+    etag = f'"unread-{count}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse({'unread_count': count})
+        response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    response['Retry-After'] = events.poll_interval(changed_at)
+    return response
+
+
+STREAM_KEEPALIVE = 15
+STREAM_DURATION = 300
+STREAM_RETRY_MS = 5000
+
+
+def server_sent_event(event, data, retry=None):
+    lines = []
+    if retry is not None:
+        lines.append(f'retry: {retry}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def unread_events(audience, sent, version=None):
+    """
+    ``unread`` and ``message`` events as they are published. On each
+    keepalive the stream compares the audience's version in the cache with
+    ``version`` and reads the counter row only when another process has
+    changed it, so idle streams cost no queries.
+    """
+    queue = broker.subscribe(audience)
+    try:
+        yield server_sent_event('unread', {'unread_count': sent}, retry=STREAM_RETRY_MS)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STREAM_DURATION
+        while loop.time() < deadline:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                current = await cache.aget(events.unread_version_key(audience))
+                stored = None
+                if current != version:
+                    version = current
+                    stored = await UnreadCounter.objects.filter(pk=audience).values_list('count', flat=True).afirst()
+                if stored is not None and stored != sent:
+                    sent = stored
+                    yield server_sent_event('unread', {'unread_count': sent})
+                else:
+                    yield ': keepalive\n\n'
+                continue
+
+            if event == 'unread':
+                if data['unread_count'] == sent:
+                    continue
+                sent = data['unread_count']
+            yield server_sent_event(event, data)
+    finally:
+        broker.unsubscribe(audience, queue)
+
+
+async def unread_stream(request):
+    """
+    Server-Sent Events replacement for polling ``get_unread_count``.
+
+    Under ASGI the connection stays open for ``STREAM_DURATION`` seconds
+    and the browser reconnects after ``STREAM_RETRY_MS``. Under WSGI a
+    held connection would pin a worker, so only the current count is sent
+    and ``EventSource`` reconnects after the same adaptive interval that
+    ``get_unread_count`` sends as ``Retry-After``.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    audience = audience_for(user)
+    # read the version first: a change made after it is seen on the next keepalive
+    version = await cache.aget(events.unread_version_key(audience))
+    count, changed_at = await sync_to_async(events.unread_state)(audience)
+
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(unread_events(audience, count, version), content_type='text/event-stream')
+        response['X-Accel-Buffering'] = 'no'
     else:
-        count = SuppportMessage.objects.filter(user=request.user, is_admin_reply=True, is_read = False).count()
-    
-    return JsonResponse({'unread_count': count})
+        retry = events.poll_interval(changed_at) * 1000
+        event = server_sent_event('unread', {'unread_count': count}, retry=retry)
+        response = HttpResponse(event, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
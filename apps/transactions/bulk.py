@@ -0,0 +1,110 @@
+from django.db import transaction as db_transaction
+from django.db.models import Case, F, Q, Sum, When
+from django.utils import timezone
+
+from apps.cards.balances import adjust_balance
+from .models import SpendingRollup, Transaction, TransactionTag, TransactionTagRelation
+
+
+class TransactionBulkEditor:
+    """
+    Set-based actions on a user's selection of transactions.
+
+    Every action runs in one atomic block with a fixed number of queries
+    however many rows are selected: balances and rollups are updated from
+    one grouped aggregate over the selection, and the rows themselves are
+    changed with a single ``UPDATE``/``DELETE``/``INSERT``. Nothing goes
+    through ``Transaction.save()``/``delete()``, so the balance, ledger and
+    rollup bookkeeping they do per row is done here once per selection.
+    """
+
+    TAG_ACTIONS = ('add', 'remove', 'replace')
+
+    def __init__(self, user, transaction_ids):
+        self.user = user
+        self.transactions = Transaction.objects.filter(user=user, pk__in=transaction_ids)
+
+    def _done(self):
+        # queryset update/delete send no model signals
+        from apps.dashboard.snapshot import invalidate_snapshot
+        invalidate_snapshot(self.user.pk)
+
+    def delete(self):
+        """
+        Delete the selection, reversing its net effect on each card with one
+        ``UPDATE`` per card. Returns the number of transactions deleted.
+        """
+        with db_transaction.atomic():
+            # locked so rows cannot be edited between the aggregate and the delete
+            ids = list(self.transactions.select_for_update().values_list('pk', flat=True))
+            if not ids:
+                return 0
+
+            selection = Transaction.objects.filter(pk__in=ids)
+            net_by_card = selection.values('card_id').annotate(
+                net=Sum(Case(
+                    When(type='income', then=F('amount')),
+                    When(type='expense', then=-F('amount')),
+                ))
+            ).order_by('card_id')
+            for row in net_by_card:
+                if row['net']:
+                    adjust_balance(row['card_id'], -row['net'], kind='transaction')
+            SpendingRollup.remove_queryset(selection)
+            selection.delete()
+
+        self._done()
+        return len(ids)
+
+    def recategorise(self, category):
+        """
+        Move the selection to ``category``. Only transactions of the
+        category's type are moved. Returns the number moved.
+        """
+        with db_transaction.atomic():
+            selection = self.transactions.filter(type=category.type).exclude(category=category)
+            ids = list(selection.select_for_update().values_list('pk', flat=True))
+            if not ids:
+                return 0
+
+            selection = Transaction.objects.filter(pk__in=ids)
+            SpendingRollup.move_queryset(selection, category.pk)
+            selection.update(category=category, updated_at=timezone.now())
+
+        self._done()
+        return len(ids)
+
+    def retag(self, tags, action='add'):
+        """
+        ``add`` the tags to every selected transaction, ``remove`` them, or
+        ``replace`` the existing tags with them. Tags must be the user's own
+        or default ones. Returns the number of tag links created or removed.
+        """
+        if action not in self.TAG_ACTIONS:
+            raise ValueError(f"Unknown tag action '{action}'")
+
+        tag_ids = list(
+            TransactionTag.objects.filter(Q(user=None) | Q(user=self.user), pk__in=[getattr(tag, 'pk', tag) for tag in tags])
+            .values_list('pk', flat=True)
+        )
+        links = TransactionTagRelation.objects.filter(transaction__in=self.transactions)
+
+        with db_transaction.atomic():
+            if action == 'remove':
+                changed, _ = links.filter(tag_id__in=tag_ids).delete()
+                return changed
+
+            removed = 0
+            if action == 'replace':
+                removed, _ = links.exclude(tag_id__in=tag_ids).delete()
+
+            ids = list(self.transactions.values_list('pk', flat=True))
+            existing = set(links.filter(tag_id__in=tag_ids).values_list('transaction_id', 'tag_id'))
+            created = TransactionTagRelation.objects.bulk_create([
+                TransactionTagRelation(transaction_id=transaction_id, tag_id=tag_id)
+                for transaction_id in ids
+                for tag_id in tag_ids
+                if (transaction_id, tag_id) not in existing
+            ], ignore_conflicts=True)
+
+        return removed + len(created)
@@ -186,4 +186,56 @@ class BulkDeleteForm(forms.Form):
     transaction_ids = forms.MultipleChoiceField(
         widget=forms.CheckboxSelectMultiple,
         required=True
-    )
\ No newline at end of file
+    )
+
+
+class TransactionImportForm(forms.Form):
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('ofx', 'OFX'),
+    ]
+
+    file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.ofx,.qfx'
+        })
+    )
+    format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    card = forms.ModelChoiceField(
+        queryset=Card.objects.none(),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        empty_label='Default card',
+        help_text="Used for rows without a card column (always used for OFX)"
+    )
+    income_category = forms.ModelChoiceField(
+        queryset=Category.objects.none(),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        help_text="Used for income rows without a known category"
+    )
+    expense_category = forms.ModelChoiceField(
+        queryset=Category.objects.none(),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        help_text="Used for expense rows without a known category"
+    )
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+
+        if user:
+            from django.db.models import Q
+            categories = Category.objects.filter(
+                Q(user=None) | Q(user=user),
+                is_active=True
+            ).order_by('name')
+
+            self.fields['card'].queryset = Card.objects.filter(user=user, status='active')
+            self.fields['income_category'].queryset = categories.filter(type='income')
+            self.fields['expense_category'].queryset = categories.filter(type='expense')
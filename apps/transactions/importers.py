@@ -0,0 +1,256 @@
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction as db_transaction
+from django.db.models import Q
+
+from apps.cards.balances import adjust_balance, balance_delta
+from apps.cards.models import Card, Currency, ExchangeRate
+from core.csvrows import LINE_KEY, check_extra_values, read_rows
+from .models import Category, Transaction, SpendingRollup, TransactionSearchToken
+
+
+def parse_csv(lines):
+    """
+    Yield one row dict per CSV record (see ``core.csvrows.read_rows``).
+
+    Expected columns: date, type, amount, title, category, card,
+    description, location. Only date and amount are required; a negative
+    amount without a type is treated as an expense.
+    """
+    return read_rows(lines)
+
+
+OFX_TAG = re.compile(r'(?=<)')
+OFX_FIELD = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def parse_ofx(lines):
+    """
+    Yield one row dict per <STMTTRN> block of an OFX statement.
+
+    Handles both SGML (unclosed tags) and XML flavours. Each block is
+    yielded as soon as it ends, so the file is never held in memory.
+    """
+    block = None
+    for line in lines:
+        for part in OFX_TAG.split(line):
+            tag = part.strip().upper()
+            if tag.startswith('<STMTTRN>'):
+                if block is not None:
+                    yield _ofx_row(block)
+                block = ''
+            elif tag.startswith('</STMTTRN>') or tag.startswith('</BANKTRANLIST>'):
+                if block is not None:
+                    yield _ofx_row(block)
+                block = None
+            elif block is not None:
+                block += part
+
+    if block is not None:
+        yield _ofx_row(block)
+
+
+def _ofx_row(block):
+    fields = {name.upper(): value.strip() for name, value in OFX_FIELD.findall(block)}
+    posted = fields.get('DTPOSTED', '')[:8]
+    return {
+        'date': f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}" if len(posted) == 8 else '',
+        'amount': fields.get('TRNAMT', ''),
+        'title': fields.get('NAME', '') or fields.get('MEMO', ''),
+        'description': fields.get('MEMO', ''),
+        'type': '',
+        'category': '',
+        'card': '',
+        'location': '',
+    }
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+}
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        if not self.seconds:
+            return 0.0
+        return (self.created + self.skipped) / self.seconds
+
+
+class TransactionImporter:
+    """
+    Streams parsed rows into ``Transaction.objects.bulk_create``.
+
+    Cards, categories and exchange rates are loaded once up front, rows
+    are inserted in chunks, and balances and spending rollups get one
+    net update per key at the end, all inside one atomic block.
+    """
+
+    max_errors = 100
+
+    def __init__(self, user, card=None, income_category=None, expense_category=None, batch_size=1000):
+        self.user = user
+        self.default_card = card
+        self.batch_size = batch_size
+
+        self.cards = {}
+        for user_card in Card.objects.filter(user=user).select_related('currency'):
+            self.cards[str(user_card.pk)] = user_card
+            self.cards[user_card.card_name.lower()] = user_card
+            if user_card.card_number_last4:
+                self.cards.setdefault(user_card.card_number_last4, user_card)
+            if user_card.is_default and self.default_card is None:
+                self.default_card = user_card
+
+        self.categories = {}
+        categories = Category.objects.filter(Q(user=None) | Q(user=user), is_active=True).order_by('user_id')
+        for category in categories:
+            # user categories come last and win over system ones with the same name
+            self.categories[(category.name.lower(), category.type)] = category
+            self.categories[str(category.pk)] = category
+
+        self.default_categories = {
+            'income': self._find_category(income_category, 'income'),
+            'expense': self._find_category(expense_category, 'expense'),
+        }
+
+        self.user_currency = Currency.objects.get(code=user.default_currency)
+        self.rates = {}
+
+    def _find_category(self, value, transaction_type):
+        if not value:
+            return None
+        if isinstance(value, Category):
+            return value
+        category = self.categories.get((str(value).lower(), transaction_type)) or self.categories.get(str(value))
+        if category is None or category.type != transaction_type:
+            return None
+        return category
+
+    def _rate(self, card_currency_id, on_date):
+        if card_currency_id == self.user_currency.pk:
+            return Decimal('1.0')
+
+        key = (card_currency_id, on_date)
+        if key not in self.rates:
+            self.rates[key] = (
+                ExchangeRate.get_rate_on(card_currency_id, self.user_currency.pk, on_date)
+                or ExchangeRate.get_latest_rate(card_currency_id, self.user_currency.pk)
+            )
+        return self.rates[key]
+
+    def build(self, row):
+        check_extra_values(row)
+
+        try:
+            amount = Decimal(row.get('amount', '').replace(',', ''))
+        except InvalidOperation:
+            raise ValueError(f"Invalid amount '{row.get('amount')}'")
+
+        transaction_type = row.get('type', '').lower()
+        if transaction_type not in ('income', 'expense'):
+            if transaction_type:
+                raise ValueError(f"Invalid type '{row.get('type')}'")
+            transaction_type = 'expense' if amount < 0 else 'income'
+        amount = abs(amount).quantize(Decimal('0.01'))
+        if amount < Decimal('0.01'):
+            raise ValueError("Amount must be at least 0.01")
+
+        try:
+            transaction_date = date.fromisoformat(row.get('date', ''))
+        except ValueError:
+            raise ValueError(f"Invalid date '{row.get('date')}'")
+
+        card_key = row.get('card', '')
+        if card_key:
+            card = self.cards.get(card_key.lower())
+            if card is None:
+                raise ValueError(f"Unknown card '{card_key}'")
+        else:
+            card = self.default_card
+            if card is None:
+                raise ValueError("No card given and no default card")
+
+        category = self._find_category(row.get('category'), transaction_type) or self.default_categories[transaction_type]
+        if category is None:
+            raise ValueError(f"Unknown {transaction_type} category '{row.get('category', '')}'")
+
+        rate = self._rate(card.currency_id, transaction_date) or Decimal('1.0')
+
+        return Transaction(
+            user=self.user,
+            card=card,
+            category=category,
+            type=transaction_type,
+            amount=amount,
+            amount_in_user_currency=(amount * rate).quantize(Decimal('0.01')),
+            exchange_rate_used=rate,
+            title=(row.get('title') or row.get('description') or 'Imported transaction')[:200],
+            description=row.get('description') or None,
+            location=(row.get('location') or '')[:200] or None,
+            date=transaction_date,
+        )
+
+    def _insert(self, batch):
+        Transaction.objects.bulk_create(batch)
+        TransactionSearchToken.index(batch, replace=False, batch_size=self.batch_size)
+
+    def run(self, rows):
+        result = ImportResult()
+        started = time.perf_counter()
+
+        card_deltas = defaultdict(Decimal)
+        rollups = defaultdict(lambda: [0, Decimal('0'), Decimal('0')])
+
+        with db_transaction.atomic():
+            batch = []
+            for number, row in enumerate(rows, start=1):
+                line_number = row.get(LINE_KEY, number)
+                try:
+                    transaction = self.build(row)
+                except ValueError as error:
+                    result.skipped += 1
+                    if len(result.errors) < self.max_errors:
+                        result.errors.append((line_number, str(error)))
+                    continue
+
+                card_deltas[transaction.card_id] += balance_delta(transaction.amount, transaction.type)
+                rollup = rollups[(self.user.pk, transaction.category_id, transaction.card.currency_id, transaction.type, transaction.date)]
+                rollup[0] += 1
+                rollup[1] += transaction.amount
+                rollup[2] += transaction.amount_in_user_currency
+
+                batch.append(transaction)
+                if len(batch) >= self.batch_size:
+                    self._insert(batch)
+                    result.created += len(batch)
+                    batch = []
+
+            if batch:
+                self._insert(batch)
+                result.created += len(batch)
+
+            for card_id, delta in card_deltas.items():
+                adjust_balance(card_id, delta, kind='import')
+
+            SpendingRollup.apply_many(rollups, batch_size=self.batch_size)
+
+        # bulk_create and the balance updates send no model signals
+        from apps.dashboard.snapshot import invalidate_snapshot
+        invalidate_snapshot(self.user.pk)
+
+        result.seconds = time.perf_counter() - started
+        return result
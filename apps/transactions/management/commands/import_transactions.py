@@ -0,0 +1,65 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.models import CustomUser
+from apps.cards.models import Card
+from apps.transactions.importers import PARSERS, TransactionImporter
+
+
+class Command(BaseCommand):
+    help = "Import transactions for a user from a CSV or OFX bank statement"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to the statement file")
+        parser.add_argument('--user', required=True, help="Username to import for")
+        parser.add_argument('--format', choices=sorted(PARSERS), help="File format (defaults to the file extension)")
+        parser.add_argument('--card', help="Card id or name for rows without a card column")
+        parser.add_argument('--income-category', help="Category for income rows without a known category")
+        parser.add_argument('--expense-category', help="Category for expense rows without a known category")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(username=options['user'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if file_format == 'qfx':
+            file_format = 'ofx'
+        if file_format not in PARSERS:
+            raise CommandError(f"Unknown format '{file_format}', use --format")
+
+        card = None
+        if options['card']:
+            cards = Card.objects.filter(user=user)
+            card = (
+                cards.filter(pk=options['card']).first() if options['card'].isdigit() else None
+            ) or cards.filter(card_name__iexact=options['card']).first()
+            if card is None:
+                raise CommandError(f"Card '{options['card']}' not found for {user.username}")
+
+        importer = TransactionImporter(
+            user,
+            card=card,
+            income_category=options['income_category'],
+            expense_category=options['expense_category'],
+            batch_size=options['batch_size'],
+        )
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as statement:
+                result = importer.run(PARSERS[file_format](statement))
+        except UnicodeDecodeError:
+            raise CommandError("The file must be UTF-8 encoded")
+        except csv.Error as error:
+            raise CommandError(f"The file is not valid CSV: {error}")
+
+        for line_number, error in result.errors:
+            self.stderr.write(f"Row {line_number}: {error}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} transaction(s), skipped {result.skipped} "
+            f"in {result.seconds:.2f}s ({result.rows_per_second:,.0f} rows/s)"
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.models import CustomUser
+from apps.transactions.models import TransactionSearchToken
+
+
+class Command(BaseCommand):
+    help = "Rebuild the transaction search token index from the transactions table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rebuild the index for this username")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = CustomUser.objects.get(username=options['user'])
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        created = TransactionSearchToken.rebuild(user=user, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {created} search token(s)"))
@@ -0,0 +1,72 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_rollups(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    SpendingRollup = apps.get_model('transactions', 'SpendingRollup')
+
+    rows = Transaction.objects.values(
+        'user_id', 'category_id', 'card__currency', 'type', 'date'
+    ).annotate(
+        total_count=Count('id'),
+        total=Sum('amount'),
+        total_in_user_currency=Sum('amount_in_user_currency')
+    ).order_by()
+
+    SpendingRollup.objects.bulk_create(
+        (
+            SpendingRollup(
+                user_id=row['user_id'],
+                category_id=row['category_id'],
+                currency_id=row['card__currency'],
+                type=row['type'],
+                date=row['date'],
+                count=row['total_count'],
+                amount=row['total'],
+                amount_in_user_currency=row['total_in_user_currency'] or 0,
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0001_initial'),
+        ('transactions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('date', models.DateField()),
+                ('count', models.IntegerField(default=0, help_text='Number of transactions on this day')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, help_text='Total in card currency', max_digits=20)),
+                ('amount_in_user_currency', models.DecimalField(decimal_places=2, default=0, help_text="Total in user's default currency", max_digits=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_rollups', to='transactions.category')),
+                ('currency', models.ForeignKey(help_text='Card currency of the rolled up transactions', on_delete=django.db.models.deletion.CASCADE, related_name='spending_rollups', to='cards.currency')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Spending Rollup',
+                'verbose_name_plural': 'Spending Rollups',
+                'db_table': 'spending_rollups',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['user', '-date'], name='spending_ro_user_id_29e979_idx'), models.Index(fields=['user', 'category', '-date'], name='spending_ro_user_id_9d1dce_idx')],
+                'unique_together': {('user', 'category', 'currency', 'type', 'date')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
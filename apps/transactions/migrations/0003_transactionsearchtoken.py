@@ -0,0 +1,51 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from apps.transactions.search import weighted_tokens
+
+
+def build_search_index(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    TransactionSearchToken = apps.get_model('transactions', 'TransactionSearchToken')
+
+    transactions = Transaction.objects.only('id', 'user_id', 'title', 'location', 'description')
+    TransactionSearchToken.objects.bulk_create(
+        (
+            TransactionSearchToken(transaction_id=transaction.pk, user_id=transaction.user_id, token=token, weight=weight)
+            for transaction in transactions.iterator(chunk_size=1000)
+            for token, weight in weighted_tokens(transaction.title, transaction.location, transaction.description).items()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0002_spendingrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1, help_text='Summed field weight of the token (title > location > description)')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='transactions.transaction')),
+                ('user', models.ForeignKey(db_index=False, help_text='Copied from the transaction so lookups stay on one index', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Transaction Search Token',
+                'verbose_name_plural': 'Transaction Search Tokens',
+                'db_table': 'transaction_search_tokens',
+                'indexes': [models.Index(fields=['user', 'token'], name='transaction_user_id_988b92_idx')],
+                'unique_together': {('transaction', 'token')},
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,15 @@
-from django.db import models
+from collections import defaultdict
+
+from django.db import models, IntegrityError
+from django.db import transaction as db_transaction
+from django.db.models import F, Sum, Count, Q
+from django.core.cache import cache
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from decimal import Decimal
 from apps.accounts.models import CustomUser
 from apps.cards.models import *
+from apps.cards.balances import adjust_balance, balance_delta
 
 class Category(models.Model):
     CATEGORY_TYPE_CHOICES = [
@@ -111,7 +117,7 @@ class Transaction(models.Model):
         card_currency = self.card.currency
 
         if card_currency != user_currency:
-            rate = ExchangeRate.get_latest_rate(card_currency, user_currency)
+            rate = ExchangeRate.get_rate_on(card_currency, user_currency, self.date) or ExchangeRate.get_latest_rate(card_currency, user_currency)
             if rate:
                 self.exchange_rate_used = rate
                 self.amount_in_user_currency = self.amount * rate
@@ -124,25 +130,348 @@ class Transaction(models.Model):
 
         is_new = self.pk is None
 
-        if not is_new:
-            old_transaction = Transaction.objects.get(pk=self.pk)
-            if old_transaction.type == 'income':
-                old_transaction.card.balance -= old_transaction.amount
-            else:
-                old_transaction.card.balance += old_transaction.amount
-            old_transaction.card.save()
-
-        super().save(*args, **kwargs)
-        self.card.update_balance(self.amount, self.type)
+        with db_transaction.atomic():
+            if not is_new:
+                old_transaction = Transaction.objects.select_related('card').get(pk=self.pk)
+                adjust_balance(
+                    self.card if old_transaction.card_id == self.card_id else old_transaction.card_id,
+                    -balance_delta(old_transaction.amount, old_transaction.type),
+                    kind='transaction',
+                    object_id=self.pk
+                )
+                SpendingRollup.record(old_transaction, sign=-1)
+
+            super().save(*args, **kwargs)
+            self.card.update_balance(self.amount, self.type, object_id=self.pk)
+            SpendingRollup.record(self)
+
+            if is_new:
+                TransactionSearchToken.index([self], replace=False)
+            elif (old_transaction.title, old_transaction.location, old_transaction.description) != (self.title, self.location, self.description):
+                TransactionSearchToken.index([self])
     
     def delete(self, *args, **kwargs):
-        if self.type == 'income':
-            self.card.balance -= self.amount
-        else:
-            self.card.balance += self.amount
-        self.card.save()
+        with db_transaction.atomic():
+            adjust_balance(self.card, -balance_delta(self.amount, self.type), kind='transaction', object_id=self.pk)
+            SpendingRollup.record(self, sign=-1)
+
+            return super().delete(*args, **kwargs)
+
+class SpendingRollup(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='spending_rollups')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='spending_rollups')
+    currency = models.ForeignKey(Currency, on_delete=models.CASCADE, related_name='spending_rollups', help_text="Card currency of the rolled up transactions")
+    type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    date = models.DateField()
+    count = models.IntegerField(default=0, help_text="Number of transactions on this day")
+    amount = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Total in card currency")
+    amount_in_user_currency = models.DecimalField(max_digits=20, decimal_places=2, default=0, help_text="Total in user's default currency")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'spending_rollups'
+        verbose_name = 'Spending Rollup'
+        verbose_name_plural = 'Spending Rollups'
+        ordering = ['-date']
+        unique_together = ['user', 'category', 'currency', 'type', 'date']
+        indexes = [
+            models.Index(fields=['user', '-date']),
+            models.Index(fields=['user', 'category', '-date']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.category_id} {self.type} {self.date}: {self.amount_in_user_currency}"
+
+    @classmethod
+    def apply(cls, user_id, category_id, currency_id, type, date, count, amount, amount_in_user_currency):
+        key = {
+            'user_id': user_id,
+            'category_id': category_id,
+            'currency_id': currency_id,
+            'type': type,
+            'date': date,
+        }
+        changes = {
+            'count': F('count') + count,
+            'amount': F('amount') + amount,
+            'amount_in_user_currency': F('amount_in_user_currency') + amount_in_user_currency,
+        }
+
+        with db_transaction.atomic():
+            if not cls.objects.filter(**key).update(**changes):
+                try:
+                    with db_transaction.atomic():
+                        cls.objects.create(
+                            count=count,
+                            amount=amount,
+                            amount_in_user_currency=amount_in_user_currency,
+                            **key
+                        )
+                except IntegrityError:
+                    cls.objects.filter(**key).update(**changes)
+
+            if count < 0:
+                cls.objects.filter(count__lte=0, **key).delete()
+
+        cls.invalidate_summary(user_id)
+
+    @classmethod
+    def apply_many(cls, deltas, batch_size=1000):
+        """
+        Apply many changes at once. ``deltas`` maps
+        (user_id, category_id, currency_id, type, date) to
+        (count, amount, amount_in_user_currency).
+        """
+        if not deltas:
+            return
+
+        keys = list(deltas)
+        dates = [key[4] for key in keys]
+
+        try:
+            with db_transaction.atomic():
+                existing = {}
+                candidates = cls.objects.select_for_update().filter(
+                    user_id__in={key[0] for key in keys},
+                    category_id__in={key[1] for key in keys},
+                    date__gte=min(dates),
+                    date__lte=max(dates)
+                )
+                for rollup in candidates:
+                    key = (rollup.user_id, rollup.category_id, rollup.currency_id, rollup.type, rollup.date)
+                    if key in deltas:
+                        existing[key] = rollup
+
+                to_update, to_create = [], []
+                for key, (count, amount, amount_in_user_currency) in deltas.items():
+                    rollup = existing.get(key)
+                    if rollup is None:
+                        user_id, category_id, currency_id, type, date = key
+                        to_create.append(cls(
+                            user_id=user_id,
+                            category_id=category_id,
+                            currency_id=currency_id,
+                            type=type,
+                            date=date,
+                            count=count,
+                            amount=amount,
+                            amount_in_user_currency=amount_in_user_currency,
+                        ))
+                    else:
+                        rollup.count += count
+                        rollup.amount += amount
+                        rollup.amount_in_user_currency += amount_in_user_currency
+                        to_update.append(rollup)
+
+                cls.objects.bulk_update(to_update, ['count', 'amount', 'amount_in_user_currency'], batch_size=batch_size)
+                cls.objects.bulk_create(to_create, batch_size=batch_size)
+                cls.objects.filter(pk__in=[rollup.pk for rollup in to_update if rollup.count <= 0]).delete()
+        except IntegrityError:
+            for (user_id, category_id, currency_id, type, date), (count, amount, amount_in_user_currency) in deltas.items():
+                cls.apply(user_id, category_id, currency_id, type, date, count, amount, amount_in_user_currency)
+
+        for user_id in {key[0] for key in keys}:
+            cls.invalidate_summary(user_id)
+
+    @classmethod
+    def record(cls, transaction, sign=1):
+        cls.apply(
+            user_id=transaction.user_id,
+            category_id=transaction.category_id,
+            currency_id=transaction.card.currency_id,
+            type=transaction.type,
+            date=Transaction._meta.get_field('date').to_python(transaction.date),
+            count=sign,
+            amount=sign * transaction.amount,
+            amount_in_user_currency=sign * (transaction.amount_in_user_currency or 0),
+        )
+
+    @classmethod
+    def queryset_totals(cls, transactions):
+        """One grouped query: ``{rollup key: (count, amount, amount_in_user_currency)}``."""
+        rows = transactions.values(
+            'user_id', 'category_id', 'card__currency', 'type', 'date'
+        ).annotate(
+            total_count=Count('id'),
+            total=Sum('amount'),
+            total_in_user_currency=Sum('amount_in_user_currency')
+        ).order_by()
+
+        return {
+            (row['user_id'], row['category_id'], row['card__currency'], row['type'], row['date']): (
+                row['total_count'],
+                row['total'],
+                row['total_in_user_currency'] or 0,
+            )
+            for row in rows
+        }
+
+    @classmethod
+    def remove_queryset(cls, transactions):
+        cls.apply_many({
+            key: (-count, -amount, -amount_in_user_currency)
+            for key, (count, amount, amount_in_user_currency) in cls.queryset_totals(transactions).items()
+        })
+
+    @classmethod
+    def move_queryset(cls, transactions, category_id):
+        """Move the totals of ``transactions`` to ``category_id``; call before updating the rows."""
+        deltas = defaultdict(lambda: [0, 0, 0])
+        for key, totals in cls.queryset_totals(transactions).items():
+            user_id, _, currency_id, type, date = key
+            for target, sign in ((key, -1), ((user_id, category_id, currency_id, type, date), 1)):
+                for index, total in enumerate(totals):
+                    deltas[target][index] += sign * total
+        cls.apply_many(deltas)
+
+    @classmethod
+    def rebuild(cls, user=None, batch_size=1000):
+        transactions = Transaction.objects.all()
+        rollups = cls.objects.all()
+        if user is not None:
+            transactions = transactions.filter(user=user)
+            rollups = rollups.filter(user=user)
+
+        rows = transactions.values(
+            'user_id', 'category_id', 'card__currency', 'type', 'date'
+        ).annotate(
+            total_count=Count('id'),
+            total=Sum('amount'),
+            total_in_user_currency=Sum('amount_in_user_currency')
+        ).order_by()
+
+        with db_transaction.atomic():
+            stale_users = set(rollups.values_list('user_id', flat=True).distinct())
+            rollups.delete()
+            created = cls.objects.bulk_create(
+                (
+                    cls(
+                        user_id=row['user_id'],
+                        category_id=row['category_id'],
+                        currency_id=row['card__currency'],
+                        type=row['type'],
+                        date=row['date'],
+                        count=row['total_count'],
+                        amount=row['total'],
+                        amount_in_user_currency=row['total_in_user_currency'] or 0,
+                    )
+                    for row in rows.iterator()
+                ),
+                batch_size=batch_size
+            )
+
+        for user_id in {rollup.user_id for rollup in created} | stale_users:
+            cls.invalidate_summary(user_id)
+        return len(created)
+
+    SUMMARY_CACHE_KEY = 'transactions:summary:{user_id}'
+    # invalidation only reaches this process's cache; others catch up within this
+    SUMMARY_TIMEOUT = 60
+
+    @classmethod
+    def summarize(cls, rollups):
+        """Income/expense totals and counts for a rollup queryset in one query."""
+        totals = rollups.aggregate(
+            income_total=Sum('amount_in_user_currency', filter=Q(type='income')),
+            expense_total=Sum('amount_in_user_currency', filter=Q(type='expense')),
+            income_count=Sum('count', filter=Q(type='income')),
+            expense_count=Sum('count', filter=Q(type='expense')),
+        )
+        income_total = totals['income_total'] or Decimal('0')
+        expense_total = totals['expense_total'] or Decimal('0')
+        income_count = totals['income_count'] or 0
+        expense_count = totals['expense_count'] or 0
+
+        return {
+            'income_total': income_total,
+            'expense_total': expense_total,
+            'net_balance': income_total - expense_total,
+            'income_count': income_count,
+            'expense_count': expense_count,
+            'total_count': income_count + expense_count,
+        }
+
+    @classmethod
+    def summary_for(cls, user):
+        """
+        All-time summary for a user, cached until their next transaction
+        write or for ``SUMMARY_TIMEOUT`` seconds, whichever comes first.
+        """
+        key = cls.SUMMARY_CACHE_KEY.format(user_id=user.pk)
+        summary = cache.get(key)
+        if summary is None:
+            summary = cls.summarize(cls.objects.filter(user=user))
+            cache.set(key, summary, cls.SUMMARY_TIMEOUT)
+        return summary
+
+    @classmethod
+    def invalidate_summary(cls, user_id):
+        key = cls.SUMMARY_CACHE_KEY.format(user_id=user_id)
+        cache.delete(key)
+        db_transaction.on_commit(lambda: cache.delete(key))
+
+
+class TransactionSearchToken(models.Model):
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='search_tokens')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+', db_index=False, help_text="Copied from the transaction so lookups stay on one index")
+    token = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1, help_text="Summed field weight of the token (title > location > description)")
+
+    class Meta:
+        db_table = 'transaction_search_tokens'
+        verbose_name = 'Transaction Search Token'
+        verbose_name_plural = 'Transaction Search Tokens'
+        unique_together = ['transaction', 'token']
+        indexes = [
+            models.Index(fields=['user', 'token']),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_id}: {self.token} ({self.weight})"
+
+    @classmethod
+    def build(cls, transaction):
+        from .search import weighted_tokens
+
+        return [
+            cls(transaction_id=transaction.pk, user_id=transaction.user_id, token=token, weight=weight)
+            for token, weight in weighted_tokens(transaction.title, transaction.location, transaction.description).items()
+        ]
 
-        super().delete(*args, **kwargs)
+    @classmethod
+    def index(cls, transactions, replace=True, batch_size=1000):
+        """(Re)build the tokens of saved transactions."""
+        transactions = list(transactions)
+        if not transactions:
+            return
+
+        with db_transaction.atomic():
+            if replace:
+                cls.objects.filter(transaction__in=[transaction.pk for transaction in transactions]).delete()
+            cls.objects.bulk_create(
+                (token for transaction in transactions for token in cls.build(transaction)),
+                batch_size=batch_size
+            )
+
+    @classmethod
+    def rebuild(cls, user=None, batch_size=1000):
+        transactions = Transaction.objects.only('id', 'user_id', 'title', 'location', 'description')
+        tokens = cls.objects.all()
+        if user is not None:
+            transactions = transactions.filter(user=user)
+            tokens = tokens.filter(user=user)
+
+        with db_transaction.atomic():
+            tokens.delete()
+            created = cls.objects.bulk_create(
+                (
+                    token
+                    for transaction in transactions.iterator(chunk_size=batch_size)
+                    for token in cls.build(transaction)
+                ),
+                batch_size=batch_size
+            )
+        return len(created)
 
 class TransactionTag(models.Model):
     name = models.CharField(max_length=50, help_text="Tag name (e.g., 'urgent', 'work', 'vacation')")
@@ -0,0 +1,85 @@
+import base64
+from datetime import date, datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(transaction):
+    raw = f"{transaction.date.isoformat()}|{transaction.created_at.isoformat()}|{transaction.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (date, created_at, id) for a cursor, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        cursor_date, created_at, pk = raw.split('|')
+        return date.fromisoformat(cursor_date), datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def approximate_count(queryset, cap=1000):
+    """
+    Count at most ``cap + 1`` rows so the cost does not grow with history.
+    Returns (count, is_capped).
+    """
+    count = queryset.order_by()[:cap + 1].count()
+    return min(count, cap), count > cap
+
+
+class CursorPage:
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self.object_list else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self.object_list else None
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over transactions ordered newest first.
+
+    Pages seek on (date, created_at, id) instead of using OFFSET, so a deep
+    page costs the same as the first one and no COUNT(*) is needed.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def page(self, cursor=None, direction='next'):
+        position = decode_cursor(cursor) if cursor else None
+
+        if position is None:
+            rows = list(self.queryset.order_by('-date', '-created_at', '-id')[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], len(rows) > self.per_page, False)
+
+        cursor_date, created_at, pk = position
+
+        if direction == 'previous':
+            newer = (
+                Q(date__gt=cursor_date) |
+                Q(date=cursor_date, created_at__gt=created_at) |
+                Q(date=cursor_date, created_at=created_at, id__gt=pk)
+            )
+            rows = list(self.queryset.filter(newer).order_by('date', 'created_at', 'id')[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            return CursorPage(rows, True, has_previous)
+
+        older = (
+            Q(date__lt=cursor_date) |
+            Q(date=cursor_date, created_at__lt=created_at) |
+            Q(date=cursor_date, created_at=created_at, id__lt=pk)
+        )
+        rows = list(self.queryset.filter(older).order_by('-date', '-created_at', '-id')[:self.per_page + 1])
+        return CursorPage(rows[:self.per_page], len(rows) > self.per_page, True)
@@ -0,0 +1,73 @@
+import re
+
+from django.db.models import IntegerField, OuterRef, Q, Subquery, Sum, Value
+
+
+TOKEN_PATTERN = re.compile(r'\w+')
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TERMS = 8
+
+# a token found in the title counts more than one found in the notes
+FIELD_WEIGHTS = (
+    ('title', 3),
+    ('location', 2),
+    ('description', 1),
+)
+
+# sorts after every character, so [term, term + PREFIX_END) is a prefix range
+PREFIX_END = '\U0010ffff'
+
+
+def tokenize(text):
+    return [token[:MAX_TOKEN_LENGTH] for token in TOKEN_PATTERN.findall((text or '').lower())]
+
+
+def weighted_tokens(title, location, description):
+    """Map each distinct token of a transaction to its summed field weight."""
+    values = {'title': title, 'location': location, 'description': description}
+    weights = {}
+    for field_name, weight in FIELD_WEIGHTS:
+        for token in set(tokenize(values[field_name])):
+            weights[token] = weights.get(token, 0) + weight
+    return weights
+
+
+def query_terms(query):
+    terms = []
+    for term in tokenize(query):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def _prefix(term):
+    return Q(token__gte=term, token__lt=term + PREFIX_END)
+
+
+def search_transactions(queryset, user, query):
+    """
+    Restrict ``queryset`` to transactions whose indexed words start with
+    every term of ``query``, annotated with ``search_rank``.
+
+    Each term is one index range scan on (user, token) rather than a
+    ``LIKE '%term%'`` over three columns. The rank is the summed weight of
+    the matched tokens, so title hits sort above location and notes.
+    """
+    from .models import TransactionSearchToken
+
+    terms = query_terms(query)
+    if not terms:
+        return queryset.annotate(search_rank=Value(0, output_field=IntegerField()))
+
+    tokens = TransactionSearchToken.objects.filter(user=user)
+    any_term = Q()
+    for term in terms:
+        queryset = queryset.filter(pk__in=tokens.filter(_prefix(term)).values('transaction_id'))
+        any_term |= _prefix(term)
+
+    rank = TransactionSearchToken.objects.filter(
+        any_term,
+        transaction_id=OuterRef('pk')
+    ).values('transaction_id').annotate(rank=Sum('weight')).values('rank')
+
+    return queryset.annotate(search_rank=Subquery(rank))
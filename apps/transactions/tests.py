@@ -1,3 +1,507 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.cards.models import Card
+from apps.cards.reconciliation import expected_balances
+from apps.transactions.bulk import TransactionBulkEditor
+from apps.transactions.importers import TransactionImporter, parse_csv, parse_ofx
+from apps.transactions.models import Category, SpendingRollup, Transaction, TransactionSearchToken, TransactionTag, TransactionTagRelation
+from apps.transactions.pagination import CursorPaginator, approximate_count, encode_cursor
+from apps.transactions.search import search_transactions
+from core.testing import QueryBudgetMixin, create_card, create_currencies, create_user
+
+
+class TransactionViewQueryTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.cards = [create_card(cls.user, cls.uzs, 'Main'), create_card(cls.user, cls.usd, 'Travel')]
+        cls.food = Category.objects.create(name='Food', type='expense')
+        cls.salary = Category.objects.create(name='Salary', type='income')
+        cls.transaction = Transaction.objects.create(
+            user=cls.user, card=cls.cards[0], category=cls.food, type='expense',
+            amount=Decimal('10'), title='Coffee beans', location='Market'
+        )
+        TransactionTagRelation.objects.create(
+            transaction=cls.transaction,
+            tag=TransactionTag.objects.create(name='groceries', user=cls.user)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def grow(self):
+        today = date.today()
+        for number in range(25):
+            category = Category.objects.create(name=f'Custom {number}', type='expense', user=self.user)
+            tag = TransactionTag.objects.create(name=f'tag{number}', user=self.user)
+            transaction = Transaction.objects.create(
+                user=self.user,
+                card=self.cards[number % 2],
+                category=category if number % 2 else self.salary,
+                type='expense' if number % 2 else 'income',
+                amount=Decimal('5') + number,
+                title=f'Coffee {number}',
+                date=today - timedelta(days=number),
+            )
+            TransactionTagRelation.objects.create(transaction=transaction, tag=tag)
+
+    def test_transaction_list(self):
+        self.assertQueryBudget(reverse('transactions:transaction_list'), 10)
+
+    def test_transaction_list_numbered_pages(self):
+        self.assertQueryBudget(reverse('transactions:transaction_list') + '?page=1', 10)
+
+    def test_transaction_search(self):
+        self.assertQueryBudget(reverse('transactions:transaction_list') + '?search=coffee', 10)
+
+    def test_transaction_detail(self):
+        self.assertQueryBudget(reverse('transactions:transaction_detail', kwargs={'pk': self.transaction.pk}), 5)
+
+    def test_transaction_statistics(self):
+        self.assertQueryBudget(reverse('transactions:transaction_statistics'), 5)
+
+    def test_category_list(self):
+        self.assertQueryBudget(reverse('transactions:category_list'), 6)
+
+
+class TransactionBulkEditorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.food = Category.objects.create(name='Food', type='expense')
+        cls.cafe = Category.objects.create(name='Cafe', type='expense', user=cls.user)
+        cls.salary = Category.objects.create(name='Salary', type='income')
+        cls.work = TransactionTag.objects.create(name='work', user=cls.user)
+        cls.trip = TransactionTag.objects.create(name='trip', user=cls.user)
+
+    def setUp(self):
+        self.main = create_card(self.user, self.uzs, 'Main', balance=Decimal('1000'))
+        self.travel = create_card(self.user, self.usd, 'Travel', balance=Decimal('500'))
+        Card.objects.filter(pk__in=[self.main.pk, self.travel.pk]).update(initial_balance=F('balance'))
+        self.transactions = [
+            Transaction.objects.create(user=self.user, card=card, category=category, type=category.type, amount=Decimal(amount), title=title)
+            for card, category, amount, title in [
+                (self.main, self.food, '100', 'Lunch'),
+                (self.main, self.food, '40', 'Coffee'),
+                (self.main, self.salary, '300', 'Pay'),
+                (self.travel, self.food, '25', 'Taxi'),
+            ]
+        ]
+        self.ids = [transaction.pk for transaction in self.transactions]
+
+    def rollup_totals(self):
+        return {
+            (rollup.category_id, rollup.currency_id, rollup.type): (rollup.count, rollup.amount)
+            for rollup in SpendingRollup.objects.filter(user=self.user)
+        }
+
+    def test_delete_reverses_balances(self):
+        other_user = create_user('bob')
+        other = Transaction.objects.create(user=other_user, card=create_card(other_user, self.uzs), category=self.food, type='expense', amount=Decimal('1'), title='Other')
+
+        deleted = TransactionBulkEditor(self.user, self.ids + [other.pk]).delete()
+
+        self.assertEqual(deleted, 4)
+        self.assertTrue(Transaction.objects.filter(pk=other.pk).exists())
+        self.main.refresh_from_db()
+        self.travel.refresh_from_db()
+        self.assertEqual((self.main.balance, self.travel.balance), (Decimal('1000'), Decimal('500')))
+        self.assertEqual(self.rollup_totals(), {})
+        self.assertEqual(self.main.ledger_entries.last().amount, Decimal('-160'))
+        self.assertFalse(expected_balances().filter(user=self.user).exclude(drift=0).exists())
+
+    def test_delete_queries_do_not_grow_with_selection(self):
+        def queries_to_delete(ids):
+            with CaptureQueriesContext(connection) as queries:
+                TransactionBulkEditor(self.user, ids).delete()
+            return len(queries)
+
+        few = queries_to_delete(self.ids[:2])
+        more = [
+            Transaction.objects.create(user=self.user, card=self.main, category=self.food, type='expense', amount=Decimal('1'), title=f'Item {number}').pk
+            for number in range(10)
+        ]
+        self.assertEqual(queries_to_delete(more), few)
+
+    def test_recategorise_moves_rollups(self):
+        moved = TransactionBulkEditor(self.user, self.ids).recategorise(self.cafe)
+
+        self.assertEqual(moved, 3)
+        self.assertEqual(Transaction.objects.filter(category=self.cafe).count(), 3)
+        self.assertEqual(Transaction.objects.get(title='Pay').category, self.salary)
+        self.assertEqual(self.rollup_totals(), {
+            (self.cafe.pk, self.uzs.pk, 'expense'): (2, Decimal('140')),
+            (self.cafe.pk, self.usd.pk, 'expense'): (1, Decimal('25')),
+            (self.salary.pk, self.uzs.pk, 'income'): (1, Decimal('300')),
+        })
+
+    def test_retag(self):
+        editor = TransactionBulkEditor(self.user, self.ids[:2])
+        TransactionTagRelation.objects.create(transaction=self.transactions[0], tag=self.trip)
+
+        self.assertEqual(editor.retag([self.work]), 2)
+        self.assertEqual(editor.retag([self.work.pk]), 0)
+        self.assertEqual(editor.retag([self.work], 'replace'), 1)
+        self.assertEqual(
+            set(TransactionTagRelation.objects.values_list('transaction_id', 'tag_id')),
+            {(pk, self.work.pk) for pk in self.ids[:2]}
+        )
+        self.assertEqual(editor.retag([self.work], 'remove'), 2)
+        self.assertFalse(TransactionTagRelation.objects.exists())
+
+    def test_bulk_views(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('transactions:transaction_bulk_update'), {'transaction_ids': self.ids, 'action': 'recategorise', 'category': self.cafe.pk})
+        self.client.post(reverse('transactions:transaction_bulk_update'), {'transaction_ids': self.ids, 'action': 'add', 'tags': [self.work.pk]})
+        self.assertEqual(Transaction.objects.filter(category=self.cafe, transaction_tags__tag=self.work).count(), 3)
+
+        self.client.post(reverse('transactions:transaction_bulk_delete'), {'transaction_ids': self.ids})
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+        self.main.refresh_from_db()
+        self.assertEqual(self.main.balance, Decimal('1000'))
+
+
+class SpendingSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.card = create_card(cls.user, cls.uzs, 'Main')
+        cls.food = Category.objects.create(name='Food', type='expense')
+        cls.salary = Category.objects.create(name='Salary', type='income')
+
+    def setUp(self):
+        cache.clear()
+
+    def add(self, category, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Transaction.objects.create(user=self.user, card=self.card, category=category, type=category.type, amount=Decimal(amount), title='Item')
+
+    def test_writes_invalidate_the_summary(self):
+        self.add(self.salary, '500')
+        self.assertEqual(SpendingRollup.summary_for(self.user)['net_balance'], Decimal('500'))
+
+        with self.assertNumQueries(0):
+            SpendingRollup.summary_for(self.user)
+
+        lunch = self.add(self.food, '120')
+        summary = SpendingRollup.summary_for(self.user)
+        self.assertEqual((summary['expense_total'], summary['net_balance'], summary['total_count']), (Decimal('120'), Decimal('380'), 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lunch.delete()
+        self.assertEqual(SpendingRollup.summary_for(self.user)['total_count'], 1)
+
+    def test_summary_expires(self):
+        # a write in another process only clears that process's cache
+        SpendingRollup.summary_for(self.user)
+        SpendingRollup.objects.create(
+            user=self.user, category=self.salary, currency=self.uzs, type='income',
+            date=date.today(), count=1, amount=Decimal('10'), amount_in_user_currency=Decimal('10')
+        )
+        self.assertEqual(SpendingRollup.summary_for(self.user)['total_count'], 0)
+
+        later = time.time() + SpendingRollup.SUMMARY_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(SpendingRollup.summary_for(self.user)['total_count'], 1)
+
+
+class TransactionImporterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.card = create_card(cls.user, cls.uzs, 'Main', balance=Decimal('1000'))
+        cls.travel = create_card(cls.user, cls.usd, 'Travel', balance=Decimal('100'))
+        cls.food = Category.objects.create(name='Food', type='expense')
+        cls.salary = Category.objects.create(name='Salary', type='income')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def run_csv(self, text):
+        importer = TransactionImporter(self.user, card=self.card, income_category=self.salary, expense_category=self.food)
+        return importer.run(parse_csv(StringIO(text)))
+
+    def test_rows_update_balances_and_rollups(self):
+        result = self.run_csv(
+            "date,type,amount,title,category,card\n"
+            "2026-01-05,expense,120,Lunch,Food,Main\n"
+            "2026-01-05,,-30,Taxi,,\n"
+            "2026-01-06,income,10,Refund,Salary,Travel\n"
+        )
+
+        self.assertEqual((result.created, result.skipped, result.errors), (3, 0, []))
+        self.card.refresh_from_db()
+        self.travel.refresh_from_db()
+        self.assertEqual((self.card.balance, self.travel.balance), (Decimal('850'), Decimal('110')))
+        self.assertFalse(expected_balances().exclude(drift=0).exists())
+
+        rollup = SpendingRollup.objects.get(user=self.user, category=self.food, date=date(2026, 1, 5))
+        self.assertEqual((rollup.count, rollup.amount), (2, Decimal('150')))
+        refund = Transaction.objects.get(title='Refund')
+        self.assertEqual(refund.amount_in_user_currency, Decimal('126000.00'))
+
+    def test_errors_name_the_file_line(self):
+        result = self.run_csv(
+            "date,amount,title\n"
+            "2026-01-05,-10,Lunch\n"
+            "2026-01-05,ten,Typo\n"
+            '2026-01-05,-5,"Two\nlines"\n'
+            "01/05/2026,-5,Other date\n"
+        )
+
+        self.assertEqual((result.created, result.skipped), (2, 2))
+        self.assertEqual([line for line, _ in result.errors], [3, 6])
+        self.assertIn("Invalid amount 'ten'", result.errors[0][1])
+
+    def test_values_past_the_header(self):
+        result = self.run_csv(
+            "date,amount,title\n"
+            "2026-01-05,-10,Lunch,\n"
+            "2026-01-05,-5,Taxi,,\n"
+            "2026-01-05,-5,Shifted,Food\n"
+        )
+
+        self.assertEqual((result.created, result.skipped), (2, 1))
+        self.assertEqual(result.errors, [(4, "Row has more values than the header: Food")])
+
+    def test_ofx_statement(self):
+        statement = (
+            "<OFX><BANKTRANLIST>\n"
+            "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260105<TRNAMT>-42.50<NAME>Grocer\n"
+            "<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260106<TRNAMT>200<NAME>Payroll\n"
+            "</BANKTRANLIST></OFX>\n"
+        )
+        importer = TransactionImporter(self.user, card=self.card, income_category=self.salary, expense_category=self.food)
+        result = importer.run(parse_ofx(StringIO(statement)))
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual(
+            set(Transaction.objects.values_list('title', 'type', 'amount')),
+            {('Grocer', 'expense', Decimal('42.50')), ('Payroll', 'income', Decimal('200.00'))},
+        )
+
+    def test_unreadable_file_is_a_form_error(self):
+        upload = SimpleUploadedFile('statement.csv', 'date,amount\n2026-01-05,-10 caf\xe9\n'.encode('latin-1'))
+        response = self.client.post(reverse('transactions:transaction_import'), {'file': upload, 'format': 'csv'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('UTF-8', response.context['form'].errors['file'][0])
+        self.assertFalse(Transaction.objects.exists())
+
+
+class SpendingRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.other = create_user('bob')
+        cls.card = create_card(cls.user, cls.uzs, 'Main')
+        cls.travel = create_card(cls.user, cls.usd, 'Travel')
+        cls.food = Category.objects.create(name='Food', type='expense')
+        cls.rent = Category.objects.create(name='Rent', type='expense')
+        cls.salary = Category.objects.create(name='Salary', type='income')
+        cls.day = date(2026, 1, 5)
+
+    def add(self, card, category, amount, user=None, on_date=None):
+        return Transaction.objects.create(
+            user=user or self.user, card=card, category=category, type=category.type,
+            amount=Decimal(amount), title='Item', date=on_date or self.day
+        )
+
+    def rollups(self, **filters):
+        return {
+            (r.user_id, r.category_id, r.currency_id, r.type, r.date): (r.count, r.amount, r.amount_in_user_currency)
+            for r in SpendingRollup.objects.filter(**filters)
+        }
+
+    def assertInStep(self):
+        self.assertEqual(self.rollups(), SpendingRollup.queryset_totals(Transaction.objects.all()))
+
+    def test_transaction_writes_keep_rollups_in_step(self):
+        lunch = self.add(self.card, self.food, '120')
+        self.add(self.card, self.food, '30')
+        self.add(self.travel, self.food, '2')
+        self.add(self.card, self.salary, '500', on_date=self.day + timedelta(days=1))
+        self.assertInStep()
+        self.assertEqual(len(self.rollups()), 3)
+
+        lunch.category = self.rent
+        lunch.amount = Decimal('100')
+        lunch.save()
+        self.assertInStep()
+
+        lunch.delete()
+        self.assertInStep()
+        self.assertFalse(SpendingRollup.objects.filter(category=self.rent).exists())
+
+    def test_apply_many_creates_updates_and_drops_rows(self):
+        existing = (self.user.pk, self.food.pk, self.uzs.pk, 'expense', self.day)
+        emptied = (self.user.pk, self.rent.pk, self.uzs.pk, 'expense', self.day)
+        new = (self.user.pk, self.salary.pk, self.usd.pk, 'income', self.day)
+        SpendingRollup.apply(*existing, 2, Decimal('50'), Decimal('50'))
+        SpendingRollup.apply(*emptied, 1, Decimal('10'), Decimal('10'))
+
+        # savepoint, locking select, update, insert, delete, release
+        with self.assertNumQueries(6):
+            SpendingRollup.apply_many({
+                existing: (1, Decimal('25'), Decimal('25')),
+                emptied: (-1, Decimal('-10'), Decimal('-10')),
+                new: (1, Decimal('3'), Decimal('37800')),
+            })
+
+        self.assertEqual(self.rollups(), {
+            existing: (3, Decimal('75'), Decimal('75')),
+            new: (1, Decimal('3'), Decimal('37800')),
+        })
+
+    def test_rebuild_restores_the_table(self):
+        self.add(self.card, self.food, '120')
+        self.add(self.travel, self.salary, '20')
+        self.add(create_card(self.other, self.uzs), self.food, '7', user=self.other)
+        expected = self.rollups()
+
+        SpendingRollup.objects.filter(user=self.user).update(count=99, amount=0)
+        SpendingRollup.objects.filter(user=self.other).delete()
+        self.assertEqual(SpendingRollup.rebuild(user=self.user), 2)
+        self.assertEqual(self.rollups(user=self.user), {key: totals for key, totals in expected.items() if key[0] == self.user.pk})
+        self.assertFalse(SpendingRollup.objects.filter(user=self.other).exists())
+
+        out = StringIO()
+        call_command('rebuild_spending_rollups', stdout=out)
+        self.assertIn('Rebuilt 3 spending rollup row(s)', out.getvalue())
+        self.assertEqual(self.rollups(), expected)
+
+
+class CursorPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.card = create_card(cls.user, cls.uzs, 'Main')
+        cls.food = Category.objects.create(name='Food', type='expense')
+        # several rows per day so pages have to break ties on created_at and id
+        for number in range(25):
+            Transaction.objects.create(
+                user=cls.user, card=cls.card, category=cls.food, type='expense',
+                amount=Decimal('1'), title=f'Item {number}', date=date(2026, 1, 1) + timedelta(days=number // 4)
+            )
+        cls.ordered = list(Transaction.objects.order_by('-date', '-created_at', '-id').values_list('pk', flat=True))
+
+    def setUp(self):
+        self.paginator = CursorPaginator(Transaction.objects.filter(user=self.user), 10)
+
+    def test_pages_walk_forward_and_back(self):
+        pages = [self.paginator.page()]
+        while pages[-1].has_next:
+            pages.append(self.paginator.page(pages[-1].next_cursor))
+
+        self.assertEqual([len(page.object_list) for page in pages], [10, 10, 5])
+        self.assertEqual([t.pk for page in pages for t in page.object_list], self.ordered)
+        self.assertEqual([page.has_previous for page in pages], [False, True, True])
+
+        previous = self.paginator.page(pages[2].previous_cursor, 'previous')
+        self.assertEqual([t.pk for t in previous.object_list], self.ordered[10:20])
+        self.assertTrue(previous.has_previous)
+        first = self.paginator.page(previous.previous_cursor, 'previous')
+        self.assertEqual([t.pk for t in first.object_list], self.ordered[:10])
+        self.assertFalse(first.has_previous)
+
+    def test_deep_page_is_one_query(self):
+        cursor = encode_cursor(Transaction.objects.get(pk=self.ordered[19]))
+        with self.assertNumQueries(1):
+            page = self.paginator.page(cursor)
+        self.assertEqual([t.pk for t in page.object_list], self.ordered[20:])
+        self.assertFalse(page.has_next)
+
+    def test_malformed_cursor_starts_over(self):
+        page = self.paginator.page('not-a-cursor')
+        self.assertEqual([t.pk for t in page.object_list], self.ordered[:10])
+
+    def test_approximate_count(self):
+        transactions = Transaction.objects.all()
+        self.assertEqual(approximate_count(transactions), (25, False))
+        self.assertEqual(approximate_count(transactions, cap=20), (20, True))
+        self.assertEqual(approximate_count(transactions, cap=25), (25, False))
+
+    def test_list_view_follows_cursors(self):
+        self.client.force_login(self.user)
+        url = reverse('transactions:transaction_list')
+
+        first = self.client.get(url).context['cursor_page']
+        second = self.client.get(url, {'cursor': first.next_cursor}).context
+        self.assertEqual([t.pk for t in second['cursor_page'].object_list], self.ordered[20:])
+        self.assertEqual((second['approximate_count'], second['count_is_capped']), (25, False))
+
+
+class TransactionSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.other = create_user('bob')
+        cls.card = create_card(cls.user, cls.uzs, 'Main')
+        cls.food = Category.objects.create(name='Food', type='expense')
+        cls.coffee = cls.add('Coffee beans', location='Market')
+        cls.market = cls.add('Groceries', location='Coffee street market', description='Weekly shop')
+        cls.note = cls.add('Lunch', description='coffee after lunch')
+        cls.add('Coffee', user=cls.other, card=create_card(cls.other, cls.uzs))
+
+    @classmethod
+    def add(cls, title, location=None, description=None, user=None, card=None):
+        return Transaction.objects.create(
+            user=user or cls.user, card=card or cls.card, category=cls.food, type='expense',
+            amount=Decimal('1'), title=title, location=location, description=description
+        )
+
+    def search(self, query):
+        results = search_transactions(Transaction.objects.filter(user=self.user), self.user, query)
+        return [t.pk for t in results.order_by('-search_rank', 'pk')]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.search('coffee'), [self.coffee.pk, self.market.pk, self.note.pk])
+
+    def test_prefixes_and_every_term(self):
+        self.assertEqual(self.search('COF mark'), [self.coffee.pk, self.market.pk])
+        self.assertEqual(self.search('coffee weekly'), [self.market.pk])
+        self.assertEqual(self.search('tea'), [])
+
+    def test_edits_reindex(self):
+        self.note.title = 'Tea'
+        self.note.description = None
+        self.note.save()
+
+        self.assertEqual(self.search('tea'), [self.note.pk])
+        self.assertNotIn(self.note.pk, self.search('coffee'))
+
+    def test_rebuild(self):
+        TransactionSearchToken.objects.filter(user=self.user).delete()
+        self.assertEqual(self.search('coffee'), [])
 
-# Create your tests here.
+        out = StringIO()
+        call_command('rebuild_search_index', '--user', 'alice', stdout=out)
+        self.assertIn('search token(s)', out.getvalue())
+        self.assertEqual(self.search('coffee'), [self.coffee.pk, self.market.pk, self.note.pk])
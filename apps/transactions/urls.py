@@ -15,6 +15,8 @@ urlpatterns = [
     path('transactions/<int:pk>/delete/', TransactionDeleteView.as_view(), name='transaction_delete'),
     path('transactions/statistics/', TransactionStatisticsView.as_view(), name='transaction_statistics'),
     path('transactions/bulk-delete/', BulkDeleteView.as_view(), name='transaction_bulk_delete'),
+    path('transactions/bulk-update/', BulkUpdateView.as_view(), name='transaction_bulk_update'),
+    path('transactions/import/', TransactionImportView.as_view(), name='transaction_import'),
 
     
     path('categories/', CategoryListView.as_view(), name='category_list'),
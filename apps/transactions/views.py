@@ -1,17 +1,22 @@
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import redirect
+from django.shortcuts import redirect, render
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.db.models import Sum, Q, Count
+from django.db.models import Sum, Q
 from django.utils import timezone
 from datetime import  timedelta
-from decimal import Decimal
+import csv
+import io
 
 from .models import *
 from apps.cards.models import *
 from .forms import *
+from .bulk import TransactionBulkEditor
+from .importers import PARSERS, TransactionImporter
+from .pagination import CursorPaginator, approximate_count
+from .search import search_transactions
 
 
 
@@ -141,38 +146,50 @@ class TransactionListView(LoginRequiredMixin, ListView):
         
         search = self.request.GET.get('search')
         if search:
-            qs = qs.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(location__icontains=search)
-            )
+            # best matches first; keyset pages only follow the date order
+            return search_transactions(qs, self.request.user, search).order_by('-search_rank', '-date', '-created_at')
         
         return qs.order_by('-date', '-created_at')
     
+    def paginate_queryset(self, queryset, page_size):
+        # an explicit ?page= keeps the old numbered pages working
+        if self.page_kwarg in self.request.GET or self.request.GET.get('search'):
+            return super().paginate_queryset(queryset, page_size)
+        
+        self.cursor_page = CursorPaginator(queryset, page_size).page(
+            self.request.GET.get('cursor'),
+            self.request.GET.get('direction', 'next')
+        )
+        self.cursor_queryset = queryset
+        return (None, None, self.cursor_page.object_list, False)
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
         
-        all_transactions = Transaction.objects.filter(user=user)
+        querystring = self.request.GET.copy()
+        for key in ('cursor', 'direction', self.page_kwarg):
+            querystring.pop(key, None)
+        context['filter_querystring'] = querystring.urlencode()
         
-        income_total = all_transactions.filter(type='income').aggregate(
-            total=Sum('amount_in_user_currency')
-        )['total'] or Decimal('0')
-        
-        expense_total = all_transactions.filter(type='expense').aggregate(
-            total=Sum('amount_in_user_currency')
-        )['total'] or Decimal('0')
+        cursor_page = getattr(self, 'cursor_page', None)
+        if cursor_page is not None:
+            context['cursor_page'] = cursor_page
+            if self.request.GET.get('count') != '0':
+                context['approximate_count'], context['count_is_capped'] = approximate_count(self.cursor_queryset)
         
-        context['income_total'] = income_total
-        context['expense_total'] = expense_total
-        context['net_balance'] = income_total - expense_total
-        context['total_transactions'] = all_transactions.count()
+        summary = SpendingRollup.summary_for(user)
+        context['income_total'] = summary['income_total']
+        context['expense_total'] = summary['expense_total']
+        context['net_balance'] = summary['net_balance']
+        context['total_transactions'] = summary['total_count']
         
         context['categories'] = Category.objects.filter(
             Q(user=None) | Q(user=user),
             is_active=True
         ).order_by('type', 'name')
         context['cards'] = Card.objects.filter(user=user, status='active')
+        context['tags'] = TransactionTag.objects.filter(Q(user=None) | Q(user=user))
         context['filter_form'] = TransactionFilterForm(self.request.GET)
         
         return context
@@ -323,34 +340,28 @@ class TransactionStatisticsView(LoginRequiredMixin, ListView):
             start_date = today.replace(day=1)
             end_date = today
         
-        transactions = Transaction.objects.filter(
+        rollups = SpendingRollup.objects.filter(
             user=user,
             date__gte=start_date,
             date__lte=end_date
         )
         
-        income_total = transactions.filter(type='income').aggregate(
-            total=Sum('amount_in_user_currency')
-        )['total'] or Decimal('0')
-        
-        expense_total = transactions.filter(type='expense').aggregate(
-            total=Sum('amount_in_user_currency')
-        )['total'] or Decimal('0')
+        summary = SpendingRollup.summarize(rollups)
         
-        category_breakdown = transactions.values(
+        category_breakdown = rollups.values(
             'category__name', 'category__icon', 'type'
         ).annotate(
             total=Sum('amount_in_user_currency'),
-            count=Count('id')
+            count=Sum('count')
         ).order_by('-total')
         
-        top_expense_categories = transactions.filter(type='expense').values(
+        top_expense_categories = rollups.filter(type='expense').values(
             'category__name', 'category__icon',
         ).annotate(
             total=Sum('amount_in_user_currency')
         ).order_by('-total')[:5]
         
-        top_income_categories = transactions.filter(type='income').values(
+        top_income_categories = rollups.filter(type='income').values(
             'category__name', 'category__icon'
         ).annotate(
             total=Sum('amount_in_user_currency')
@@ -360,12 +371,7 @@ class TransactionStatisticsView(LoginRequiredMixin, ListView):
             'period': period,
             'start_date': start_date,
             'end_date': end_date,
-            'income_total': income_total,
-            'expense_total': expense_total,
-            'net_balance': income_total - expense_total,
-            'income_count': transactions.filter(type='income').count(),
-            'expense_count': transactions.filter(type='expense').count(),
-            'total_count': transactions.count(),
+            **summary,
             'category_breakdown': category_breakdown,
             'top_expense_categories': top_expense_categories,
             'top_income_categories': top_income_categories,
@@ -383,18 +389,92 @@ class BulkDeleteView(LoginRequiredMixin, View):
             messages.error(request, 'No transactions selected.')
             return redirect('transactions:transaction_list')
         
-        transactions = Transaction.objects.filter(
-            user=request.user,
-            id__in=transaction_ids
-        )
-        
-        count = transactions.count()
-        transactions.delete()
+        count = TransactionBulkEditor(request.user, transaction_ids).delete()
         
         messages.success(request, f'{count} transaction(s) deleted successfully.')
         return redirect('transactions:transaction_list')
 
 
+class BulkUpdateView(LoginRequiredMixin, View):
+    def post(self, request):
+        transaction_ids = request.POST.getlist('transaction_ids')
+        action = request.POST.get('action')
+
+        if not transaction_ids:
+            messages.error(request, 'No transactions selected.')
+            return redirect('transactions:transaction_list')
+
+        editor = TransactionBulkEditor(request.user, transaction_ids)
+
+        if action == 'recategorise':
+            category_id = request.POST.get('category', '')
+            category = Category.objects.filter(
+                Q(user=None) | Q(user=request.user),
+                pk=category_id,
+                is_active=True
+            ).first() if category_id.isdigit() else None
+            if category is None:
+                messages.error(request, 'Choose a category.')
+                return redirect('transactions:transaction_list')
+
+            count = editor.recategorise(category)
+            messages.success(request, f'{count} {category.type} transaction(s) moved to {category.name}.')
+
+        elif action in TransactionBulkEditor.TAG_ACTIONS:
+            tag_ids = [tag_id for tag_id in request.POST.getlist('tags') if tag_id.isdigit()]
+            if not tag_ids and action != 'replace':
+                messages.error(request, 'Choose at least one tag.')
+                return redirect('transactions:transaction_list')
+
+            count = editor.retag(tag_ids, action)
+            messages.success(request, f'Tags updated ({count} change(s)).')
+
+        else:
+            messages.error(request, 'Unknown bulk action.')
+
+        return redirect('transactions:transaction_list')
+
+
+
+class TransactionImportView(LoginRequiredMixin, FormView):
+    form_class = TransactionImportForm
+    template_name = "transactions/import.html"
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def form_valid(self, form):
+        importer = TransactionImporter(
+            self.request.user,
+            card=form.cleaned_data['card'],
+            income_category=form.cleaned_data['income_category'],
+            expense_category=form.cleaned_data['expense_category'],
+        )
+        lines = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+        try:
+            result = importer.run(PARSERS[form.cleaned_data['format']](lines))
+        except UnicodeDecodeError:
+            form.add_error('file', 'The file must be UTF-8 encoded.')
+            return self.form_invalid(form)
+        except csv.Error as error:
+            form.add_error('file', f'The file is not valid CSV: {error}')
+            return self.form_invalid(form)
+
+        if result.created:
+            messages.success(
+                self.request,
+                f'{result.created} transaction(s) imported ({result.rows_per_second:,.0f} rows/s).'
+            )
+        if result.skipped:
+            messages.error(self.request, f'{result.skipped} row(s) skipped.')
+
+        return render(self.request, self.template_name, {
+            "form": self.get_form_class()(user=self.request.user),
+            "result": result,
+        })
+
 
 class TransactionTagListView(LoginRequiredMixin, ListView):
     template_name = "transactions/tags_list.html"
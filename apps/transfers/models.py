@@ -1,9 +1,10 @@
 
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from apps.cards.models import *
+from apps.cards.balances import adjust_balance, withdraw
 
 class CardTransfer(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='card_transfers')
@@ -42,14 +43,18 @@ class CardTransfer(models.Model):
             self.exchange_rate = Decimal('1.000000')
             self.converted_amount = self.amount
 
-        if not self.pk:
-            self.from_card.balance -= self.amount
-            self.from_card.save()
-            
-            self.to_card.balance += self.converted_amount
-            self.to_card.save()
+        with transaction.atomic():
+            is_new = self.pk is None
+            super().save(*args, **kwargs)
 
-        super().save(*args, **kwargs)
+            if is_new:
+                # saved first so ledger entries can point at the transfer
+                try:
+                    withdraw(self.from_card, self.amount, kind='transfer', object_id=self.pk)
+                except ValueError:
+                    self.pk = None
+                    raise
+                adjust_balance(self.to_card, self.converted_amount, kind='transfer', object_id=self.pk)
     
     def get_fee_amount(self):
         return Decimal('0.00')
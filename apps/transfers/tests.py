@@ -1,3 +1,32 @@
+from decimal import Decimal
+
 from django.test import TestCase
+from django.urls import reverse
+
+from apps.transfers.models import CardTransfer
+from core.testing import QueryBudgetMixin, create_card, create_currencies, create_user
+
+
+class TransferViewQueryTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzs, cls.usd, cls.eur = create_currencies()
+        cls.user = create_user('alice')
+        cls.cards = [create_card(cls.user, cls.uzs, 'Main'), create_card(cls.user, cls.usd, 'Travel')]
+        cls.transfer = CardTransfer.objects.create(user=cls.user, from_card=cls.cards[1], to_card=cls.cards[0], amount=Decimal('10'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def grow(self):
+        for number in range(10):
+            card = create_card(self.user, (self.uzs, self.usd, self.eur)[number % 3], f'Card {number}')
+            CardTransfer.objects.create(user=self.user, from_card=self.cards[0], to_card=card, amount=Decimal('100'))
+            CardTransfer.objects.create(user=self.user, from_card=card, to_card=self.cards[1], amount=Decimal('1'))
+
+    def test_transfer_list(self):
+        self.assertQueryBudget(reverse('transfers:transfer_list'), 7)
 
-# Create your tests here.
+    def test_transfer_detail(self):
+        self.assertQueryBudget(reverse('transfers:transfer_detail', kwargs={'pk': self.transfer.pk}), 3)
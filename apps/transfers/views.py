@@ -54,7 +54,7 @@ def transfer_list(request):
     context = {
         'transfers': transfers,
         'total_transferred': total_transferred,
-        'user_cards': Card.objects.filter(user=request.user,status='active'),
+        'user_cards': Card.objects.filter(user=request.user,status='active').select_related('currency'),
         'card_filter': card_filter
 
     }
@@ -0,0 +1,33 @@
+import csv
+
+
+LINE_KEY = '_line'
+EXTRA_KEY = '_extra'
+
+
+def read_rows(lines):
+    """
+    Yield one dict per CSV record, keyed by the lower-cased header.
+
+    Keys and values are stripped and missing values come back as ''. Each
+    row carries the file line it ends on under ``LINE_KEY``, counting the
+    header and quoted line breaks. Values past the last header column are
+    ignored when empty (a trailing comma) and listed under ``EXTRA_KEY``
+    otherwise; ``check_extra_values`` turns those into a row error.
+    """
+    reader = csv.DictReader(lines)
+    for row in reader:
+        extra = [value.strip() for value in row.pop(None, None) or [] if value.strip()]
+        row = {
+            (key or '').strip().lower(): (value or '').strip()
+            for key, value in row.items()
+        }
+        row[LINE_KEY] = reader.line_num
+        if extra:
+            row[EXTRA_KEY] = extra
+        yield row
+
+
+def check_extra_values(row):
+    if row.get(EXTRA_KEY):
+        raise ValueError(f"Row has more values than the header: {', '.join(row[EXTRA_KEY])}")
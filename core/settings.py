@@ -69,6 +69,7 @@ USE_L10N = True
 
 
 MIDDLEWARE = [
+    'apps.dashboard.middleware.ViewMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -80,6 +81,11 @@ MIDDLEWARE = [
     
 ]
 
+# Per-view query/latency metrics, see apps.dashboard.middleware
+VIEW_METRICS_ENABLED = os.getenv("VIEW_METRICS_ENABLED") == "True"
+VIEW_QUERY_BUDGET = int(os.getenv("VIEW_QUERY_BUDGET", 25))
+VIEW_QUERY_BUDGETS = {}
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -117,6 +123,21 @@ DATABASES = {
 }
 
 
+# Cache
+# Exchange rate tables and other per-process copies only see changes made
+# by other processes when this cache is shared (e.g. Redis or Memcached).
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+
 
 
 EMAIL_BACKEND = os.getenv(
@@ -0,0 +1,76 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def create_currencies():
+    from apps.cards.models import Currency, ExchangeRate
+
+    uzs = Currency.objects.create(code='UZS', name='Uzbekistan Sum', symbol="so'm")
+    usd = Currency.objects.create(code='USD', name='US Dollar', symbol='$')
+    eur = Currency.objects.create(code='EUR', name='Euro', symbol='€')
+    ExchangeRate.objects.create(from_currency=usd, to_currency=uzs, rate=Decimal('12600'), date=date.today())
+    ExchangeRate.objects.create(from_currency=eur, to_currency=usd, rate=Decimal('1.08'), date=date.today())
+    return uzs, usd, eur
+
+
+def create_user(username, **extra):
+    from apps.accounts.models import CustomUser
+
+    return CustomUser.objects.create(
+        username=username,
+        email=f'{username}@example.com',
+        auth_status='done',
+        **extra
+    )
+
+
+def create_card(user, currency, name='Card', balance=Decimal('1000000')):
+    from apps.cards.models import Card, CardType
+
+    card_type = CardType.objects.first() or CardType.objects.create(name='Visa')
+    return Card.objects.create(
+        user=user,
+        card_type=card_type,
+        currency=currency,
+        card_name=name,
+        balance=balance,
+        initial_balance=balance,
+    )
+
+
+class QueryBudgetMixin:
+    """
+    Guards views against per-row queries.
+
+    ``assertQueryBudget`` requests a page, calls ``grow()`` to add more of
+    the rows the page lists, and requests it again. The first count must
+    stay within the recorded budget and the second must equal the first.
+    The cache and the process-local rate tables are cleared before each
+    request so cached pages are measured at their rebuild cost.
+    """
+
+    def grow(self):
+        raise NotImplementedError
+
+    def count_queries(self, url, client=None):
+        from apps.cards.rates import rate_history, rate_matrix
+
+        cache.clear()
+        rate_matrix.invalidate()
+        rate_history.invalidate()
+        with CaptureQueriesContext(connection) as queries:
+            response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200, f"{url} returned {response.status_code}")
+        return len(queries.captured_queries)
+
+    def assertQueryBudget(self, url, budget, client=None):
+        before = self.count_queries(url, client)
+        self.assertLessEqual(before, budget, f"{url} ran {before} queries, budget is {budget}")
+
+        self.grow()
+        after = self.count_queries(url, client)
+        self.assertEqual(after, before, f"{url} went from {before} to {after} queries after adding rows")
@@ -1,31 +1,125 @@
 // Simple Support Button - Auto update unread count
 document.addEventListener('DOMContentLoaded', function() {
     const supportBtn = document.getElementById('supportBtn');
-    
-    if (!supportBtn) return;
-    
+    const chat = document.querySelector('[data-messages-url]');
+
+    if (!supportBtn && !chat) return;
+
+    function showUnreadCount(count) {
+        if (count > 0) {
+            supportBtn.classList.add('has-unread');
+            supportBtn.setAttribute('data-unread', count);
+        } else {
+            supportBtn.classList.remove('has-unread');
+        }
+    }
+
+    // The browser revalidates with the ETag; Retry-After grows while nothing changes
+    // After a failed request the next poll backs off to the longest interval
     function updateUnreadCount() {
+        let delay = 60;
         fetch('/support/api/unread/')
+            .then(response => {
+                delay = parseInt(response.headers.get('Retry-After'), 10) || 30;
+                return response.json();
+            })
+            .then(data => showUnreadCount(data.unread_count))
+            .catch(error => console.error('Error:', error))
+            .finally(() => setTimeout(updateUnreadCount, delay * 1000));
+    }
+
+    const history = chat ? chatHistory(chat) : null;
+
+    // Pushed by the server; browsers without EventSource poll
+    if (window.EventSource) {
+        const stream = new EventSource('/support/api/unread/stream/');
+        if (supportBtn) {
+            stream.addEventListener('unread', function(event) {
+                showUnreadCount(JSON.parse(event.data).unread_count);
+            });
+        }
+        if (history) {
+            stream.addEventListener('message', function(event) {
+                if (String(JSON.parse(event.data).user_id) === chat.dataset.userId) {
+                    history.loadNewer();
+                }
+            });
+        }
+    } else {
+        if (supportBtn) {
+            updateUnreadCount();
+        }
+        if (history) {
+            setInterval(history.loadNewer, 30000);
+        }
+    }
+});
+
+// Chat history - older messages on scroll, new ones as they arrive
+function chatHistory(chat) {
+    const url = chat.dataset.messagesUrl;
+    let hasOlder = chat.dataset.hasOlder === 'true';
+    let loadingOlder = false;
+    let loadingNewer = false;
+    let newerPending = false;
+
+    function loadOlder() {
+        const first = chat.querySelector('[data-id]');
+        if (!hasOlder || loadingOlder || !first) return;
+
+        loadingOlder = true;
+        const previousHeight = chat.scrollHeight;
+        fetch(url + '?before=' + first.dataset.id)
             .then(response => response.json())
             .then(data => {
-                if (data.unread_count > 0) {
-                    supportBtn.classList.add('has-unread');
-                    supportBtn.setAttribute('data-unread', data.unread_count);
-                } else {
-                    supportBtn.classList.remove('has-unread');
-                }
+                first.insertAdjacentHTML('beforebegin', data.html);
+                chat.scrollTop += chat.scrollHeight - previousHeight;
+                hasOlder = data.has_more;
             })
-            .catch(error => console.error('Error:', error));
+            .catch(error => console.error('Error:', error))
+            .finally(() => { loadingOlder = false; });
     }
-    
-    // Update on load and every 30 seconds
-    updateUnreadCount();
-    setInterval(updateUnreadCount, 30000);
-});
+
+    function loadNewer() {
+        if (loadingNewer) {
+            newerPending = true;
+            return;
+        }
+
+        const messages = chat.querySelectorAll('[data-id]');
+        const last = messages[messages.length - 1];
+        loadingNewer = true;
+        fetch(url + (last ? '?after=' + last.dataset.id : ''))
+            .then(response => response.json())
+            .then(data => {
+                if (!data.messages.length) return;
+
+                const empty = chat.querySelector('.chat-empty');
+                if (empty) empty.remove();
+                chat.insertAdjacentHTML('beforeend', data.html);
+                chat.scrollTop = chat.scrollHeight;
+                newerPending = newerPending || data.has_more;
+            })
+            .catch(error => console.error('Error:', error))
+            .finally(() => {
+                loadingNewer = false;
+                if (newerPending) {
+                    newerPending = false;
+                    loadNewer();
+                }
+            });
+    }
+
+    chat.addEventListener('scroll', function() {
+        if (chat.scrollTop < 50) loadOlder();
+    });
+
+    return { loadOlder: loadOlder, loadNewer: loadNewer };
+}
 
 // Auto-scroll chat to bottom
 function scrollChatToBottom() {
-    const chatContainer = document.querySelector('.chat-messages');
+    const chatContainer = document.querySelector('.chat-messages, [data-messages-url]');
     if (chatContainer) {
         chatContainer.scrollTop = chatContainer.scrollHeight;
     }